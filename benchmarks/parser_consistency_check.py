@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+The check processes synthetic TEI plays of every format with the streaming parser and with BeautifulSoup and
+verifies that both give the same json. The attributes of the elements of the plays are written in the reverse
+order, e.g., <div type="extra_scene" cast="..."> and <l part="I" n="...">, because BeautifulSoup serializes them
+sorted by name and the code which reads the serialized markup must get the same string from the streaming parser.
+"""
+import io
+import re
+import sys
+import json
+import argparse
+import tempfile
+import contextlib
+from os import listdir
+from player import russian_tei_functions as rtf
+from player import french_tei_functions as ftf
+from player import shakespeare_tei_functions as stf
+from player import play_model_functions as pmf
+import synthetic_plays as sp
+
+processors = {'russian_tei': rtf.process_play, 'french_tei': ftf.process_play, 'shakespeare_tei': stf.process_play}
+start_tag_regex = re.compile(r'<([\w:]+)((?:\s+[\w:]+="[^"]*")+)\s*(/?)>')
+attribute_regex = re.compile(r'[\w:]+="[^"]*"')
+
+
+def reverse_attributes(match):
+    attributes = attribute_regex.findall(match.group(2))
+
+    return '<{} {}{}>'.format(match.group(1), ' '.join(reversed(attributes)), match.group(3))
+
+
+def reorder_attributes(xml):
+    """
+    The function numbers the split verse lines, i.e., adds an n attribute after their part attribute, and reverses
+    the order of the attributes of every element.
+    """
+    line_number = iter(range(1, len(xml)))
+    xml = re.sub(r'<l( part="\w+")>', lambda match: '<l n="{}"{}>'.format(next(line_number), match.group(1)), xml)
+
+    return start_tag_regex.sub(reverse_attributes, xml)
+
+
+def play_json(process_play, file_name, streaming):
+    with contextlib.redirect_stdout(io.StringIO()):
+        play_data = process_play(file_name, None, False, streaming)
+
+    return json.dumps(play_data, ensure_ascii=False, default=pmf.json_summary)
+
+
+def main(raw_args):
+    parser = argparse.ArgumentParser(description='Check that both TEI parsers give the same json.')
+    parser.add_argument('-n', '--num_plays', type=int, required=False, default=5,
+                        help='The number of plays of every format.')
+    args = vars(parser.parse_args(raw_args))
+    size = {'acts': 3, 'scenes': 6, 'cast': 10, 'utterances': 12, 'verse_lines': 4, 'stage_directions': 4}
+    num_different = 0
+    with tempfile.TemporaryDirectory() as corpus_path:
+        for play_format, process_play in processors.items():
+            format_path = corpus_path + '/' + play_format + '/'
+            sp.write_corpus(format_path, play_format, args['num_plays'], size)
+            for file in sorted(listdir(format_path)):
+                if not file.endswith('.xml'):
+                    continue
+                with open(format_path + file) as xml_file:
+                    xml = reorder_attributes(xml_file.read())
+                with open(format_path + file, 'w') as xml_file:
+                    xml_file.write(xml)
+                try:
+                    same_json = play_json(process_play, format_path + file, True) == \
+                        play_json(process_play, format_path + file, False)
+                except Exception as error:
+                    print(play_format, file, 'ERROR.', 'The play could not be processed:', repr(error))
+                    same_json = False
+                if not same_json:
+                    print(play_format, file, 'ERROR.', 'The parsers give different json.')
+                    num_different += 1
+            print(play_format, args['num_plays'], 'plays checked.')
+    if num_different:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
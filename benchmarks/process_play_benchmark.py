@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""
+The benchmark generates a synthetic corpus in every play format, measures the time and the peak memory needed to
+process its plays with process_play, and appends the results to a file, so that they can be compared across commits.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+import subprocess
+import player
+from player import text_processing_functions as tpf
+from player import russian_tei_functions as rtf
+from player import french_tei_functions as ftf
+from player import shakespeare_tei_functions as stf
+from player import french_word_functions as fwf
+from player import generic_word_processing_functions as gwf
+from player import metadata_functions as mdf
+import synthetic_plays as sp
+
+
+def play_processor(play_format, corpus_path, metadata_path):
+    """
+    The function creates the function which processes a play of the given format.
+    Params:
+        play_format - a string, one of the keys of sp.play_formats.
+        corpus_path - the path of the folder with the plays, ending with a slash.
+        metadata_path - the path of the metadata file of the corpus.
+    Returns:
+        a function which takes the file name of a play and returns its play_data.
+    """
+    if play_format == 'txt':
+        metadata = mdf.read_metadata(metadata_path, tpf.metadata_columns + ['num_acts'])
+        return lambda file_name: tpf.process_play(file_name, metadata, corpus_path, tpf.regex_pattern)
+    if play_format == 'russian_tei':
+        return lambda file_name: rtf.process_play(file_name, None, False)
+    if play_format == 'french_tei':
+        return lambda file_name: ftf.process_play(file_name, None, False)
+    if play_format == 'shakespeare_tei':
+        return lambda file_name: stf.process_play(file_name, None, False)
+    metadata = mdf.read_metadata(metadata_path, fwf.metadata_columns)
+    if play_format == 'french_word':
+        return lambda file_name: fwf.process_play(file_name, metadata, corpus_path)
+
+    return lambda file_name: gwf.process_play(file_name, metadata, corpus_path, 'C_')
+
+
+def time_corpus(process, file_names, repeats):
+    """
+    The function returns the best time of processing all plays of a corpus out of several repeats.
+    Params:
+        process - a function which takes the file name of a play, see play_processor.
+        file_names - a list of the file names of the plays.
+        repeats - int, the number of times the corpus is processed.
+    Returns:
+        best_time - float, the shortest processing time in seconds.
+        errors - a dictionary with the plays which could not be processed and their errors.
+    """
+    best_time, errors = float('inf'), {}
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for file_name in file_names:
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    process(file_name)
+            except Exception as exception:
+                errors[os.path.basename(file_name)] = '{}: {}'.format(type(exception).__name__, exception)
+        best_time = min(best_time, time.perf_counter() - start)
+
+    return best_time, errors
+
+
+def peak_memory(process, file_names):
+    """
+    The function returns the largest amount of memory allocated by Python while processing a single play.
+    """
+    peak = 0
+    for file_name in file_names:
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                process(file_name)
+        except Exception:
+            pass
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return peak
+
+
+def benchmark_format(play_format, corpus_path, num_plays, size, seed, repeats):
+    """
+    The function generates the corpus of a play format and benchmarks it.
+    Params:
+        play_format - a string, one of the keys of sp.play_formats.
+        corpus_path - the path of the folder in which the corpus is generated.
+        num_plays, size, seed - see sp.write_corpus.
+        repeats - int, the number of times the corpus is processed.
+    Returns:
+        result - a dictionary with the throughput and the peak memory.
+    """
+    corpus_path = os.path.join(corpus_path, play_format, '')
+    metadata_path = sp.write_corpus(corpus_path, play_format, num_plays, size, seed)
+    file_names = sorted(corpus_path + file for file in os.listdir(corpus_path)
+                        if file.endswith(sp.play_formats[play_format]))
+    process = play_processor(play_format, corpus_path, metadata_path)
+    megabytes = sum(os.path.getsize(file_name) for file_name in file_names) / 1e6
+    best_time, errors = time_corpus(process, file_names, repeats)
+    result = {'plays': len(file_names),
+              'megabytes': round(megabytes, 3),
+              'seconds': round(best_time, 4),
+              'plays_per_second': round(len(file_names) / best_time, 2),
+              'megabytes_per_second': round(megabytes / best_time, 3),
+              'peak_memory_megabytes': round(peak_memory(process, file_names) / 1e6, 3),
+              'errors': errors}
+
+    return result
+
+
+def current_commit():
+    """
+    The function returns the git commit of the package, and whether the working tree has uncommitted changes.
+    """
+    package_path = os.path.dirname(os.path.dirname(os.path.abspath(player.__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=package_path, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=package_path,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+
+    return commit, dirty
+
+
+def previous_run(results_path, run):
+    """
+    The function finds the last stored run of another commit with the same corpus, None if there is none.
+    """
+    if not os.path.exists(results_path):
+        return None
+    previous = None
+    with open(results_path, 'r') as file:
+        for line in file:
+            stored_run = json.loads(line)
+            if stored_run['commit'] != run['commit'] and all(stored_run[key] == run[key] for key in
+                                                             ['num_plays', 'size', 'seed']):
+                previous = stored_run
+
+    return previous
+
+
+def print_results(run, previous):
+    print('format\tplays/s\tMB/s\tpeak_MB\terrors' + ('\tspeedup' if previous else ''))
+    for play_format, result in run['results'].items():
+        line = '{}\t{}\t{}\t{}\t{}'.format(play_format, result['plays_per_second'], result['megabytes_per_second'],
+                                           result['peak_memory_megabytes'], len(result['errors']))
+        if previous and play_format in previous['results']:
+            line += '\t{:.2f}'.format(previous['results'][play_format]['seconds'] / result['seconds'])
+        print(line)
+    if previous:
+        print('speedup over commit', previous['commit'])
+
+
+def main(raw_args):
+    parser = argparse.ArgumentParser(description='Benchmark of process_play on synthetic plays of every format.')
+    parser.add_argument('--formats', type=str, nargs='+', required=False, default=list(sp.play_formats),
+                        choices=list(sp.play_formats), help='The play formats to benchmark.')
+    parser.add_argument('-n', '--num_plays', type=int, required=False, default=20,
+                        help='The number of plays of every format.')
+    parser.add_argument('--acts', type=int, required=False, default=5, help='The number of acts in a play.')
+    parser.add_argument('--scenes', type=int, required=False, default=8, help='The number of scenes in an act.')
+    parser.add_argument('--cast', type=int, required=False, default=12, help='The number of characters, at most 16.')
+    parser.add_argument('--utterances', type=int, required=False, default=10,
+                        help='The number of utterances in a scene.')
+    parser.add_argument('--verse_lines', type=int, required=False, default=4,
+                        help='The maximum number of verse lines in an utterance.')
+    parser.add_argument('--stage_directions', type=int, required=False, default=4,
+                        help='The maximum number of stage directions in a scene.')
+    parser.add_argument('--seed', type=int, required=False, default=0, help='The seed of the generated corpus.')
+    parser.add_argument('-r', '--repeats', type=int, required=False, default=3,
+                        help='The number of times every corpus is processed.')
+    parser.add_argument('--corpus_path', type=str, required=False,
+                        help='The path where the corpus is generated, by default a temporary folder.')
+    parser.add_argument('--results_path', type=str, required=False, default='benchmark_results.jsonl',
+                        help='The file to which the results are appended.')
+    args = vars(parser.parse_args(raw_args))
+    size = {key: args[key] for key in ['acts', 'scenes', 'cast', 'utterances', 'verse_lines', 'stage_directions']}
+    commit, dirty = current_commit()
+    run = {'commit': commit, 'dirty': dirty, 'version': player.__version__, 'python': platform.python_version(),
+           'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'num_plays': args['num_plays'], 'size': size,
+           'seed': args['seed'], 'repeats': args['repeats'], 'results': {}}
+    with tempfile.TemporaryDirectory() as temporary_path:
+        corpus_path = args['corpus_path'] or temporary_path
+        for play_format in args['formats']:
+            run['results'][play_format] = benchmark_format(play_format, corpus_path, args['num_plays'], size,
+                                                           args['seed'], args['repeats'])
+    previous = previous_run(args['results_path'], run)
+    with open(args['results_path'], 'a') as file:
+        file.write(json.dumps(run, ensure_ascii=False) + '\n')
+    print_results(run, previous)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,358 @@
+"""
+The generator of synthetic plays for the benchmarks. It writes corpora of random plays of a configurable size in
+every format the package reads: the tagged txt files, the Russian, French and Shakespeare TEI files and the French
+and generic Word documents, together with their metadata files.
+"""
+import os
+import random
+import zipfile
+from xml.sax.saxutils import escape
+
+russian_names = ['ИВАН', 'МАРЬЯ', 'ПЕТРОВ', 'ГРАФ ВЯЗЕМСКИЙ', 'СОФЬЯ', 'ДОБРОВ', 'ФОМИН', 'АГАФЬЯ', 'ЛУКЕРЬЯ',
+                 'СТЕПАН', 'ПАРАМОН', 'ВАСИЛИСА', 'АЛЕКСЕЕВ', 'КУЗЬМА', 'ЕРЕМЕЙ', 'ПРОХОР']
+french_names = ['FILIPIN', 'ORONTE', 'ANGELIQUE', 'VALERE', 'LISETTE', 'GERONTE', 'DORINE', 'CLITANDRE',
+                'MARINETTE', 'SGANARELLE', 'MARTINE', 'LUCAS', 'ARISTE', 'BELISE', 'CHRYSALE', 'HENRIETTE']
+russian_words = ['слово', 'речь', 'дом', 'сад', 'любовь', 'честь', 'вот', 'как', 'жизнь', 'сударь', 'да', 'нет']
+french_words = ['amour', 'honneur', 'maison', 'jardin', 'monsieur', 'oui', 'non', 'voici', 'comme', 'vie']
+# the format of the files and the metadata of every play type, see write_corpus
+play_formats = {'txt': '.txt', 'russian_tei': '.xml', 'french_tei': '.xml', 'shakespeare_tei': '.xml',
+                'french_word': '.docx', 'generic_word': '.docx'}
+word_namespace = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+content_types = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                 '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                 '<Default Extension="xml" ContentType="application/xml"/></Types>')
+
+
+def random_words(rng, words, number):
+    return ' '.join(rng.choice(words) for _ in range(number))
+
+
+def scene_plan(rng, cast, acts, scenes):
+    """
+    The function decides which characters are present in every scene and which scenes are extra scenes or scenes
+    without a change of the characters.
+    Params:
+        rng - random.Random used to generate the play.
+        cast - a list of the character names.
+        acts - int, the number of acts.
+        scenes - int, the number of scenes in every act.
+    Returns:
+        plan - a list of acts, where every act is a list of (scene_type, characters) tuples and scene_type is
+               'regular', 'extra' or 'no_change'.
+    """
+    plan = []
+    for _ in range(acts):
+        act = []
+        characters = []
+        for scene in range(scenes):
+            scene_type = 'regular'
+            if scene > 0:
+                scene_type = rng.choices(['regular', 'extra', 'no_change'], [0.7, 0.2, 0.1])[0]
+            if scene_type != 'no_change':
+                characters = rng.sample(cast, rng.randint(1, min(4, len(cast))))
+            act.append((scene_type, list(characters)))
+        plan.append(act)
+
+    return plan
+
+
+def txt_play(rng, size, old_ortho):
+    """
+    The function generates a play in the tagged txt format of text_processing_functions.
+    Params:
+        rng - random.Random used to generate the play.
+        size - a dictionary with the size of the play, see write_corpus.
+        old_ortho - bool, True to use the old Russian orthography.
+    Returns:
+        a string, the text of the play.
+    """
+    cast = russian_names[:size['cast']]
+    act_word, scene_word = ('ДѢЙСТВІЕ', 'ЯВЛЕНІЕ') if old_ortho else ('ДЕЙСТВИЕ', 'ЯВЛЕНИЕ')
+    lines = ['Комедія' if old_ortho else 'Комедия', 'ДѢЙСТВУЮЩІЕ ЛИЦА' if old_ortho else 'ДЕЙСТВУЮЩИЕ ЛИЦА']
+    for number, name in enumerate(cast):
+        line = '{}, {}.'.format(name, random_words(rng, russian_words, 2))
+        if number == len(cast) - 1:
+            line += ' <collective_number 2>'
+        lines.append(line)
+    for act_number, act in enumerate(scene_plan(rng, cast, size['acts'], size['scenes']), 1):
+        lines.append('{} {}'.format(act_word, act_number))
+        for scene_number, (scene_type, characters) in enumerate(act, 1):
+            if scene_type == 'extra':
+                lines.append('<extra_SCENE>')
+            elif scene_type == 'no_change':
+                lines.append('{} {} <no_change_SCENE>'.format(scene_word, scene_number))
+            else:
+                lines.append('{} {}'.format(scene_word, scene_number))
+            lines.append('<cast {}>'.format(', '.join(characters)))
+            stage_directions = rng.randint(0, size['stage_directions'])
+            for _ in range(size['utterances']):
+                speaker = rng.choice(characters)
+                for line_number in range(rng.randint(1, size['verse_lines'])):
+                    stage = ' '
+                    if stage_directions and rng.random() < 0.2:
+                        stage = ' <stage>{}.</stage> '.format(random_words(rng, russian_words, 3))
+                        stage_directions -= 1
+                    line_end = '<end_verse_line_interscene_rhyme>' if rng.random() < 0.05 else '<end_verse_line>'
+                    lines.append('{}{}{}{} {}'.format(speaker + '. ' if line_number == 0 else '',
+                                                      random_words(rng, russian_words, 3), stage,
+                                                      random_words(rng, russian_words, 3), line_end))
+            lines.extend('<stage>{}.</stage>'.format(random_words(rng, russian_words, 4))
+                         for _ in range(stage_directions))
+
+    return '\n'.join(lines) + '\n'
+
+
+def tei_verse_line(rng, words, parts, stage_directions):
+    """
+    The function generates a TEI verse line, which is sometimes split between the speakers and sometimes contains
+    a stage direction.
+    """
+    part = rng.choices(['', ' part="{}"'.format(parts[0]), ' part="{}"'.format(parts[1]),
+                        ' part="{}"'.format(parts[2])], [0.65, 0.15, 0.1, 0.1])[0]
+    stage = ''
+    if stage_directions and rng.random() < 0.2:
+        stage = ' <stage>{}.</stage> '.format(random_words(rng, words, 3))
+
+    return '<l{}>{}{} {}</l>'.format(part, random_words(rng, words, 3), stage, random_words(rng, words, 3)), \
+        bool(stage)
+
+
+def russian_tei_play(rng, size):
+    """
+    The function generates a play in the Russian TEI format of russian_tei_functions.
+    Params:
+        rng - random.Random used to generate the play.
+        size - a dictionary with the size of the play, see write_corpus.
+    Returns:
+        a string, the xml of the play.
+    """
+    cast = [name.title() for name in russian_names[:size['cast']]]
+    ids = {name: 'p{}'.format(number) for number, name in enumerate(cast)}
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>', '<TEI xmlns="http://www.tei-c.org/ns/1.0">',
+           '<teiHeader><fileDesc><titleStmt><title type="main">Пьеса</title>',
+           '<title type="sub">комедия</title><author>Автор Авторов</author></titleStmt></fileDesc>',
+           '<profileDesc><particDesc><listPerson>']
+    for number, name in enumerate(cast):
+        collective_number = '<collective_number>2</collective_number>' if number == len(cast) - 1 else ''
+        xml.append('<person sex="MALE" xml:id="{}"><persName>{}</persName>{}</person>'.format(
+                   ids[name], name, collective_number))
+    xml.append('</listPerson></particDesc><creation><date type="written" when="18{:02d}"/></creation>'
+               '</profileDesc></teiHeader><text><body>'.format(rng.randint(0, 99)))
+    for act_number, act in enumerate(scene_plan(rng, cast, size['acts'], size['scenes']), 1):
+        xml.append('<div type="act"><head>Действие {}</head>'.format(act_number))
+        for scene_number, (scene_type, characters) in enumerate(act, 1):
+            if scene_type == 'extra':
+                xml.append('<div cast="{}" type="extra_scene">'.format(', '.join(characters)))
+            else:
+                xml.append('<div type="scene"><head>Явление {}</head>'.format(scene_number))
+                xml.append('<stage>{}.</stage>'.format('Те же' if scene_type == 'no_change' else
+                                                       ', '.join(characters)))
+            stage_directions = rng.randint(0, size['stage_directions'])
+            for _ in range(size['utterances']):
+                speakers = characters[:2] if len(characters) > 1 and rng.random() < 0.1 else \
+                    [rng.choice(characters)]
+                xml.append('<sp who="{}"><speaker>{}.</speaker>'.format(
+                           ' '.join('#' + ids[speaker] for speaker in speakers), speakers[0]))
+                for _ in range(rng.randint(1, size['verse_lines'])):
+                    line, has_stage = tei_verse_line(rng, russian_words, ['I', 'M', 'F'], stage_directions)
+                    stage_directions -= has_stage
+                    xml.append(line)
+                xml.append('</sp>')
+            xml.extend('<stage>{}.</stage>'.format(random_words(rng, russian_words, 4))
+                       for _ in range(stage_directions))
+            xml.append('</div>')
+        xml.append('</div>')
+    xml.append('</body></text></TEI>')
+
+    return '\n'.join(xml)
+
+
+def french_tei_play(rng, size):
+    """
+    The function generates a play in the French TEI format of french_tei_functions.
+    Params:
+        rng - random.Random used to generate the play.
+        size - a dictionary with the size of the play, see write_corpus.
+    Returns:
+        a string, the xml of the play.
+    """
+    cast = french_names[:size['cast']]
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>', '<TEI>',
+           '<teiHeader><fileDesc><titleStmt><title>Comédie</title><author>Auteur</author></titleStmt></fileDesc>',
+           '</teiHeader><text><front><docTitle><titlePart type="main">La Comédie</titlePart></docTitle>',
+           '<docDate value="16{:02d}">16..</docDate><docAuthor id="MOLIERE">Molière</docAuthor><castList>'.format(
+               rng.randint(0, 99))]
+    # the roles have a sex or a rend attribute after the id, like the roles of the French TEI corpus
+    xml.extend('<castItem><role id="{}" {}="1">{}</role>, {}.</castItem>'.format(
+               name.lower(), 'sex' if number % 2 else 'rend', name, random_words(rng, french_words, 2))
+               for number, name in enumerate(cast))
+    xml.append('</castList></front><body>')
+    for act_number, act in enumerate(scene_plan(rng, cast, size['acts'], size['scenes']), 1):
+        xml.append('<div1 type="act" n="{}"><head>ACTE {}</head>'.format(act_number, act_number))
+        for scene_number, (scene_type, characters) in enumerate(act, 1):
+            if scene_type == 'extra':
+                xml.append('<div2 cast="{}" type="extra_scene">'.format(', '.join(characters)))
+            else:
+                xml.append('<div2 type="scene" n="{}"><head>SCÈNE {}</head>'.format(scene_number, scene_number))
+                xml.append('Les précédents.' if scene_type == 'no_change' else ', '.join(characters) + '.')
+            stage_directions = rng.randint(0, size['stage_directions'])
+            for _ in range(size['utterances']):
+                speakers = characters[:2] if len(characters) > 1 and rng.random() < 0.1 else \
+                    [rng.choice(characters)]
+                xml.append('<sp who="{}"><speaker>{}</speaker>'.format(
+                           ','.join(speaker.lower() for speaker in speakers), speakers[0]))
+                for _ in range(rng.randint(1, size['verse_lines'])):
+                    line, has_stage = tei_verse_line(rng, french_words, ['i', 'm', 'f'], stage_directions)
+                    stage_directions -= has_stage
+                    xml.append(line)
+                xml.append('</sp>')
+            xml.extend('<stage>{}.</stage>'.format(random_words(rng, french_words, 4))
+                       for _ in range(stage_directions))
+            xml.append('</div2>')
+        xml.append('</div1>')
+    xml.append('</body></text></TEI>')
+
+    return '\n'.join(xml)
+
+
+def shakespeare_tei_play(rng, size):
+    """
+    The function generates a play in the Folger Shakespeare TEI format of shakespeare_tei_functions.
+    Params:
+        rng - random.Random used to generate the play.
+        size - a dictionary with the size of the play, see write_corpus.
+    Returns:
+        a string, the xml of the play.
+    """
+    cast = [name.title() for name in french_names[:size['cast']]]
+    ids = {name: name + '_LLL' for name in cast}
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>', '<TEI xmlns="http://www.tei-c.org/ns/1.0">',
+           '<teiHeader><fileDesc><titleStmt><title>Play</title><author>William Shakespeare</author>',
+           '</titleStmt></fileDesc><profileDesc><creation><date type="written" when="15{:02d}"/></creation>'.format(
+               rng.randint(0, 99)),
+           '<particDesc><listPerson>']
+    for number, name in enumerate(cast):
+        if number == len(cast) - 1:
+            xml.append('<personGrp xml:id="{}" sex="MALE"><name>{}</name></personGrp>'.format(ids[name], name))
+        else:
+            xml.append('<person xml:id="{}" sex="MALE"><persName>{}</persName></person>'.format(ids[name], name))
+    xml.append('</listPerson></particDesc></profileDesc></teiHeader><text><body>')
+    for act_number, act in enumerate(scene_plan(rng, cast, size['acts'], size['scenes']), 1):
+        xml.append('<div type="act"><head>Act {}</head>'.format(act_number))
+        for scene_number, (scene_type, characters) in enumerate(act, 1):
+            who = ' '.join('#' + ids[character] for character in characters)
+            if scene_type == 'extra':
+                xml.append('<div cast="{}" type="extra_scene">'.format(who))
+            else:
+                xml.append('<div type="scene"><head>Scene {}</head>'.format(scene_number))
+                xml.append('<stage type="entrance" who="{}">Enter them.</stage>'.format(who))
+            for _ in range(size['utterances']):
+                speakers = characters[:2] if len(characters) > 1 and rng.random() < 0.1 else \
+                    [rng.choice(characters)]
+                xml.append('<sp who="{}"><speaker>{}</speaker>'.format(
+                           ' '.join('#' + ids[speaker] for speaker in speakers), speakers[0]))
+                xml.extend('<l>{}</l>'.format(random_words(rng, french_words, 6))
+                           for _ in range(rng.randint(1, size['verse_lines'])))
+                xml.append('</sp>')
+            xml.extend('<stage type="business">{}.</stage>'.format(random_words(rng, french_words, 4))
+                       for _ in range(rng.randint(0, size['stage_directions'])))
+            xml.append('</div>')
+        xml.append('</div>')
+    xml.append('</body></text></TEI>')
+
+    return '\n'.join(xml)
+
+
+def word_paragraphs(rng, size, french):
+    """
+    The function generates the paragraphs of a play in the French or the generic Word layout.
+    Params:
+        rng - random.Random used to generate the play.
+        size - a dictionary with the size of the play, see write_corpus.
+        french - bool, True for the layout of french_word_functions, False for generic_word_processing_functions.
+    Returns:
+        paragraphs - a list of strings.
+    """
+    cast = french_names[:size['cast']]
+    non_speaking = 'МОЛЧИТ' if french else 'NON_SPEAKING'
+    paragraphs = ['Title', 'LES ACTEURS' if french else 'DRAMATIC CHARACTERS']
+    paragraphs.extend(name + (' 2' if number == len(cast) - 1 else '') for number, name in enumerate(cast))
+    for act_number, act in enumerate(scene_plan(rng, cast, size['acts'], size['scenes']), 1):
+        paragraphs.append(('ACTE {}' if french else 'ACT {}').format(act_number))
+        for scene_number, (scene_type, characters) in enumerate(act, 1):
+            if scene_type == 'extra':
+                paragraphs.append('SCENE -')
+            elif scene_type == 'no_change':
+                paragraphs.append('SCENE {}*'.format(scene_number))
+            else:
+                paragraphs.append('SCENE {}'.format(scene_number))
+            paragraphs.extend(character + (' ' + non_speaking if rng.random() < 0.25 else '')
+                              for character in characters)
+
+    return paragraphs
+
+
+def write_docx(file_name, paragraphs, rng):
+    """
+    The function writes a minimal Word document with the paragraphs and an embedded image, like the images
+    the real documents often contain.
+    """
+    body = ''.join('<w:p><w:r><w:t xml:space="preserve">{}</w:t></w:r></w:p>'.format(escape(paragraph))
+                   for paragraph in paragraphs)
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="{}"><w:body>{}</w:body></w:document>'.format(word_namespace, body))
+    with zipfile.ZipFile(file_name, 'w', zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr('[Content_Types].xml', content_types)
+        docx.writestr('word/document.xml', document)
+        docx.writestr('word/media/image1.png', bytes(rng.getrandbits(8) for _ in range(1 << 15)))
+
+
+def write_corpus(corpus_path, play_format, num_plays, size, seed=0):
+    """
+    The function writes a corpus of synthetic plays and its metadata file.
+    Params:
+        corpus_path - the path of the folder in which the plays are saved, it is created if it does not exist.
+        play_format - a string, one of the keys of play_formats.
+        num_plays - int, the number of plays.
+        size - a dictionary with the size of every play: 'acts', 'scenes' (per act), 'cast', 'utterances'
+               (per scene), 'verse_lines' (the maximum per utterance) and 'stage_directions' (the maximum per scene).
+        seed - int, the seed of the random generator, the same seed generates the same corpus.
+    Returns:
+        metadata_path - the path of the tab-delimited metadata file of the corpus.
+    """
+    rng = random.Random(seed)
+    os.makedirs(corpus_path, exist_ok=True)
+    size = dict(size, cast=min(size['cast'], len(russian_names)))
+    if play_format in ['txt', 'russian_tei']:
+        metadata = ['index\ttitle\tlast_name\tfirst_name\tcreation_date\tfree_iambs\tnum_acts']
+    else:
+        metadata = ['index\ttitle\tlast_name\tfirst_name\tdate']
+    for number in range(num_plays):
+        play_index = {'txt': 'R_', 'russian_tei': 'R_', 'french_tei': 'F_', 'shakespeare_tei': 'S_',
+                      'french_word': 'F_', 'generic_word': 'C_'}[play_format] + str(number)
+        # the French Word documents are named without the prefix of their play index
+        file_name = os.path.join(corpus_path, (str(number) if play_format == 'french_word' else play_index) +
+                                 play_formats[play_format])
+        if play_format in ['txt', 'russian_tei']:
+            metadata.append('{}\tПьеса {}\tАвторов\tИван\t18{:02d}\t{}\t{}'.format(
+                            play_index, number, number % 100, number % 2, size['acts']))
+        else:
+            metadata.append('{}\tPlay {}\tAuthor\tJean\t16{:02d}'.format(play_index, number, number % 100))
+        if play_format.endswith('word'):
+            write_docx(file_name, word_paragraphs(rng, size, play_format == 'french_word'), rng)
+            continue
+        if play_format == 'txt':
+            play = txt_play(rng, size, number % 2 == 1)
+        elif play_format == 'russian_tei':
+            play = russian_tei_play(rng, size)
+        elif play_format == 'french_tei':
+            play = french_tei_play(rng, size)
+        else:
+            play = shakespeare_tei_play(rng, size)
+        with open(file_name, 'w') as file:
+            file.write(play)
+    metadata_path = os.path.join(corpus_path, 'metadata.tsv')
+    with open(metadata_path, 'w') as file:
+        file.write('\n'.join(metadata) + '\n')
+
+    return metadata_path
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+The benchmark measures the time needed to read the status, the cast and the group utterances of every scene of
+synthetic Russian and French TEI plays, and to count the verse-splitting stage directions of every play, with
+the attribute-access functions of the TEI modules (structural) and by slicing the serialized markup of the scenes
+as the TEI modules used to (serialized). Both ways are checked to give the same results.
+"""
+import re
+import sys
+import time
+import argparse
+import tempfile
+from os import listdir
+from player import russian_tei_functions as rtf
+from player import french_tei_functions as ftf
+from player import tei_streaming_functions as tsf
+from player import tei_verse_functions as tvf
+from player import cast_functions as caf
+from player import tei_access_functions as taf
+import synthetic_plays as sp
+
+scene_types = ['scene', 'extra_scene', 'complex_scene']
+speaker_resolver = taf.SpeakerResolver('russian')
+
+
+def serialized_scene_status(scene):
+    scene_str = str(scene)
+    scene_desc = scene_str[scene_str.find('type='):scene_str.find('>')].replace('\"', '').split('=')[-1]
+
+    return 'extra' if scene_desc.count('extra') > 0 else 'regular'
+
+
+def serialized_russian_scene(scene):
+    """
+    The function reads the status, the cast and the group utterances of a Russian scene from its markup.
+    """
+    scene_status = serialized_scene_status(scene)
+    if scene_status.count('extra') != 0 or str(scene).count('complex_scene') != 0:
+        scene_cast = str(scene)[str(scene).find('cast=\"'):str(scene).find('type')].lower()
+    else:
+        scene_cast = scene.find_all('stage')[0].get_text().lower()
+    utterance_dict = {}
+    for utterance in scene.find_all('sp'):
+        if str(utterance).count('#') > 1:
+            speaker_string = str(utterance)[str(utterance).find('#'):str(utterance).find('\">')]
+            for speaker in speaker_string.split(' '):
+                utterance_dict[speaker] = speaker_string
+
+    return scene_status, scene_cast, utterance_dict
+
+
+def structural_russian_scene(scene):
+    scene_status = rtf.get_scene_status(scene)
+
+    whos, _ = speaker_resolver.scene_speakers(scene)
+
+    return scene_status, rtf.identify_scene_cast(scene, scene_status), rtf.check_utterance(whos)
+
+
+def serialized_french_scene(scene):
+    """
+    The function reads the status and the cast of a French scene from its markup.
+    """
+    scene_status = serialized_scene_status(scene)
+    if scene_status.count('extra') != 0 or str(scene).count('complex_scene') != 0:
+        scene_cast = str(scene)[str(scene).find('cast=\"'):str(scene).find('type')].lower()
+    else:
+        scene_cast = str(scene)[str(scene).find('>')+1:str(scene).find('<sp')].lower()
+
+    return scene_status, scene_cast
+
+
+def structural_french_scene(scene):
+    scene_status = ftf.get_scene_status(scene)
+
+    return scene_status, ftf.identify_scene_cast(scene, scene_status, caf.Cast({}))[0]
+
+
+def serialized_verse_splitting(play_soup):
+    total_num = 0
+    for line in re.split('<l>|<l part="I">', str(play_soup))[1:]:
+        end = [i for i in re.finditer(r'</l>', line)][-1].span()[0]
+        total_num += line[:end].count('</stage>')
+
+    return total_num
+
+
+def structural_verse_splitting(play_soup):
+    return tvf.VerseIndex(play_soup).splitting_stage_directions
+
+
+def scene_words(scene_results):
+    """
+    The function reduces the cast strings of the results of a scene to their words, the markup around the names
+    is not compared.
+    """
+    return [re.findall(r'\w+', re.sub(r'<[^>]*>|cast=', ' ', value)) if isinstance(value, str) else value
+            for value in scene_results]
+
+
+def time_scenes(read_scene, scenes, repeats):
+    """
+    The function returns the best time of reading all scenes out of several repeats, and the results.
+    """
+    best_time = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = [read_scene(scene) for scene in scenes]
+        best_time = min(best_time, time.perf_counter() - start)
+
+    return best_time, results
+
+
+def main(raw_args):
+    parser = argparse.ArgumentParser(description='Benchmark of the attribute access of the TEI scenes.')
+    parser.add_argument('-n', '--num_plays', type=int, required=False, default=5,
+                        help='The number of plays of every format.')
+    parser.add_argument('--utterances', type=int, required=False, default=30,
+                        help='The number of utterances in a scene.')
+    parser.add_argument('-r', '--repeats', type=int, required=False, default=3,
+                        help='The number of times every scene is read.')
+    parser.add_argument('--soup', action='store_true', help='Parse the plays with BeautifulSoup.')
+    args = vars(parser.parse_args(raw_args))
+    size = {'acts': 5, 'scenes': 8, 'cast': 12, 'utterances': args['utterances'], 'verse_lines': 4,
+            'stage_directions': 4}
+    readers = {'russian_tei': (serialized_russian_scene, structural_russian_scene),
+               'french_tei': (serialized_french_scene, structural_french_scene)}
+    print('format\tscenes\tserialized_us\tstructural_us\tspeedup\tverse_splitting_speedup')
+    with tempfile.TemporaryDirectory() as corpus_path:
+        for play_format, (serialized, structural) in readers.items():
+            sp.write_corpus(corpus_path + '/' + play_format + '/', play_format, args['num_plays'], size)
+            serialized_time, structural_time, num_scenes, splitting_times = 0, 0, 0, [0, 0]
+            for file in sorted(listdir(corpus_path + '/' + play_format)):
+                if not file.endswith('.xml'):
+                    continue
+                soup = tsf.read_tei(corpus_path + '/' + play_format + '/' + file, not args['soup'])
+                scenes = soup.find_all('div', {'type': scene_types}) + soup.find_all('div2', {'type': scene_types})
+                old_time, old_results = time_scenes(serialized, scenes, args['repeats'])
+                new_time, new_results = time_scenes(structural, scenes, args['repeats'])
+                if list(map(scene_words, old_results)) != list(map(scene_words, new_results)):
+                    print(file, 'ERROR.', 'The scenes are read differently.')
+                serialized_time += old_time
+                structural_time += new_time
+                num_scenes += len(scenes)
+                for index, count in enumerate([serialized_verse_splitting, structural_verse_splitting]):
+                    splitting_times[index] += time_scenes(count, [soup], args['repeats'])[0]
+            print('{}\t{}\t{:.1f}\t{:.1f}\t{:.2f}\t{:.2f}'.format(
+                  play_format, num_scenes, serialized_time / num_scenes * 1e6, structural_time / num_scenes * 1e6,
+                  serialized_time / structural_time, splitting_times[0] / splitting_times[1]))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
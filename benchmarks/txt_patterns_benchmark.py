@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+The benchmark measures the time needed to process each play of a txt corpus. Every play is processed several times
+in the same process, as the plays of a batch are, so the compiled patterns and the cache of the re module are reused
+by the code which keeps them. To compare the current code with an earlier version, e.g., the version before
+the patterns were compiled once per batch, pass the path of a checkout of that version with --baseline_path:
+the same plays are then timed in a separate process which imports the package from that path.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import contextlib
+from os import listdir
+import pandas as pd
+from player import text_processing_functions as tpf
+
+
+def time_play(file_name, metadata_df, input_path, regex_pattern, repeats):
+    """
+    The function returns the best time of processing a play out of several repeats.
+    Params:
+        file_name - a string, name of the file with the play text.
+        metadata_df, input_path, regex_pattern - see tpf.process_play.
+        repeats - int, the number of times the play is processed.
+    Returns:
+        best_time - float, the shortest processing time in seconds.
+    """
+    best_time = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            tpf.process_play(file_name, metadata_df, input_path, regex_pattern)
+        best_time = min(best_time, time.perf_counter() - start)
+
+    return best_time
+
+
+def time_corpus(input_path, metadata_path, repeats):
+    """
+    The function times every play of a corpus with the package imported by this process.
+    Params:
+        input_path, metadata_path - see main.
+        repeats - int, the number of times each play is processed.
+    Returns:
+        times - a dictionary where keys are the file names and values are the best times in seconds or the error
+                messages of the plays which could not be processed.
+    """
+    metadata_df = pd.read_csv(metadata_path, sep='\t')
+    times = {}
+    for file in sorted(f for f in listdir(input_path) if f.count('.txt') > 0):
+        try:
+            times[file] = time_play(input_path + file, metadata_df, input_path, tpf.regex_pattern, repeats)
+        except Exception as exception:
+            times[file] = 'ERROR. {}'.format(exception)
+
+    return times
+
+
+def time_baseline(baseline_path, raw_args):
+    """
+    The function times the corpus with the package in baseline_path, in a separate process.
+    Params:
+        baseline_path - the path to the directory which contains the player package of the baseline.
+        raw_args - the arguments of the benchmark.
+    Returns:
+        times - see time_corpus.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([baseline_path, os.environ.get('PYTHONPATH', '')]))
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--json'] + raw_args, env=env,
+                               capture_output=True, text=True, check=True)
+
+    return json.loads(completed.stdout)
+
+
+def main(raw_args):
+    parser = argparse.ArgumentParser(description='Benchmark of the txt pipeline.')
+    parser.add_argument('-i', '--input_path', type=str, required=True, help='The path which contains the txt files')
+    parser.add_argument('-m', '--metadata_path', type=str, required=True,
+                        help="The path to the metadata tab-delimited tsv file.")
+    parser.add_argument('-r', '--repeats', type=int, required=False, default=5,
+                        help='The number of times each play is processed.')
+    parser.add_argument('-b', '--baseline_path', type=str, required=False,
+                        help='The path to a checkout of an earlier version of the package to compare with.')
+    parser.add_argument('--json', action='store_true', help='Print the times as json, e.g., for the baseline.')
+    args = vars(parser.parse_args(raw_args))
+    times = time_corpus(args['input_path'], args['metadata_path'], args['repeats'])
+    if args['json']:
+        print(json.dumps({'package': tpf.__file__, 'times': times}))
+        return
+    if args['baseline_path'] is None:
+        print('play\tms')
+        for file, play_time in times.items():
+            print(file, play_time if isinstance(play_time, str) else '{:.2f}'.format(play_time * 1000), sep='\t')
+        return
+    baseline = time_baseline(args['baseline_path'], ['-i', args['input_path'], '-m', args['metadata_path'],
+                                                     '-r', str(args['repeats'])])
+    print('baseline package:', baseline['package'])
+    print('play\tbaseline_ms\tcurrent_ms\tspeedup')
+    total_baseline, total_current = 0, 0
+    for file, play_time in times.items():
+        baseline_time = baseline['times'].get(file)
+        if isinstance(play_time, str) or not isinstance(baseline_time, float):
+            print(file, 'ERROR.', play_time, baseline_time)
+            continue
+        total_baseline += baseline_time
+        total_current += play_time
+        print('{}\t{:.2f}\t{:.2f}\t{:.2f}'.format(file, baseline_time * 1000, play_time * 1000,
+                                                  baseline_time / play_time))
+    if total_current > 0:
+        print('total\t{:.2f}\t{:.2f}\t{:.2f}'.format(total_baseline * 1000, total_current * 1000,
+                                                     total_baseline / total_current))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,79 @@
+from player import name_matching_functions as nmf
+
+
+class Cast:
+    """
+    The dramatic characters of a play with the indexes for looking them up, built once per play and shared by
+    the scenes and the features of the play. The characters are looked up by their names as they appear in the cast,
+    by their alternative names (the xml:id in the TEI plays, the names used in the text of the txt plays) and by
+    the lowercased cast names. The collective numbers are resolved to ints.
+    """
+
+    def __init__(self, characters):
+        # the dictionary of the dramatic characters as it is output, see create_character_cast
+        self.characters = characters
+        self.names = list(characters)
+        # the cast name and the alternative names of every character
+        self.possible_names = {}
+        self.by_alternative_name = {}
+        self.by_lowercase_name = {}
+        self.collective_numbers = {}
+        # the number of people every character counts as, e.g., 2 for a character with the collective number 2
+        self.head_counts = {}
+        for name, character in characters.items():
+            alternative_names = character.get('alternative_names')
+            if alternative_names is None:
+                alternative_names = []
+            elif isinstance(alternative_names, str):
+                alternative_names = [alternative_names]
+            self.possible_names[name] = [name] + alternative_names
+            # if several characters share an alternative name, the last one of the cast is found
+            for alternative_name in alternative_names:
+                self.by_alternative_name[alternative_name] = name
+            self.by_lowercase_name[name.lower()] = name
+            collective_number = character.get('collective_number')
+            self.collective_numbers[name] = None if collective_number is None else int(collective_number)
+            self.head_counts[name] = int(collective_number) if collective_number else 1
+        # any name of a character, the cast names come before the alternative names
+        self.by_name = dict(self.by_alternative_name)
+        self.by_name.update((name, name) for name in self.names)
+        self.matcher = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        """
+        The function checks if a name is a cast name or an alternative name of a character.
+        """
+        return name in self.by_name
+
+    def alternative_names(self, name):
+        """
+        The function looks up the alternative names of a character.
+        Params:
+            name - string, the cast name or an alternative name of the character.
+        Returns:
+            alternative_names - the alternative names as they are given in the characters dictionary, e.g., None.
+        """
+        return self.characters[self.by_name[name]]['alternative_names']
+
+    def name_matcher(self):
+        """
+        The function returns the NameMatcher of the cast names, which finds the characters in a scene cast string.
+        """
+        if self.matcher is None:
+            self.matcher = nmf.name_matcher(tuple(self.names))
+
+        return self.matcher
+
+    def count_heads(self, names):
+        """
+        The function counts the people a group of characters stands for, i.e., a character with a collective number
+        counts as that many people.
+        Params:
+            names - an iterable of cast names.
+        Returns:
+            int
+        """
+        return sum(self.head_counts[name] for name in names)
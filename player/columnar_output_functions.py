@@ -0,0 +1,112 @@
+import os
+import json
+import pandas as pd
+from player import play_model_functions as pmf
+
+# the play fields which are stored in the scene and character tables instead of the play table
+nested_fields = ['characters', 'play_summary', 'metadata']
+table_formats = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def check_table_format(table_format):
+    """
+    The function checks that the columnar tables can be written in the given format, so that a missing dependency
+    is reported before any play is processed.
+    Params:
+        table_format - a string, 'parquet' or 'arrow'.
+    """
+    if table_format not in table_formats:
+        raise ValueError('Unknown table format: {}, expected one of {}.'.format(table_format, list(table_formats)))
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError('The columnar output requires pyarrow, install it with: pip install pyarrow')
+
+
+def flat_value(value):
+    """
+    The function stores the lists and dictionaries, e.g., speech_distribution, as json strings, so that every column
+    has a single type.
+    """
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+
+    return value
+
+
+def play_rows(play, play_data):
+    """
+    The function flattens the summary of a play into the rows of the play, scene and character tables.
+    Params:
+        play - a string, the name of the play, i.e., the name of its json file without the extension.
+        play_data - a dictionary, the json summary of the play, or the play data returned by process_play.
+    Returns:
+        play_row - a dictionary with the play info and all play-level features.
+        scene_rows - a list of dictionaries, one per scene, with the scene features.
+        character_rows - a list of dictionaries, one per character in every scene, with the number of utterances of
+                         the character, or 'speaking' / 'non_speaking' for the Word plays.
+    """
+    play_row = {'play': play}
+    for key, value in play_data.items():
+        if key not in nested_fields:
+            play_row[key] = flat_value(value)
+    for key, value in play_data.get('metadata', {}).items():
+        play_row[key] = flat_value(value)
+    scene_rows, character_rows = [], []
+    play_model = pmf.play_model(play_data.get('play_summary', {}))
+    for scene in play_model.scenes:
+        scene_row = {'play': play, 'act': scene.act, 'scene': scene.name}
+        scene_row.update({field: getattr(scene, field) for field in pmf.scene_fields
+                          if getattr(scene, field) is not None})
+        scene_rows.append(scene_row)
+        character_rows.extend({'play': play, 'act': scene.act, 'scene': scene.name, 'character': character,
+                               'utterances': value}
+                              for character, value in play_model.scene_cast_values(scene).items())
+
+    return play_row, scene_rows, character_rows
+
+
+def corpus_tables(json_names):
+    """
+    The function reads the json summaries of a corpus and collects them into three tables.
+    Params:
+        json_names - a list of paths to the json files of the plays.
+    Returns:
+        tables - a dictionary where keys are 'plays', 'scenes' and 'characters' and values are dataframes.
+    """
+    rows = {'plays': [], 'scenes': [], 'characters': []}
+    for json_name in json_names:
+        with open(json_name, 'r') as file:
+            play_data = json.load(file)
+        play = os.path.splitext(os.path.basename(json_name))[0]
+        play_row, scene_rows, character_rows = play_rows(play, play_data)
+        rows['plays'].append(play_row)
+        rows['scenes'].extend(scene_rows)
+        rows['characters'].extend(character_rows)
+    tables = {name: pd.DataFrame(table_rows) for name, table_rows in rows.items()}
+
+    return tables
+
+
+def write_corpus_tables(json_names, output_path, table_format='parquet'):
+    """
+    The function writes the play, scene and character tables of a corpus, one file per table. The arrow files are
+    not compressed, so that they can be memory-mapped when they are read.
+    Params:
+        json_names - a list of paths to the json files of the plays.
+        output_path - directory in which the tables will be saved.
+        table_format - a string, 'parquet' or 'arrow'.
+    Returns:
+        table_names - a list of the paths of the saved tables.
+    """
+    check_table_format(table_format)
+    table_names = []
+    for name, table in corpus_tables(json_names).items():
+        table_name = os.path.join(output_path, 'corpus_' + name + table_formats[table_format])
+        if table_format == 'parquet':
+            table.to_parquet(table_name, index=False)
+        else:
+            table.to_feather(table_name, compression='uncompressed')
+        table_names.append(table_name)
+
+    return table_names
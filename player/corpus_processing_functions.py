@@ -0,0 +1,358 @@
+import io
+import os
+import json
+import queue
+import asyncio
+import argparse
+import threading
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from player import profiling_functions as prf
+from player import play_model_functions as pmf
+
+# the number of files read ahead of the parsing and of the outputs waiting to be written in the asynchronous mode
+queue_size = 8
+# the number of threads reading and writing files in the asynchronous mode
+io_threads = 4
+
+
+def list_files(input_directory, extension):
+    """
+    The function lists the files of a directory with an extension, e.g., '.xml'.
+    Params:
+        input_directory - the path to the directory.
+        extension - a string, the files which contain it in their name are listed.
+    Returns:
+        files - a list of the file names.
+    """
+    with os.scandir(input_directory) as entries:
+        files = [entry.name for entry in entries if entry.name.count(extension) > 0 and entry.is_file()]
+
+    return files
+
+
+def read_file(path):
+    """
+    The helper function reads the content of a file as bytes.
+    """
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def open_file(file_name, content=None, mode='r'):
+    """
+    The function opens a file of the corpus. If the content of the file has already been read, e.g., by the
+    asynchronous pipeline, the content is opened as the file instead.
+    Params:
+        file_name - a string, name of the file.
+        content - the bytes of the file, None to open the file itself.
+        mode - 'r' to read text, 'rb' to read bytes.
+    Returns:
+        a file object.
+    """
+    if content is None:
+        return open(file_name, mode)
+    if mode == 'rb':
+        return io.BytesIO(content)
+
+    return io.TextIOWrapper(io.BytesIO(content))
+
+
+@prf.profiled
+def save_json(json_name, play_data, write=True):
+    """
+    The function serializes the summary of a play to json and saves it. The play model in play_summary is written
+    as the json play summary.
+    Params:
+        json_name - the path of the json file.
+        play_data - a dictionary with the play summary.
+        write - bool, False to return the json text instead of writing it.
+    Returns:
+        json_name - the path of the saved json file, or a (json_name, json_text) tuple if write is False.
+    """
+    json_text = json.dumps(play_data, ensure_ascii=False, indent=2, default=pmf.json_summary)
+    if not write:
+        return json_name, json_text
+    with open(json_name, 'w') as file:
+        file.write(json_text)
+
+    return json_name
+
+
+def write_text(file_name, text):
+    """
+    The helper function writes a text to a file.
+    """
+    with open(file_name, 'w') as file:
+        file.write(text)
+
+    return file_name
+
+
+def run_isolated(process_function, file_name, args):
+    """
+    The function runs process_function for a single file and catches any error it raises, so that one malformed
+    play does not abort the whole batch.
+    Params:
+        process_function - a module-level function which takes a file name followed by args.
+        file_name - a string, name of the file to process.
+        args - a tuple of additional arguments for process_function.
+    Returns:
+        file_name - the name of the processed file.
+        result - whatever process_function returns, None if it failed.
+        error - a string describing the error, None if the file was processed successfully.
+    """
+    try:
+        result = process_function(file_name, *args)
+    except Exception as exception:
+        return file_name, None, '{}: {}'.format(type(exception).__name__, exception)
+
+    return file_name, result, None
+
+
+def run_profiled(process_function, file_name, args, memory=False):
+    """
+    The function runs process_function for a single file like run_isolated and profiles its stages.
+    Params:
+        memory - bool, True to also profile the memory of the play and its stages.
+    Returns:
+        file_name, result, error - see run_isolated.
+        play_profile - the wall and CPU time of the play and of its stages, see prf.profile_play.
+    """
+    with prf.profile_play(memory) as play_profile:
+        file_name, result, error = run_isolated(process_function, file_name, args)
+
+    return file_name, result, error, play_profile
+
+
+def select_runner(report):
+    """
+    The function selects the function which runs process_function for a single file.
+    Params:
+        report - prf.ProfileReport, None not to profile the plays.
+    Returns:
+        run_isolated, or run_profiled if the plays are profiled.
+    """
+    if report is None:
+        return run_isolated
+    if report.memory:
+        return functools.partial(run_profiled, memory=True)
+
+    return run_profiled
+
+
+def collect_profile(report, output):
+    """
+    The function adds the profile of a play returned by run_profiled to the report and returns the output of
+    run_isolated. If report is None, output is the output of run_isolated and it is returned as it is.
+    """
+    if report is None:
+        return output
+    file_name, result, error, play_profile = output
+    report.add(file_name, play_profile)
+
+    return file_name, result, error
+
+
+def check_workers(workers):
+    """
+    The function checks that the number of worker processes is at least 1, e.g., the asynchronous pipeline without
+    workers would wait for the outputs forever.
+    Params:
+        workers - int, the number of worker processes.
+    """
+    if workers < 1:
+        raise ValueError('The number of workers must be at least 1, got {}.'.format(workers))
+
+
+def workers_argument(value):
+    """
+    The function converts the number of worker processes given in the command line to an int, see check_workers.
+    Params:
+        value - string, the command line argument.
+    Returns:
+        workers - int.
+    """
+    workers = int(value)
+    try:
+        check_workers(workers)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+
+    return workers
+
+
+def process_corpus(process_function, files, args=(), workers=1, ordered=True, async_io=False, input_directory='',
+                   report=None):
+    """
+    The function applies process_function to every file of a corpus, either one by one or in a pool of worker
+    processes. Errors are isolated per file.
+    Params:
+        process_function - a module-level function which takes a file name followed by args.
+        files - a list of file names.
+        args - a tuple of additional arguments passed to process_function for every file.
+        workers - int, the number of worker processes. 1 processes the files in the current process,
+                  None uses all available CPUs.
+        ordered - bool, True to yield the results in the order of files, False to yield them as they complete.
+        async_io - bool, True to read and write the files asynchronously, see process_corpus_async.
+        input_directory - the path to the directory with the files, for the asynchronous mode.
+        report - prf.ProfileReport to profile the stages of every play, None not to profile them.
+    Returns:
+        a generator of (file_name, result, error) tuples, see run_isolated.
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    check_workers(workers)
+    if async_io:
+        results = process_corpus_async(process_function, files, input_directory, args, workers, report)
+        yield from in_file_order(results, files) if ordered else results
+        return
+    run = select_runner(report)
+    if workers <= 1 or len(files) <= 1:
+        for file_name in files:
+            yield collect_profile(report, run(process_function, file_name, args))
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as executor:
+        futures = [executor.submit(run, process_function, file_name, args) for file_name in files]
+        if not ordered:
+            futures = as_completed(futures)
+        for future in futures:
+            yield collect_profile(report, future.result())
+
+
+def in_file_order(results, files):
+    """
+    The function yields the results of a corpus in the order of the files. The results which come before the ones of
+    the preceding files are kept until those are yielded.
+    Params:
+        results - an iterable of (file_name, result, error) tuples, e.g., of process_corpus_async.
+        files - a list of file names.
+    Returns:
+        a generator of the results.
+    """
+    pending = {}
+    next_file = 0
+    for result in results:
+        pending[result[0]] = result
+        while next_file < len(files) and files[next_file] in pending:
+            yield pending.pop(files[next_file])
+            next_file += 1
+
+
+async def run_pipeline(process_function, files, input_directory, args, workers, emit, report=None):
+    """
+    The coroutine reads the files, processes them and writes their outputs in three concurrent stages connected by
+    bounded queues. The reading stays at most queue_size files ahead of the processing, and the processing waits
+    when queue_size outputs are waiting to be written. Reading and writing run in a pool of threads, the processing
+    runs in a pool of worker processes, or in a single thread if workers is 1.
+    Params:
+        process_function - a module-level function which takes a file name followed by args, the content of the
+                           file and write=False, and returns a (json_name, json_text) tuple, e.g., tpf.process_file.
+        files - a list of file names.
+        input_directory - the path to the directory with the files.
+        args - a tuple of additional arguments passed to process_function for every file.
+        workers - int, the number of worker processes.
+        emit - a function called with the (file_name, json_name, error) tuple of every file.
+        report - prf.ProfileReport to profile the processing of every play, None not to profile it.
+    """
+    loop = asyncio.get_running_loop()
+    run = select_runner(report)
+    read_queue = asyncio.Queue(maxsize=queue_size)
+    write_queue = asyncio.Queue(maxsize=queue_size)
+    pending_files = iter(files)
+
+    async def read_files():
+        for file_name in pending_files:
+            try:
+                content = await loop.run_in_executor(io_executor, read_file, os.path.join(input_directory, file_name))
+            except OSError as exception:
+                emit((file_name, None, '{}: {}'.format(type(exception).__name__, exception)))
+                continue
+            await read_queue.put((file_name, content))
+
+    async def process_files():
+        while True:
+            item = await read_queue.get()
+            if item is None:
+                break
+            file_name, content = item
+            output = await loop.run_in_executor(process_executor, run, process_function, file_name,
+                                                args + (content, False))
+            await write_queue.put(collect_profile(report, output))
+
+    async def write_files():
+        while True:
+            item = await write_queue.get()
+            if item is None:
+                break
+            file_name, output, error = item
+            if error is None:
+                try:
+                    output = await loop.run_in_executor(io_executor, write_text, *output)
+                except OSError as exception:
+                    output, error = None, '{}: {}'.format(type(exception).__name__, exception)
+            emit((file_name, output, error))
+
+    if workers > 1:
+        process_executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        process_executor = ThreadPoolExecutor(max_workers=1)
+    with ThreadPoolExecutor(max_workers=io_threads) as io_executor, process_executor:
+        readers = [asyncio.ensure_future(read_files()) for _ in range(io_threads)]
+        processors = [asyncio.ensure_future(process_files()) for _ in range(workers)]
+        writers = [asyncio.ensure_future(write_files()) for _ in range(io_threads)]
+        await asyncio.gather(*readers)
+        for _ in processors:
+            await read_queue.put(None)
+        await asyncio.gather(*processors)
+        for _ in writers:
+            await write_queue.put(None)
+        await asyncio.gather(*writers)
+
+
+def process_corpus_async(process_function, files, input_directory, args=(), workers=1, report=None):
+    """
+    The function processes a corpus with the asynchronous pipeline, which overlaps the reading of the files and the
+    writing of the outputs with the processing, e.g., for corpora on network storage. The pipeline runs in
+    a separate thread, and the results are yielded as soon as the outputs are written.
+    Params:
+        process_function, files, input_directory, args, workers, report - see run_pipeline.
+    Returns:
+        a generator of (file_name, json_name, error) tuples, see run_isolated.
+    """
+    check_workers(workers)
+    results = queue.Queue()
+    failures = []
+
+    def run():
+        try:
+            asyncio.run(run_pipeline(process_function, files, input_directory, args, workers, results.put, report))
+        except BaseException as exception:
+            failures.append(exception)
+        finally:
+            results.put(None)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    for result in iter(results.get, None):
+        yield result
+    thread.join()
+    if failures:
+        raise failures[0]
+
+
+def report_failures(processed_files):
+    """
+    The function consumes the output of process_corpus and prints an error for every play that could not be processed.
+    Params:
+        processed_files - an iterable of (file_name, result, error) tuples.
+    Returns:
+        failed_plays - a dictionary where keys are the files that failed and values are the error messages.
+    """
+    failed_plays = {}
+    for file_name, _, error in processed_files:
+        if error is not None:
+            print('\tERROR.', file_name, error)
+            failed_plays[file_name] = error
+
+    return failed_plays
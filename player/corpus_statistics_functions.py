@@ -0,0 +1,117 @@
+import numpy as np
+from player import text_processing_functions as tpf
+from player import french_word_functions as fwf
+from player import play_model_functions as pmf
+
+
+def segment_sums(values, offsets):
+    """
+    The function sums every segment values[offsets[i]:offsets[i+1]] in the same order as np.sum sums a single
+    segment, so that the results match the per-play results exactly. The segments of the same length are summed
+    together as the rows of a matrix.
+    Params:
+        values - a float array.
+        offsets - an int array with the start of every segment, followed by the end of the last segment.
+    Returns:
+        sums - a float array with the sum of every segment, 0 for the empty segments.
+    """
+    lengths = np.diff(offsets)
+    sums = np.zeros(len(lengths))
+    for length in np.unique(lengths[lengths > 0]):
+        segments = np.flatnonzero(lengths == length)
+        sums[segments] = values[offsets[segments][:, None] + np.arange(length)].sum(axis=1)
+
+    return sums
+
+
+def speaking_function(play_model):
+    """
+    The function chooses how the speakers of two scenes without a change of cast are counted in a play:
+    the Word plays mark the characters as 'speaking' or 'non_speaking', the other plays count their utterances.
+    Params:
+        play_model - PlayModel of the play.
+    Returns:
+        speaking_no_change_case - fwf.number_speaking_no_change_case or tpf.number_speaking_no_change_case.
+    """
+    if play_model.labels is not None:
+        return fwf.number_speaking_no_change_case
+
+    return tpf.number_speaking_no_change_case
+
+
+def scene_arrays(play_summaries, speaking_no_change_case=None):
+    """
+    The function collects the number of speakers and the percentage of non-speakers of the scenes of all plays,
+    as Iarkho counts them, into flat arrays.
+    Params:
+        play_summaries - a list of play summaries, either PlayModel, e.g., the play summaries returned by
+                         process_play, or the json play summaries loaded from the json files of the plays.
+        speaking_no_change_case - see tpf.iarkho_scene_statistics, None to choose it for every play, see
+                                  speaking_function.
+    Returns:
+        speakers - an int array with the number of speakers of every scene.
+        perc_non_speakers - a float array with the percentage of non-speakers of every scene.
+        offsets - an int array with the position of the first scene of every play, followed by the number of scenes.
+    """
+    speakers, perc_non_speakers, offsets = [], [], [0]
+    for play_summary in play_summaries:
+        play_model = pmf.play_model(play_summary)
+        play_speakers, play_perc_non_speakers = tpf.iarkho_scene_statistics(
+            play_model, speaking_no_change_case or speaking_function(play_model))
+        speakers.extend(play_speakers)
+        perc_non_speakers.extend(play_perc_non_speakers)
+        offsets.append(len(speakers))
+
+    return np.array(speakers, dtype=np.int64), np.array(perc_non_speakers, dtype=float), np.array(offsets)
+
+
+def iarkho_statistics(speakers, perc_non_speakers, offsets):
+    """
+    The function calculates Iarkho's speech features of all plays of a corpus at once. The results are the same as
+    the ones of tpf.speech_distribution_iarkho and tpf.sigma_iarkho for every play.
+    Params:
+        speakers, perc_non_speakers, offsets - see scene_arrays.
+    Returns:
+        statistics - a dictionary where keys are the features, e.g., sigma_iarkho, and values are arrays with the
+                     feature of every play; speech_distribution is a list with the speech distribution of every play.
+    """
+    num_plays = len(offsets) - 1
+    lengths = np.diff(offsets)
+    plays = np.repeat(np.arange(num_plays), lengths)
+    # the speech distribution of every play as a flat array of the distinct numbers of speakers and their scenes
+    base = int(speakers.max()) + 1 if len(speakers) else 1
+    keys, weights = np.unique(plays * base + speakers, return_counts=True)
+    distribution_plays, variants = np.divmod(keys, base)
+    distribution_offsets = np.searchsorted(distribution_plays, np.arange(num_plays + 1))
+    variants, weights = variants.astype(float), weights.astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        total_scenes = segment_sums(weights, distribution_offsets)
+        mean_variants = segment_sums(variants * weights, distribution_offsets) / total_scenes
+        differences_squared = np.float_power(variants - np.repeat(mean_variants, np.diff(distribution_offsets)), 2)
+        mean_differences = segment_sums(differences_squared * weights, distribution_offsets) / total_scenes
+        statistics = {'speech_distribution': [list(zip(variants[start:end].astype(int).tolist(),
+                                                       weights[start:end].astype(int).tolist()))
+                                              for start, end in zip(distribution_offsets[:-1],
+                                                                    distribution_offsets[1:])]}
+        for feature, selected in [('percentage_monologues', variants == 1), ('percentage_duologues', variants == 2),
+                                  ('percentage_non_duologues', variants != 2),
+                                  ('percentage_above_two_speakers', variants > 2)]:
+            selected_scenes = np.bincount(distribution_plays[selected], weights[selected], minlength=num_plays)
+            statistics[feature] = np.round((selected_scenes / total_scenes) * 100, 2)
+        statistics['av_percentage_non_speakers'] = np.round(segment_sums(perc_non_speakers, offsets) / lengths, 3)
+        statistics['sigma_iarkho'] = np.round(np.float_power(mean_differences, 0.5), 3)
+
+    return statistics
+
+
+def corpus_iarkho_statistics(play_summaries, speaking_no_change_case=None):
+    """
+    The function calculates Iarkho's speech features of the play summaries of a corpus, e.g., to recalculate them
+    from the json files without processing the plays again.
+    Params:
+        play_summaries - a list of play summaries, see scene_arrays.
+        speaking_no_change_case - see scene_arrays.
+    Returns:
+        statistics - see iarkho_statistics.
+    """
+    return iarkho_statistics(*scene_arrays(play_summaries, speaking_no_change_case))
@@ -0,0 +1,92 @@
+import zipfile
+from lxml import etree
+from player import corpus_processing_functions as cpf
+from player import profiling_functions as prf
+
+# the part of a Word Document with the text of the document; the headers, footers and media are not read
+document_part = 'word/document.xml'
+word_namespace = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+paragraph_tag = word_namespace + 'p'
+text_tag = word_namespace + 't'
+# the elements which stand for a character of the text
+character_tags = {word_namespace + 'tab': '\t', word_namespace + 'br': '\n', word_namespace + 'cr': '\n'}
+chunk_size = 1 << 16
+
+
+class ParagraphCollector:
+    """
+    A parser target which collects the text of the paragraphs of a Word Document as the XML is fed to the parser,
+    without building the tree. The text of a paragraph is the text from its start to the start of the next
+    paragraph, i.e., the text of a paragraph within a paragraph, e.g., in a text box, splits the outer paragraph.
+    """
+
+    def __init__(self):
+        # the text before the first paragraph is the first piece of text
+        self.paragraphs = []
+        self.pieces = []
+        self.in_text = False
+
+    def start(self, tag, attrib):
+        if tag == text_tag:
+            self.in_text = True
+        elif tag == paragraph_tag:
+            self.paragraphs.append(''.join(self.pieces))
+            self.pieces = []
+        elif tag in character_tags:
+            self.pieces.append(character_tags[tag])
+
+    def end(self, tag):
+        if tag == text_tag:
+            self.in_text = False
+
+    def data(self, data):
+        if self.in_text:
+            self.pieces.append(data)
+
+    def close(self):
+        self.paragraphs.append(''.join(self.pieces))
+        self.pieces = []
+
+    def pop_paragraphs(self):
+        """
+        The function returns the paragraphs collected since the last call.
+        """
+        paragraphs, self.paragraphs = self.paragraphs, []
+        return paragraphs
+
+
+def iter_paragraphs(file):
+    """
+    The function streams the text of a Word Document out of the zip archive in chunks and parses it with
+    an event-driven XML parser. Only word/document.xml is decompressed.
+    Params:
+        file - a path or a binary file object of the docx file.
+    Returns:
+        a generator of the paragraph texts in the order of the document; the first one is the text before the first
+        paragraph, usually empty.
+    """
+    collector = ParagraphCollector()
+    parser = etree.XMLParser(target=collector, resolve_entities=False, huge_tree=True)
+    with zipfile.ZipFile(file) as docx, docx.open(document_part) as document:
+        for chunk in iter(lambda: document.read(chunk_size), b''):
+            parser.feed(chunk)
+            yield from collector.pop_paragraphs()
+    parser.close()
+    yield from collector.pop_paragraphs()
+
+
+@prf.profiled
+def read_docx(file_name, content=None):
+    """
+    The function extracts the text of a Word Document. The paragraphs are separated by an empty line, as in
+    the text of docx2txt.
+    Params:
+        file_name - a string, name of the docx file.
+        content - the bytes of the file if it has already been read, None to read the file.
+    Returns:
+        text - a string with the text of the document.
+    """
+    with cpf.open_file(file_name, content, 'rb') as file:
+        text = '\n\n'.join(iter_paragraphs(file))
+
+    return text.strip()
@@ -0,0 +1,45 @@
+from player import profiling_functions as prf
+
+
+class FeatureContext:
+    """
+    The per-play context shared by all feature stages of a play. It computes every intermediate result, e.g., the
+    verse lines or the inter-scene verse splits, only once and returns the stored result on later requests.
+    """
+
+    def __init__(self, play, results=None, load_play=None):
+        """
+        Params:
+            play - the play (soup or text), None if it is loaded on the first request.
+            results - a dictionary with the results which are already known, e.g., from the cache of the parsed plays,
+                      where keys are (function, *args) tuples, see compute.
+            load_play - a function without arguments which loads the play if play is None.
+        """
+        self._play = play
+        self.load_play = load_play
+        self.results = dict(results) if results else {}
+
+    @property
+    def play(self):
+        if self._play is None and self.load_play is not None:
+            self._play = self.load_play()
+
+        return self._play
+
+    def compute(self, function, *args):
+        """
+        The function returns the result of function(play, *args), calling the function only the first time the result
+        is requested. The results are shared, so they must not be modified by the feature stages.
+        Params:
+            function - a function which takes the play (soup or text) followed by args.
+            args - hashable additional arguments of the function.
+        Returns:
+            result - the result of the function for the play.
+        """
+        key = (function,) + args
+        if key not in self.results:
+            play = self.play
+            with prf.stage(prf.stage_name(function)):
+                self.results[key] = function(play, *args)
+
+        return self.results[key]
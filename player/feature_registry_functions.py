@@ -0,0 +1,139 @@
+import inspect
+from player import profiling_functions as prf
+
+
+class FeatureStage:
+    """
+    A feature stage is a function which reads some play features from metadata_dict (its inputs) and adds new
+    features to it (its outputs). The function may take any of the arguments available to the registry, e.g.,
+    play_context or play_data, it is called with the ones named in its signature.
+    """
+
+    def __init__(self, function, inputs=(), outputs=()):
+        self.function = function
+        self.name = function.__name__
+        self.stage_name = prf.stage_name(function)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.parameters = [parameter for parameter in inspect.signature(function).parameters
+                           if parameter != 'metadata_dict']
+
+    def run(self, arguments, input_features):
+        """
+        The function runs the stage on a new metadata_dict which contains only the input features of the stage.
+        Params:
+            arguments - a dictionary with the arguments available to the stages.
+            input_features - a dictionary with the features computed by the stages this stage depends on.
+        Returns:
+            features - a dictionary with the features added by the stage.
+        """
+        metadata_dict = {key: input_features[key] for key in self.inputs if key in input_features}
+        with prf.stage(self.stage_name):
+            metadata_dict = self.function(metadata_dict=metadata_dict,
+                                          **{parameter: arguments[parameter] for parameter in self.parameters})
+        features = {key: value for key, value in metadata_dict.items() if key not in self.inputs}
+
+        return features
+
+
+class FeatureRegistry:
+    """
+    The registry of the feature stages of a play type. The stages declare the features they need and the features
+    they produce, so that only the stages needed for the requested features are run.
+    """
+
+    def __init__(self, stages=None):
+        self.stages = list(stages) if stages else []
+
+    def register(self, function, inputs=(), outputs=()):
+        """
+        The function adds a feature stage to the registry. It can be used to add custom features.
+        Params:
+            function - a function which adds its outputs to metadata_dict and returns it.
+            inputs - a list of the features the function reads from metadata_dict.
+            outputs - a list of the features the function adds to metadata_dict.
+        Returns:
+            function - the registered function.
+        """
+        stage = FeatureStage(function, inputs, outputs)
+        for other_stage in self.stages:
+            if other_stage.name == stage.name:
+                raise ValueError('The feature stage {} is already registered.'.format(stage.name))
+            produced_twice = set(other_stage.outputs).intersection(stage.outputs)
+            if produced_twice:
+                raise ValueError('The features {} are already produced by {}.'.format(
+                                 sorted(produced_twice), other_stage.name))
+        self.stages.append(stage)
+
+        return function
+
+    def copy(self):
+        return FeatureRegistry(self.stages)
+
+    def producers(self):
+        return {output: stage for stage in self.stages for output in stage.outputs}
+
+    def select(self, features=None):
+        """
+        The function finds the stages needed to compute the requested features.
+        Params:
+            features - a list of feature or stage names, None for all stages.
+        Returns:
+            stages - a list of the requested stages and the stages they depend on, in the order of registration.
+        """
+        producers = self.producers()
+        stage_names = {stage.name: stage for stage in self.stages}
+        if features is None:
+            required = list(self.stages)
+        else:
+            required = []
+            for feature in features:
+                if feature in producers:
+                    required.append(producers[feature])
+                elif feature in stage_names:
+                    required.append(stage_names[feature])
+                else:
+                    raise ValueError('Unknown feature: {}'.format(feature))
+        selected = set()
+        while required:
+            stage = required.pop()
+            if stage.name in selected:
+                continue
+            selected.add(stage.name)
+            for feature in stage.inputs:
+                if feature not in producers:
+                    raise ValueError('No feature stage produces {}, needed by {}.'.format(feature, stage.name))
+                required.append(producers[feature])
+        stages = [stage for stage in self.stages if stage.name in selected]
+
+        return stages
+
+    def run(self, arguments, features=None):
+        """
+        The function runs the stages needed for the requested features one by one, in the order of registration
+        unless a stage needs the features of a stage registered after it.
+        Params:
+            arguments - a dictionary with the arguments available to the stages, e.g., play_context and play_data.
+            features - a list of feature or stage names to compute, None for all features.
+        Returns:
+            metadata_dict - a dictionary with the computed features in the order the stages were registered.
+        """
+        stages = self.select(features)
+        producers = self.producers()
+        dependencies = {stage.name: {producers[feature].name for feature in stage.inputs} for stage in stages}
+        results = {}
+
+        while len(results) < len(stages):
+            ready = [stage for stage in stages if stage.name not in results and
+                     dependencies[stage.name].issubset(results)]
+            if not ready:
+                raise ValueError('The feature stages {} depend on each other.'.format(
+                                 [stage.name for stage in stages if stage.name not in results]))
+            stage = ready[0]
+            input_features = {key: value for name in dependencies[stage.name] for key, value in results[name].items()}
+            results[stage.name] = stage.run(arguments, input_features)
+        metadata_dict = {}
+        for stage in stages:
+            metadata_dict.update(results[stage.name])
+
+        return metadata_dict
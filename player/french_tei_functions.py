@@ -1,72 +1,170 @@
+import os
 import pandas as pd
-from os import listdir
-from bs4 import BeautifulSoup as bs
-import json
+from collections import Counter
 from player import russian_tei_functions as rtf
 from player import text_processing_functions as tpf
-
-
-def process_all_plays(input_directory, output_path, custom_flag=False, metadata_path=None):
+from player import corpus_processing_functions as cpf
+from player import profiling_functions as prf
+from player import parse_cache_functions as pcf
+from player import manifest_functions as mf
+from player import columnar_output_functions as cof
+from player import metadata_functions as mdf
+from player import tei_streaming_functions as tsf
+from player import tei_access_functions as taf
+from player import cast_functions as caf
+from player import feature_registry_functions as frf
+from player import play_model_functions as pmf
+
+# the metadata columns of a play, in the order add_play_info expects them
+metadata_columns = ['title', 'last_name', 'first_name', 'date']
+
+
+def process_all_plays(input_directory, output_path, custom_flag=False, metadata_path=None, workers=1, ordered=True,
+                      streaming=True, features=None, force=False, columnar_format=None, async_io=False,
+                      cache_path=None, cache_size=pcf.default_cache_size, profile=False,
+                      profile_memory=False):
     """
     The function allows to process all files in a specified directory.
     Params:
         input_directory - the path to the folder containing the txt files
         output_path - directory in which the json summaries will be saved.
         metadata_path - path to the metadata file, a tab-delimited txt file with informtion about all plays.
+        workers - the number of worker processes, 1 processes the plays one by one.
+        ordered - bool, whether the plays are reported in the order of the files or as soon as they are processed.
+        streaming - bool, True to parse the files with the streaming parser, False to use BeautifulSoup.
+        features - a list of the features to compute, None for all features.
+        force - bool, True to process all plays, False to skip the plays which did not change since the last run.
+        columnar_format - 'parquet' or 'arrow' to also save the play, scene and character tables of the corpus,
+                          None for the json files only.
+        async_io - bool, True to read the files and write the json files asynchronously while the plays are
+                   processed, e.g., for corpora on network storage.
+        cache_path - the path to the directory of the cache of the parsed plays, None to parse every play.
+        cache_size - the size limit of the cache of the parsed plays in bytes.
+        profile - bool, True to time the stages of every play and save the report in output_path,
+                  see prf.ProfileReport.
+        profile_memory - bool, True to also trace the peak and the retained memory of every play and of its stages
+                         with tracemalloc, it implies profile. The stages are slower when their memory is traced.
     Returns:
-        no returns, the files will be saved in output_path directory.
-    """
-    all_files = [f for f in listdir(input_directory) if f.count('.xml') > 0]
+        failed_plays - a dictionary with the files that could not be processed and their errors,
+                       the json files will be saved in output_path directory.
+    """
+    report = prf.ProfileReport(profile_memory) if profile or profile_memory else None
+    # fail early on unknown features
+    feature_registry.select(features)
+    if columnar_format:
+        cof.check_table_format(columnar_format)
+    all_files = cpf.list_files(input_directory, '.xml')
     if custom_flag:
-        metadata_df = pd.read_csv(metadata_path, sep='\t')
+        metadata = mdf.read_metadata(metadata_path, metadata_columns)
     else:
-        metadata_df = pd.DataFrame()
-    for file in all_files:
-        play_data_dict = process_play(input_directory + file, metadata_df, custom_flag)
-        json_name = output_path + str(file.replace('.xml', '.json'))
-        with open(json_name, 'w') as fp:
-            json.dump(play_data_dict, fp, ensure_ascii=False, indent=2)
+        metadata = mdf.MetadataIndex(pd.DataFrame())
+    play_indices = {f: f.replace('.xml', '') for f in all_files} if custom_flag else {}
+    invalid_plays = mdf.validate_metadata(metadata, play_indices, metadata_columns)
+    # report the plays without valid metadata before any play is parsed
+    failed_plays = cpf.report_failures((f, None, invalid_plays[f]) for f in all_files if f in invalid_plays)
+    all_files = [f for f in all_files if f not in invalid_plays]
+    entries = mf.play_entries(input_directory, all_files, metadata, play_indices, [custom_flag, streaming, features])
+    cache = pcf.open_cache(cache_path, cache_size)
+    processed_files = cpf.process_corpus(process_file, mf.dirty_plays(output_path, entries, force),
+                                         (input_directory, output_path, metadata, custom_flag, streaming, features,
+                                          cache),
+                                         workers, ordered, async_io, input_directory, report)
+    failed_plays.update(cpf.report_failures(mf.record_plays(output_path, entries, processed_files)))
+    if columnar_format:
+        cof.write_corpus_tables(mf.play_outputs(output_path, all_files), output_path, columnar_format)
+    if report is not None:
+        report.save(os.path.join(output_path, prf.report_name))
+
+    return failed_plays
+
+
+def process_file(file, input_directory, output_path, metadata_df, custom_flag, streaming=True, features=None,
+                 cache=None, content=None, write=True):
+    """
+    The function processes a single file and saves its json summary.
+    Params:
+        file - the name of the xml file in input_directory.
+        input_directory, output_path, metadata_df, custom_flag, streaming, features - see process_all_plays.
+        cache - ParseCache of the parsed plays, None to parse the play.
+        content - the bytes of the file if it has already been read, None to read the file.
+        write - bool, False to return the json text instead of saving it, see cpf.save_json.
+    Returns:
+        json_name - the path of the saved json file.
+    """
+    file_name = os.path.join(input_directory, file)
+    play_data_dict = process_play(file_name, metadata_df, custom_flag, streaming, features, content, cache)
+    json_name = os.path.join(output_path, file.replace('.xml', '.json'))
 
+    return cpf.save_json(json_name, play_data_dict, write)
 
-def process_summary(soup, character_cast_dictionary):
-    act_info = {}
+
+@prf.profiled
+def process_summary(soup, cast):
+    play_model = pmf.PlayModel()
+    speaker_resolver = taf.SpeakerResolver('french')
     acts = soup.find_all('div1', {'type': 'act'})
     for act_num, act in enumerate(acts, 1):
         scenes = act.find_all('div2', {'type': ['scene', 'extra_scene', 'complex_scene']})
-        act_info['act'+'_'+str(act_num)] = parse_scenes(scenes,
-                                                        character_cast_dictionary)
-    return act_info
+        parse_scenes(scenes, cast, speaker_resolver, play_model, play_model.add_act('act'+'_'+str(act_num)))
+    return play_model
 
 
-def process_play(file_name, metadata_df, custom_flag):
+def process_play(file_name, metadata_df, custom_flag, streaming=True, features=None, content=None, cache=None):
     """
     The function parses a txt file and creates a summary with features and metadata for the play.
     Params:
         file_name - a string, name of the file with the play text.
-        metadata_df - a dataframe containing the info about the play.
+        metadata_df - MetadataIndex or a dataframe containing the info about the plays.
+        custom_flag - bool, True if you have to supply your custom play metadata.
+        streaming - bool, True to parse the file with the streaming parser, False to use BeautifulSoup.
+        features - a list of the features to compute, None for all features.
+        content - the bytes of the file if it has already been read, None to read the file.
+        cache - ParseCache of the parsed plays, None to parse the play.
     Returns:
         play_data - a dictionary with detailed play summary by scenes, metadata, and features
     """
     print(file_name)
-    with open(file_name, 'r') as file:
-        soup = bs(file, 'lxml')
     if custom_flag:
         if file_name.count('/') > 0:
             play_index = file_name.split('/')[-1].replace('.xml', '')
         else:
             play_index = file_name.replace('.xml', '')
-        play_meta = metadata_df[metadata_df['index'] == play_index][['title', 'last_name',
-                                                                     'first_name', 'date']].values
+        play_meta = mdf.play_metadata(metadata_df, play_index, metadata_columns)
     else:
         play_meta = []
-    play_data = add_play_info(soup, play_meta, custom_flag)
-    play_data['characters'] = create_character_cast(soup)
-    play_data['play_summary'] = process_summary(soup, play_data['characters'])
-    play_data['metadata'] = additional_metadata(soup, play_data)
+    parsed, play_context = pcf.read_play(cache, file_name, content, [__name__, streaming, custom_flag],
+                                         lambda name, data: tsf.read_tei(name, streaming, data),
+                                         lambda soup: parse_play(soup, custom_flag), play_facts)
+    if custom_flag:
+        play_data = add_play_info(None, play_meta, custom_flag)
+    else:
+        play_data = parsed['play_info']
+    play_data['characters'] = parsed['characters']
+    play_data['play_summary'] = parsed['play_summary']
+    play_data['metadata'] = additional_metadata(play_context, play_data, features)
 
     return play_data
 
 
+def parse_play(soup, custom_flag):
+    """
+    The function extracts the structure of a play which does not depend on the metadata file.
+    Params:
+        soup - the soup of the play.
+        custom_flag - bool, True if the play info is taken from the metadata file, not from the TEI.
+    Returns:
+        parsed - a dictionary with the play info from the TEI (None if custom_flag is True), the dramatic characters
+                 and the play summary.
+    """
+    parsed = {'play_info': None if custom_flag else add_play_info(soup, [])}
+    cast = caf.Cast(create_character_cast(soup))
+    parsed['characters'] = cast.characters
+    parsed['play_summary'] = process_summary(soup, cast)
+
+    return parsed
+
+
+@prf.profiled
 def create_character_cast(play_soup):
     """
     The function creates a dictionary where the keys are dramatic characters and values are their alternative names
@@ -80,12 +178,7 @@ def create_character_cast(play_soup):
     character_dict = {}
     for character_tag in dramatic_characters:
         role = character_tag.find_all('role')
-        tag = str(role[0])
-        if tag.count('sex') > 0:
-            second_break = ' sex'
-        else:
-            second_break = ' rend'
-        xml_id = tag[tag.find('id='):tag.find(second_break)].replace('\"', '').split('=')[-1]
+        xml_id = taf.attribute(role[0], 'id')
         # in case there is a collective number
         collective_number = character_tag.find_all('collective_number')
         if len(collective_number) != 0:
@@ -106,9 +199,7 @@ def get_scene_status(scene):
     Returns:
         scene_status - a string that can be either "regular" or "extra"
     """
-    scene_str = str(scene)
-    scene_desc = scene_str[scene_str.find('type='):scene_str.find('>')].replace('\"', '').split('=')[-1]
-    if scene_desc.count('extra') > 0:
+    if taf.attribute(scene, 'type').count('extra') > 0:
         scene_status = 'extra'
     else:
         scene_status = 'regular'
@@ -116,29 +207,6 @@ def get_scene_status(scene):
     return scene_status
 
 
-def find_speakers(scene):
-    """
-    The function creates a list of the speakers in a scene in the order of their utterances.
-    The number of times a speaker appears in the list corresponds to the number of utterances the speaker makes.
-    Params:
-        scene - a beautiful soup object of the scene xml.
-    Returns:
-        speakers_lst - a list of speakers in the scene.
-    """
-    speakers_lst = []
-    speakers = [utterance['who'] for utterance in scene.find_all('sp')]
-    for speaker in speakers:
-        speaker_count = str(speaker).count(',')
-        # if multiple speakers
-        if speaker_count > 0:
-            multiple_speakers = str(speaker).split(',')
-            [speakers_lst.append(sp.strip()) for sp in multiple_speakers]
-        else:
-            speakers_lst.append(speaker)
-
-    return speakers_lst
-
-
 def check_cast_vs_speakers(scene_cast_lst, speakers, scene):
     """
     The function helps check for errors in the publication when a dramatic character speaks in a particular scene
@@ -157,26 +225,22 @@ def check_cast_vs_speakers(scene_cast_lst, speakers, scene):
         print('\tERROR.', 'Speak but do not appear in scene cast:',
               speaker_set.difference(scene_cast_set),
               'Beginning of the scene:',
-              scene_cast_set, str(scene)[:70])
+              scene_cast_set, taf.markup_prefix(scene, 70))
 
 
-def tackle_name(character_cast_dict, scene_cast, scene):
+def tackle_name(cast, scene_cast, scene):
     """
     The function identifies which dramatic characters appear in the scene cast.
     Params:
-        character_cast_dict - a dictionary with dramatic characters for the play.
+        cast - Cast of the play.
         scene_cast - a string that contains information about the dramatic characters in the scene.
         scene - a string with the text of the scene that is needed to check if we have speakers who are not in cast.
     Returns:
         sorted_characters - a list of dramatic characters that appear in the scene in the order they are given in the
                             scene_cast string.
     """
-    updated_characters = []
-    for name in character_cast_dict.keys():
-        index = scene_cast.find(name.lower())
-        if index != -1:
-            updated_characters.append((name, index))
-    sorted_characters = [element[0] for element in sorted(updated_characters, key=lambda x: x[1])]
+    matches = cast.name_matcher().find_names(scene_cast)
+    sorted_characters = [name for name, _, index in sorted(matches, key=lambda match: match[2])]
 
     return sorted_characters
 
@@ -191,7 +255,7 @@ def count_characters(scene_summary_dict):
         num_speakers - a number of speaking dramatic characters in the scene.
         perc_non_speakers - percentage of non-speaking dramatic characters in the scene.
     """
-    summary = [item for item in scene_summary_dict.items() if item[0] != 'num_utterances' and item[0] != 'num_speakers']
+    summary = list(scene_summary_dict.items())
     num_speakers = len([item[0] for item in summary if item[1] != 0])
     num_non_speakers = len([item[0] for item in summary if item[1] == 0])
     perc_non_speakers = round((num_non_speakers / len(summary)) * 100, 3)
@@ -199,7 +263,7 @@ def count_characters(scene_summary_dict):
     return num_speakers, perc_non_speakers
 
 
-def remove_excluded_characters(character_cast_dict, scene_cast_string, scene):
+def remove_excluded_characters(cast, scene_cast_string, scene):
     """
     The function removes characters who are not present in the scene, as marked by 'excepté', 'moins'.
     Params:
@@ -212,14 +276,14 @@ def remove_excluded_characters(character_cast_dict, scene_cast_string, scene):
         if scene_cast_string.lower().count(marker) > 0:
             excluded_chars_string = scene_cast_string[scene_cast_string.lower().find(marker):]
             scene_cast_string = scene_cast_string[:scene_cast_string.find(marker)]
-            characters_to_exclude = tackle_name(character_cast_dict, excluded_chars_string, scene)
+            characters_to_exclude = tackle_name(cast, excluded_chars_string, scene)
         else:
             characters_to_exclude = []
 
     return scene_cast_string, characters_to_exclude
 
 
-def identify_scene_cast(scene, scene_status, character_cast_dict):
+def identify_scene_cast(scene, scene_status, cast):
     """
     The function parses the scene xml and identifes the string that contains the dramatic characters' who are present
     in the scene as well as the dramatic characters who should be excluded from the cast, i.e., after "excepté" or
@@ -229,18 +293,17 @@ def identify_scene_cast(scene, scene_status, character_cast_dict):
         scene_status - if a scene_status is "extra" or "complex_scene," the character cast would be given in the markup,
                         e.g., cast="FILIPIN, ORONTE," otherwise, it will follow the scene number,
                         e.g., SCENE I. Filipin, Oronte.
-        character_cast_dict - a dictionary where keys are dramatic characters and values are their alterantive names
-                              and collective numbers.
+        cast - Cast of the play.
     Returns:
         scene_cast - a string that contains the dramaric characters present in the scene.
         exluded_characters - a list of characters who should be removed from the scene cast.
     """
-    if scene_status.count('extra') != 0 or str(scene).count('complex_scene') != 0:
-        scene_cast = str(scene)[str(scene).find('cast=\"'):str(scene).find('type')].lower()
+    if scene_status.count('extra') != 0 or taf.attribute(scene, 'type') == 'complex_scene':
+        scene_cast = taf.attribute(scene, 'cast').lower()
     else:
-        scene_cast = str(scene)[str(scene).find('>')+1:str(scene).find('<sp')].lower()
+        scene_cast = taf.text_before(scene, 'sp').lower()
     # remove excluded characters
-    scene_cast, excluded_characters = remove_excluded_characters(character_cast_dict, scene_cast, scene)
+    scene_cast, excluded_characters = remove_excluded_characters(cast, scene_cast, scene)
 
     return scene_cast, excluded_characters
 
@@ -267,21 +330,17 @@ def handle_preceding_scene_characters(scene_cast, previous_cast, characters_curr
     return updated_characters
 
 
-def extract_utterances(character_cast_dict, scene):
+def extract_utterances(cast, speakers):
     """
-    The function identifies all utterances in a scene and creates a list of dramatic characters who
-    make those utterances.
+    The function creates a list of dramatic characters who make the utterances of a scene.
     Params:
-        character_cast_dict - a dictionary where keys are dramatic characters and values are their alterantive names
-                              and collective numbers.
-        scene - a beautiful soup object of the scene xml.
+        cast - Cast of the play, the speakers are looked up by their alternative names.
+        speakers - a list of the speaker ids of the utterances, see SpeakerResolver.scene_speakers.
     Returns:
         utterance_lst - a list of speakers who make utterances in the given scene.
     """
-    # look up by alternative name
-    reverse_dict = dict(zip([val['alternative_names'] for val in character_cast_dict.values()],
-                            character_cast_dict.keys()))
-    utterance_lst = [reverse_dict[name] for name in find_speakers(scene)]
+    by_alternative_name = cast.by_alternative_name
+    utterance_lst = [by_alternative_name[speaker] for speaker in speakers]
 
     return utterance_lst
 
@@ -300,21 +359,23 @@ def count_handler(characters, utterance_lst):
     if len(characters) == 0:
         characters = set(utterance_lst)
     if len(characters) > 1:
+        # tally the speakers once, so that every look up below is O(1)
+        utterance_counts = Counter(utterance_lst)
         for character in characters:
-            scene_info[character] = utterance_lst.count(character)
+            scene_info[character] = utterance_counts[character]
     else:
         scene_info[utterance_lst[0]] = 1
 
     return scene_info
 
 
-def count_utterances(scene, character_cast_dict, previous_cast, scene_status):
+def count_utterances(scene, cast, speaker_resolver, previous_cast, scene_status):
     """
     The function counts the number of utterances each dramatic character makes in a given scene.
     Params:
         scene - a beautiful soup object of the scene xml.
-        character_cast_dict - a dictionary where keys are dramatic characters and values are their alterantive names
-                              and collective numbers.
+        cast - Cast of the play.
+        speaker_resolver - SpeakerResolver of the play.
         characters_current_scene - a list of dramatic characters that are listed for the scene.
         excluded_characters - a list of characters who are listed as exluded.
         scene_status - scene_status - whether a scene is regular or extra.
@@ -322,14 +383,14 @@ def count_utterances(scene, character_cast_dict, previous_cast, scene_status):
         scene_ino - a dictionary where keys are charcters and values are the number of utterances.
     """
     scene_info = {}
-    scene_cast, excluded_characters = identify_scene_cast(scene, scene_status, character_cast_dict)
-    current_scene_characters = tackle_name(character_cast_dict, scene_cast, scene)
+    scene_cast, excluded_characters = identify_scene_cast(scene, scene_status, cast)
+    current_scene_characters = tackle_name(cast, scene_cast, scene)
     # account for dramatic characters from a previous scene re-appearing in the new scene.
     characters = handle_preceding_scene_characters(scene_cast,
                                                    previous_cast,
                                                    current_scene_characters,
                                                    excluded_characters)
-    utterance_lst = extract_utterances(character_cast_dict, scene)
+    utterance_lst = extract_utterances(cast, speaker_resolver.scene_speakers(scene)[1])
     # run a quality check
     check_cast_vs_speakers(characters, utterance_lst, scene)
     # count how many utterances each speaker makes
@@ -338,58 +399,54 @@ def count_utterances(scene, character_cast_dict, previous_cast, scene_status):
     return scene_info, characters
 
 
-def parse_scenes(scenes, character_cast_dictionary):
+@prf.profiled
+def parse_scenes(scenes, cast, speaker_resolver, play_model, act):
     """
-    The function goes through a list of scenes and updates complete_scene_info dictionary with informtion
-    about each scene speaking characters, their utterance counts, and percentage of non-speaking characters.
+    The function goes through a list of scenes and adds each scene to the play model with its speaking characters,
+    their utterance counts, the number of speakers and the percentage of non-speaking characters.
     Params:
         scenes - a list scenes.
-        name_pattern - regex expression for identifying character names.
-        character_cast_dictionary, reverse_character_cast - dictionaries for lookup of alternative names
-                                                            for each dramatic character.
+        cast - Cast of the play for lookup of alternative names for each dramatic character.
+        speaker_resolver - SpeakerResolver of the play.
+        play_model - PlayModel of the play.
+        act - the name of the act of the scenes.
     Returns:
-        complete_scene_info - a dictionary where keys are scenes and values are dramatic characters and their
-                             utternace counts as well as the number of speakers and percentage of non-speakers.
+        play_model - PlayModel updated with the scenes.
     """
-    other_meta_fields = ['num_speakers', 'perc_non_speakers', 'num_utterances']
-    complete_scene_info = {}
-    scene_names = []
+    scene_casts = []
     sc_num = 0
     extra_scene_number = 1
     for scene in scenes:
         scene_status, sc_num, extra_scene_number = rtf.handle_scene_name_and_count(scene, sc_num, extra_scene_number)
         if sc_num != 1:
-            previous_cast = [name for name in complete_scene_info[scene_names[-1]].keys()
-                             if name not in other_meta_fields]
+            previous_cast = scene_casts[-1]
         else:
             previous_cast = []
-        scene_summary, scene_cast = count_utterances(scene, character_cast_dictionary, previous_cast, scene_status)
-        scene_summary['num_utterances'] = sum(list(scene_summary.values()))
-        scene_summary['num_speakers'], scene_summary['perc_non_speakers'] = count_characters(scene_summary)
+        scene_summary, scene_cast = count_utterances(scene, cast, speaker_resolver, previous_cast, scene_status)
+        num_utterances = sum(list(scene_summary.values()))
+        num_speakers, perc_non_speakers = count_characters(scene_summary)
         if float(sc_num) > 1:
-            current_scene = [key for key in scene_summary.keys() if key not in other_meta_fields]
-            scene_status = tpf.check_if_no_change(current_scene, previous_cast, scene_status)
-        complete_scene_info[str(sc_num) + '_' + str(scene_status)] = scene_summary
-        # check to make sure all character names are in scene cast as they appear in the play cast
-        scene_names.append(str(sc_num) + '_' + str(scene_status))
+            scene_status = tpf.check_if_no_change(list(scene_summary), previous_cast, scene_status)
+        play_model.add_scene(act, str(sc_num) + '_' + str(scene_status), scene_summary, num_utterances, num_speakers,
+                             perc_non_speakers)
+        scene_casts.append(list(scene_summary))
 
-    return complete_scene_info
+    return play_model
 
 
 def count_all_verse_lines(soup):
-    all_lines = soup.find_all('l')
-    not_init = soup.find_all('l', {"part": "m"}) + soup.find_all('l', {"part": "i"})
-    num_verse_lines = len([line for line in all_lines if line not in not_init])
+    # the initial and medial parts of a split verse line are not counted as separate verse lines
+    num_verse_lines = len([line for line in soup.find_all('l') if line.get('part') not in ['m', 'i']])
 
     return num_verse_lines
 
 
-def process_features_verse(play_soup, play_data, metadata_dict):
+def process_features_verse(play_context, play_data, metadata_dict):
     """
     Iarkho's features described in the work on Corneille's comedies and tragedies.
     """
-    metadata_dict['total_utterances'] = rtf.total_utterances(play_soup)
-    metadata_dict['num_verse_lines'] = count_all_verse_lines(play_soup)
+    metadata_dict['total_utterances'] = play_context.compute(rtf.total_utterances)
+    metadata_dict['num_verse_lines'] = play_context.compute(count_all_verse_lines)
     metadata_dict['dialogue_vivacity'] = round(
                                              metadata_dict['total_utterances'] /
                                              metadata_dict['num_verse_lines'], 3)
@@ -417,14 +474,30 @@ def add_play_info(soup, metadata, custom_flag=False):
     return play_data
 
 
-def additional_metadata(play_soup, play_data):
+# the intermediate results of the feature stages which are cached with the parsed play
+play_facts = [(rtf.total_utterances,), (count_all_verse_lines,)]
+
+feature_registry = frf.FeatureRegistry()
+feature_registry.register(rtf.process_speakers_features, outputs=tpf.speakers_features)
+feature_registry.register(process_features_verse, outputs=['total_utterances', 'num_verse_lines', 'dialogue_vivacity'])
+feature_registry.register(tpf.percentage_of_scenes_discont_change, inputs=['num_scenes_iarkho'],
+                          outputs=tpf.discont_change_features)
+
+
+def additional_metadata(play_context, play_data, features=None):
     """
-    Process all play features.
+    Process the play features with the stages of feature_registry. The stages share the intermediate results through
+    the play context.
+    Params:
+        play_context - FeatureContext of the soup of the play.
+        play_data - a dictionary with information about the play.
+        features - a list of the features to compute, None for all features.
+    Returns:
+        metadata_dict - a dictionary with the play features.
     """
-    metadata_dict = {}
-    for process in [rtf.process_speakers_features,
-                    process_features_verse,
-                    rtf.percentage_of_scenes_discont_change]:
-        metadata_dict = process(play_soup, play_data, metadata_dict)
+    arguments = {'play_context': play_context, 'play_data': play_data,
+                 'play_model': play_data['play_summary'],
+                 'cast': caf.Cast(play_data['characters'])}
+    metadata_dict = feature_registry.run(arguments, features)
 
     return metadata_dict
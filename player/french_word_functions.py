@@ -1,33 +1,94 @@
-import numpy as np
-import pandas as pd
-import docx2txt
+import os
 import re
-import json
-from os import listdir
-from collections import Counter
-import copy
 from player import text_processing_functions as tpf
-
-
-def process_all_plays(input_directory, output_path, metadata_path):
+from player import corpus_processing_functions as cpf
+from player import profiling_functions as prf
+from player import parse_cache_functions as pcf
+from player import manifest_functions as mf
+from player import columnar_output_functions as cof
+from player import metadata_functions as mdf
+from player import feature_registry_functions as frf
+from player import play_model_functions as pmf
+from player import docx_streaming_functions as dsf
+from player import cast_functions as caf
+
+# the metadata columns of a play, in the order add_play_info expects them
+metadata_columns = ['title', 'last_name', 'first_name', 'date']
+
+
+def process_all_plays(input_directory, output_path, metadata_path, workers=1, ordered=True, features=None,
+                      force=False, columnar_format=None, async_io=False,
+                      cache_path=None, cache_size=pcf.default_cache_size, profile=False,
+                      profile_memory=False):
     """
     The function allows to process all files in a specified directory.
     Params:
         input_directory - the path to the folder containing the txt files
         output_path - directory in which the json summaries will be saved.
         metadata_path - path to the metadata file, a tab-delimited txt file with informtion about all plays.
-        regex_pattern - a regex pattern which identifies dramatic character names.
+        workers - the number of worker processes, 1 processes the plays one by one.
+        ordered - bool, whether the plays are reported in the order of the files or as soon as they are processed.
+        features - a list of the features to compute, None for all features.
+        force - bool, True to process all plays, False to skip the plays which did not change since the last run.
+        columnar_format - 'parquet' or 'arrow' to also save the play, scene and character tables of the corpus,
+                          None for the json files only.
+        async_io - bool, True to read the files and write the json files asynchronously while the plays are
+                   processed, e.g., for corpora on network storage.
+        cache_path - the path to the directory of the cache of the parsed plays, None to parse every play.
+        cache_size - the size limit of the cache of the parsed plays in bytes.
+        profile - bool, True to time the stages of every play and save the report in output_path,
+                  see prf.ProfileReport.
+        profile_memory - bool, True to also trace the peak and the retained memory of every play and of its stages
+                         with tracemalloc, it implies profile. The stages are slower when their memory is traced.
     Returns:
-        no returns, the files will be saved in output_path directory.
+        failed_plays - a dictionary with the files that could not be processed and their errors,
+                       the json files will be saved in output_path directory.
+    """
+    report = prf.ProfileReport(profile_memory) if profile or profile_memory else None
+    # fail early on unknown features
+    feature_registry.select(features)
+    if columnar_format:
+        cof.check_table_format(columnar_format)
+    all_files = cpf.list_files(input_directory, '.docx')
+    metadata = mdf.read_metadata(metadata_path, metadata_columns)
+    play_indices = {f: 'F_' + f.replace('.docx', '').replace('F_', '') for f in all_files}
+    invalid_plays = mdf.validate_metadata(metadata, play_indices, metadata_columns)
+    # report the plays without valid metadata before any play is parsed
+    failed_plays = cpf.report_failures((f, None, invalid_plays[f]) for f in all_files if f in invalid_plays)
+    all_files = [f for f in all_files if f not in invalid_plays]
+    entries = mf.play_entries(input_directory, all_files, metadata, play_indices, [features])
+    cache = pcf.open_cache(cache_path, cache_size)
+    processed_files = cpf.process_corpus(process_file, mf.dirty_plays(output_path, entries, force),
+                                         (input_directory, output_path, metadata, features, cache),
+                                         workers, ordered, async_io, input_directory, report)
+    failed_plays.update(cpf.report_failures(mf.record_plays(output_path, entries, processed_files)))
+    if columnar_format:
+        cof.write_corpus_tables(mf.play_outputs(output_path, all_files), output_path, columnar_format)
+    if report is not None:
+        report.save(os.path.join(output_path, prf.report_name))
+
+    return failed_plays
+
+
+def process_file(file, input_directory, output_path, metadata_df, features=None, cache=None, content=None,
+                 write=True):
     """
-    all_files = [f for f in listdir(input_directory) if f.count('.docx') > 0]
-    metadata_df = pd.read_csv(metadata_path, sep='\t')
-    for file in all_files:
-        print(file)
-        play_data_dict = process_play(input_directory + file, metadata_df, input_directory)
-        json_name = output_path + 'F_' + str(file.replace('.docx', '.json'))
-        with open(json_name, 'w') as fp:
-            json.dump(play_data_dict, fp, ensure_ascii=False, indent=2)
+    The function processes a single file and saves its json summary.
+    Params:
+        file - the name of the Word Document in input_directory.
+        input_directory, output_path, metadata_df, features - see process_all_plays.
+        cache - ParseCache of the parsed plays, None to parse the play.
+        content - the bytes of the file if it has already been read, None to read the file.
+        write - bool, False to return the json text instead of saving it, see cpf.save_json.
+    Returns:
+        json_name - the path of the saved json file.
+    """
+    print(file)
+    file_name = os.path.join(input_directory, file)
+    play_data_dict = process_play(file_name, metadata_df, input_directory, features, content, cache)
+    json_name = os.path.join(output_path, 'F_' + file.replace('.docx', '.json'))
+
+    return cpf.save_json(json_name, play_data_dict, write)
 
 
 def parse_characters(play_text):
@@ -57,39 +118,41 @@ def parse_characters(play_text):
     return characters_summary
 
 
-def speach_analysis(scene_characters, characters_dict):
+def speach_analysis(scene_characters, cast):
     """
     The function counts the number of speaking and non-speaking characters.
     Params:
         scene_characters - a dictionary where keys are dramatic characters who are present in the scene
         and values are 'speaking' or 'non-speaking'.
-        characters_dict - a dictionary with the info about evey dramaic character of the play.
+        cast - Cast of the play.
     Returns:
         speech_dict - the dictionary with the number of speaking and non-speaking characters in the scene.
     """
     speach_dict = {'number_speaking_characters': 0, 'number_non_speaking_characters': 0}
-    characters = [key for key in scene_characters.keys() if key not in ['num_speakers']]
-    for character in characters:
-        collective_num = characters_dict[character]['collective_number']
+    for character in scene_characters:
+        collective_num = cast.collective_numbers[character]
         if scene_characters[character] == 'speaking' and collective_num is None:
             speach_dict['number_speaking_characters'] += 1
         elif scene_characters[character] == 'speaking' and collective_num is not None:
-            speach_dict['number_speaking_characters'] += characters_dict[character]['collective_number']
+            speach_dict['number_speaking_characters'] += collective_num
         elif scene_characters[character] == 'non_speaking':
             speach_dict['number_non_speaking_characters'] += 1
     speach_dict['percentage_non_speaking'] = round((speach_dict['number_non_speaking_characters'] /
-                                                   len(characters)) * 100, 3)
+                                                   len(scene_characters)) * 100, 3)
     return speach_dict
 
 
-def character_parsing(names, characters):
+def character_parsing(names, cast):
     """
     The function processes a scene and counts the number of speaking and non-speaking characters.
     Params:
         names - lines of strings with dramatic character names accompanied by "МОЛЧИТ" in case they are not speaking.
-        characters - a dictionary with the info about evey dramaic character of the play.
+        cast - Cast of the play.
     Returns:
-        scene_characters - the dictionary with the number of speaking and non-speaking characters in the scene.
+        scene_characters - a dictionary where keys are dramatic characters who are present in the scene
+                           and values are 'speaking' or 'non_speaking'.
+        num_speakers - the number of speaking characters in the scene.
+        perc_non_speakers - the percentage of non-speaking characters in the scene.
     """
     scene_characters = {}
     for name in names:
@@ -104,26 +167,29 @@ def character_parsing(names, characters):
         name = name.strip()
         if name.isdigit() is False and name != '':
             scene_characters[name] = speaking_status
-    speech_dict = speach_analysis(scene_characters, characters)
-    scene_characters['num_speakers'] = speech_dict['number_speaking_characters']
-    scene_characters['perc_non_speakers'] = speech_dict['percentage_non_speaking']
+    speech_dict = speach_analysis(scene_characters, cast)
 
-    return scene_characters
+    return scene_characters, speech_dict['number_speaking_characters'], speech_dict['percentage_non_speaking']
 
 
-def parse_scenes(scenes,  characters):
+@prf.profiled
+def parse_scenes(scenes, cast, play_model, act):
     """
-    The function proceses the scenes and creates a scene summary, i.e., a dictionary where keys are scen numbers with
-    statuses, for example "1_regular" and keys are dramatic characters and their speaking statuses
+    The function proceses the scenes and adds them to the play model: the scenes are named by their numbers with
+    statuses, for example "1_regular", and have their dramatic characters and their speaking statuses
     (speaking or non_speaking).
     Scene statuses incluse: regular - if a scene is the same as is given in the publication.
                             extra - if a scene was added by us in the markup indicating an entrace or exit of a
                             dramatic character.
                             no_change - if a scene has the same dramatic characters as the scene before it.
+    Params:
+        scenes - a list of the scene strings.
+        cast - Cast of the play.
+        play_model - PlayModel of the play.
+        act - the name of the act of the scenes.
     Returns:
-        scene_summary - a dictionary where keys are scenes and dramatic characters are values.
+        play_model - PlayModel updated with the scenes.
     """
-    scene_summary = {}
     noise = ['', ' ', '\xa0', '-', '–', '/']
     extra_scene_number = 1
     regular_num = 1
@@ -140,20 +206,24 @@ def parse_scenes(scenes,  characters):
         else:
             scene_name = str(regular_num - 1) + '.' + str(extra_scene_number) + '_extra'
             extra_scene_number += 1
-        scene_summary[scene_name] = character_parsing(names,  characters)
+        scene_characters, num_speakers, perc_non_speakers = character_parsing(names, cast)
+        play_model.add_scene(act, scene_name, scene_characters, num_speakers=num_speakers,
+                             perc_non_speakers=perc_non_speakers)
 
-    return scene_summary
+    return play_model
 
 
+@prf.profiled
 def process_play_summary(play_data, play_text):
-    play_data['characters'] = parse_characters(play_text)
-    play_summary = {}
+    cast = caf.Cast(parse_characters(play_text))
+    play_data['characters'] = cast.characters
+    play_model = pmf.PlayModel(labeled=True)
     noise = ['', ' ', '\xa0', '-', '–', '/']
     acts = [act for act in play_text[play_text.find('ACTE 1'):].split('ACTE') if act not in noise]
     for act_num, act in enumerate(acts, 1):
         scenes = [scene.strip() for scene in act.split('SCENE')][1:]
-        play_summary['act_' + str(act_num)] = parse_scenes(scenes,  play_data['characters'])
-    play_data['play_summary'] = play_summary
+        parse_scenes(scenes, cast, play_model, play_model.add_act('act_' + str(act_num)))
+    play_data['play_summary'] = play_model
 
     return play_data
 
@@ -182,96 +252,34 @@ def number_speaking_no_change_case(previous_scene, no_change_scene):
     return num_speaking, perc_non_speaking
 
 
-def combine_no_change_scenes(play_summary):
-    which_to_exclude = []
-    speakers = []
-    perc_non_speakers = []
-    for act in play_summary.keys():
-        analysed_scenes = []
-        for scene in list(play_summary[act].keys()):
-            if scene.count('no_change') > 0:
-
-                num_speaking, perc_non_speaking = number_speaking_no_change_case(
-                                                  play_summary[act][analysed_scenes[-1]],
-                                                  play_summary[act][scene])
-                speakers.append(num_speaking)
-                perc_non_speakers.append(perc_non_speaking)
-                which_to_exclude.append((act, scene, analysed_scenes[-1]))
-            analysed_scenes.append(scene)
-
-    return which_to_exclude, speakers, perc_non_speakers
-
-
-def preprocess_play_summary(play_summary_copy):
-    values_to_exclude, speakers, perc_non_speakers = combine_no_change_scenes(play_summary_copy)
-    play_summary_updated = tpf.remove_combined_scenes(play_summary_copy, values_to_exclude)
-    for key in play_summary_updated.keys():
-        for scene in play_summary_updated[key]:
-            speakers.append((play_summary_updated[key][scene]['num_speakers']))
-            perc_non_speakers.append(round(play_summary_updated[key][scene]['perc_non_speakers'], 3))
-
-    return speakers, perc_non_speakers
-
-
-def speech_distribution_iarkho(play_summary_copy):
-    """
-    The function creates speech distrubution per Iarkho, i.e., the number of speaking characters by number of scenes.
-    Params:
-        play_summary - a dictionary output by parse_play function.
-    Returns:
-        speech_distribution - a list of tuples were the 0 element is the number of speaking characters
-                              and the 1 element is the number of scenes with such number of speaking characters.
-    """
-    speakers, perc_non_speakers = preprocess_play_summary(play_summary_copy)
-    counter = Counter
-    counted = counter(speakers)
-    speech_distribution = sorted(counted.items(), key=lambda pair: pair[0], reverse=False)
-    speech_types = tpf.percentage_of_each_speech_type(speech_distribution)
-    av_perc_non_speakers = round(np.mean((perc_non_speakers)), 3)
-
-    return speech_distribution, speech_types, av_perc_non_speakers
-
-
-def number_present_characters(play_dictionary):
+def number_present_characters(cast, play_model):
     """
     The function calculates the number of characters present in the play. If a character is listed in cast, but doesn't
-    appear on stage, he/she doesn't count.
+    appear on stage, he/she doesn't count. A character with a collective number counts as that many characters.
     Params:
-        play_dictionary - a dictioanry with data for the play, which includes the characters present in each scene.
+        cast - Cast of the play.
+        play_model - PlayModel of the play summary.
     Returns:
         total_number_present_characters - int.
     """
-    all_present_characters = set()
-    for key in play_dictionary['play_summary'].keys():
-        for scene in play_dictionary['play_summary'][key]:
-            for item in play_dictionary['play_summary'][key][scene].keys():
-                if item != 'num_speakers' and item != 'perc_non_speakers':
-                    all_present_characters.add(item)
-    total_number_present_characters = 0
-    if len(set(all_present_characters).difference(set(play_dictionary['characters']))) > 0:
+    all_present_characters = set(play_model.present_characters())
+    if len(all_present_characters.difference(cast.characters)) > 0:
         print('Error. Incorrect character name present in a scene.')
-    appearing_on_stage = set(play_dictionary['characters']).intersection(all_present_characters)
-    for character in appearing_on_stage:
-        coll_number = play_dictionary['characters'][character]['collective_number']
-        # if there is a collective number for this character
-        if coll_number:
-            total_number_present_characters += int(coll_number)
-        else:
-            total_number_present_characters += 1
+    appearing_on_stage = all_present_characters.intersection(cast.characters)
 
-    return total_number_present_characters
+    return cast.count_heads(appearing_on_stage)
 
 
-def process_speakers_features(play_data, metadata_dict):
+def process_speakers_features(play_model, cast, metadata_dict):
     """
     Iarkho's features described in Iarkho's work on the evolution of 5-act tragedy in verse.
     """
-    metadata_dict['num_present_characters'] = number_present_characters(play_data)
-    scenes = tpf.estimate_number_scenes(play_data['play_summary'])
+    metadata_dict['num_present_characters'] = number_present_characters(cast, play_model)
+    scenes = tpf.estimate_number_scenes(play_model)
     metadata_dict['num_scenes_text'] = scenes[0]
     metadata_dict['num_scenes_iarkho'] = scenes[1]
-    play_summary_copy = copy.deepcopy(play_data['play_summary'])
-    distribution, speech_types, non_speakers = speech_distribution_iarkho(play_summary_copy)
+    distribution, speech_types, non_speakers = tpf.speech_distribution_iarkho(play_model,
+                                                                              number_speaking_no_change_case)
     metadata_dict['speech_distribution'] = distribution
     metadata_dict['percentage_monologues'] = speech_types['perc_monologue']
     metadata_dict['percentage_duologues'] = speech_types['perc_duologue']
@@ -285,34 +293,26 @@ def process_speakers_features(play_data, metadata_dict):
     return metadata_dict
 
 
-def percentage_of_scenes_discont_change(play_data, metadata_dict):
-    number_scenes = metadata_dict['num_scenes_iarkho']
-    characters = []
-    num_scenes_with_disc_character_change = 0
-    for act in play_data['play_summary'].keys():
-        for entry in play_data['play_summary'][act].values():
-            new_cast = [item for item in entry.keys() if
-                        item not in
-                        ['num_speakers', 'perc_non_speakers', 'num_utterances']
-                        ]
-            if len(characters) > 0:
-                if len(set(new_cast).intersection(set(characters[-1]))) == 0:
-                    num_scenes_with_disc_character_change += 1
-            characters.append(new_cast)
-    perc_disc = round((num_scenes_with_disc_character_change / number_scenes) * 100, 3)
-    metadata_dict['number_scenes_with_discontinuous_change_characters'] = num_scenes_with_disc_character_change
-    metadata_dict['percentage_scenes_with_discontinuous_change_characters'] = perc_disc
-
-    return metadata_dict
+feature_registry = frf.FeatureRegistry()
+feature_registry.register(process_speakers_features, outputs=tpf.speakers_features)
+feature_registry.register(tpf.percentage_of_scenes_discont_change, inputs=['num_scenes_iarkho'],
+                          outputs=tpf.discont_change_features)
 
 
-def metadata_processing(play_string, play_data):
+def metadata_processing(play_string, play_data, features=None):
     """
-    Process all play features in stages
+    Process the play features with the stages of feature_registry.
+    Params:
+        play_string - string, play text.
+        play_data - a dictionary with information about the play.
+        features - a list of the features to compute, None for all features.
+    Returns:
+        metadata_dict - a dictionary with the play features.
     """
-    metadata_dict = {}
-    for process in [process_speakers_features, percentage_of_scenes_discont_change]:
-        metadata_dict = process(play_data, metadata_dict)
+    arguments = {'play_string': play_string, 'play_data': play_data,
+                 'play_model': play_data['play_summary'],
+                 'cast': caf.Cast(play_data['characters'])}
+    metadata_dict = feature_registry.run(arguments, features)
 
     return metadata_dict
 
@@ -333,21 +333,38 @@ def add_play_info(metadata):
     return play_data
 
 
-def process_play(file_name, metadata_df,  input_path):
+def process_play(file_name, metadata_df,  input_path, features=None, content=None, cache=None):
     """
     The function parses a txt file and creates a summary with features and metadata for the play.
     Params:
         file_name - a string, name of the file with the play text.
-        metadata_df - a dataframe containing the info about the play.
+        metadata_df - MetadataIndex or a dataframe containing the info about the plays.
+        features - a list of the features to compute, None for all features.
+        content - the bytes of the file if it has already been read, None to read the file.
+        cache - ParseCache of the parsed plays, None to parse the play.
     Returns:
         play_data - a dictionary with detailed play summary by scenes, metadata, and features
     """
-    play_index = file_name.replace(input_path, '').replace('.docx', '').replace('F_', '')
-    play_meta = metadata_df[metadata_df['index'] == 'F_' + play_index][['title', 'last_name',
-                                                                       'first_name', 'date']].values
-    comedy = docx2txt.process(file_name)
+    play_index = os.path.relpath(file_name, input_path).replace('.docx', '').replace('F_', '')
+    play_meta = mdf.play_metadata(metadata_df, 'F_' + play_index, metadata_columns)
+    parsed, _ = pcf.read_play(cache, file_name, content, [__name__], dsf.read_docx, parse_play)
     play_data = add_play_info(play_meta)
-    play_data = process_play_summary(play_data, comedy)
-    play_data['metadata'] = metadata_processing(comedy, play_data)
+    play_data['characters'] = parsed['characters']
+    play_data['play_summary'] = parsed['play_summary']
+    play_data['metadata'] = metadata_processing(parsed['play_string'], play_data, features)
 
     return play_data
+
+
+def parse_play(play_text):
+    """
+    The function extracts the dramatic characters and the play summary of a play.
+    Params:
+        play_text - a string with the play summary.
+    Returns:
+        parsed - a dictionary with the play text, the dramatic characters and the play summary.
+    """
+    parsed = process_play_summary({}, play_text)
+    parsed['play_string'] = play_text
+
+    return parsed
@@ -1,55 +1,133 @@
+import os
 from player import french_word_functions as fwf
-import pandas as pd
-import docx2txt
+from player import corpus_processing_functions as cpf
+from player import profiling_functions as prf
+from player import parse_cache_functions as pcf
+from player import manifest_functions as mf
+from player import columnar_output_functions as cof
+from player import metadata_functions as mdf
+from player import docx_streaming_functions as dsf
+from player import cast_functions as caf
+from player import play_model_functions as pmf
 import re
-import json
-from os import listdir
 
 
-def process_all_plays(input_directory, output_path, metadata_path):
+def process_all_plays(input_directory, output_path, metadata_path, workers=1, ordered=True, features=None,
+                      force=False, columnar_format=None, async_io=False,
+                      cache_path=None, cache_size=pcf.default_cache_size, profile=False,
+                      profile_memory=False):
     """
     The function allows to process all files in a specified directory.
     Params:
         input_directory - the path to the folder containing the txt files
         output_path - directory in which the json summaries will be saved.
         metadata_path - path to the metadata file, a tab-delimited txt file with informtion about all plays.
-        regex_pattern - a regex pattern which identifies dramatic character names.
+        workers - the number of worker processes, 1 processes the plays one by one.
+        ordered - bool, whether the plays are reported in the order of the files or as soon as they are processed.
+        features - a list of the features to compute, None for all features.
+        force - bool, True to process all plays, False to skip the plays which did not change since the last run.
+        columnar_format - 'parquet' or 'arrow' to also save the play, scene and character tables of the corpus,
+                          None for the json files only.
+        async_io - bool, True to read the files and write the json files asynchronously while the plays are
+                   processed, e.g., for corpora on network storage.
+        cache_path - the path to the directory of the cache of the parsed plays, None to parse every play.
+        cache_size - the size limit of the cache of the parsed plays in bytes.
+        profile - bool, True to time the stages of every play and save the report in output_path,
+                  see prf.ProfileReport.
+        profile_memory - bool, True to also trace the peak and the retained memory of every play and of its stages
+                         with tracemalloc, it implies profile. The stages are slower when their memory is traced.
     Returns:
-        no returns, the files will be saved in output_path directory.
+        failed_plays - a dictionary with the files that could not be processed and their errors,
+                       the json files will be saved in output_path directory.
     """
-    all_files = [f for f in listdir(input_directory) if f.count('.docx') > 0]
-    metadata_df = pd.read_csv(metadata_path, sep='\t')
+    report = prf.ProfileReport(profile_memory) if profile or profile_memory else None
+    # fail early on unknown features
+    fwf.feature_registry.select(features)
+    if columnar_format:
+        cof.check_table_format(columnar_format)
+    all_files = cpf.list_files(input_directory, '.docx')
+    metadata = mdf.read_metadata(metadata_path, fwf.metadata_columns)
     # identify what does the beginning of the play indices looks like, e.g., 'F_', 'C_', etc.
-    play_indices_start = ''.join([symbol for symbol in metadata_df['index'][0] if not symbol.isdigit()])
-    for file in all_files:
-        print(file)
-        play_data_dict = process_play(input_directory + file, metadata_df, input_directory, play_indices_start)
-        json_name = output_path + str(file.replace('.docx', '.json'))
-        with open(json_name, 'w') as fp:
-            json.dump(play_data_dict, fp, ensure_ascii=False, indent=2)
+    play_indices_start = ''.join([symbol for symbol in metadata.metadata_df['index'][0] if not symbol.isdigit()])
+    play_indices = {f: play_indices_start + f.replace('.docx', '').replace(play_indices_start, '') for f in all_files}
+    invalid_plays = mdf.validate_metadata(metadata, play_indices, fwf.metadata_columns)
+    # report the plays without valid metadata before any play is parsed
+    failed_plays = cpf.report_failures((f, None, invalid_plays[f]) for f in all_files if f in invalid_plays)
+    all_files = [f for f in all_files if f not in invalid_plays]
+    entries = mf.play_entries(input_directory, all_files, metadata, play_indices, [features])
+    cache = pcf.open_cache(cache_path, cache_size)
+    processed_files = cpf.process_corpus(process_file, mf.dirty_plays(output_path, entries, force),
+                                         (input_directory, output_path, metadata, play_indices_start, features, cache),
+                                         workers, ordered, async_io, input_directory, report)
+    failed_plays.update(cpf.report_failures(mf.record_plays(output_path, entries, processed_files)))
+    if columnar_format:
+        cof.write_corpus_tables(mf.play_outputs(output_path, all_files), output_path, columnar_format)
+    if report is not None:
+        report.save(os.path.join(output_path, prf.report_name))
+
+    return failed_plays
+
+
+def process_file(file, input_directory, output_path, metadata_df, play_indices_start, features=None, cache=None,
+                 content=None, write=True):
+    """
+    The function processes a single file and saves its json summary.
+    Params:
+        file - the name of the Word Document in input_directory.
+        input_directory, output_path, metadata_df, play_indices_start, features - see process_all_plays and
+        process_play.
+        cache - ParseCache of the parsed plays, None to parse the play.
+        content - the bytes of the file if it has already been read, None to read the file.
+        write - bool, False to return the json text instead of saving it, see cpf.save_json.
+    Returns:
+        json_name - the path of the saved json file.
+    """
+    print(file)
+    file_name = os.path.join(input_directory, file)
+    play_data_dict = process_play(file_name, metadata_df, input_directory, play_indices_start, features, content, cache)
+    json_name = os.path.join(output_path, file.replace('.docx', '.json'))
 
+    return cpf.save_json(json_name, play_data_dict, write)
 
-def process_play(file_name, metadata_df,  input_path, play_indices_start):
+
+def process_play(file_name, metadata_df,  input_path, play_indices_start, features=None, content=None, cache=None):
     """
     The function parses a txt file and creates a summary with features and metadata for the play.
     Params:
         file_name - a string, name of the file with the play text.
-        metadata_df - a dataframe containing the info about the play.
+        metadata_df - MetadataIndex or a dataframe containing the info about the plays.
         play_indices_start - a string, the beginning of the play indices looks like, e.g., 'F_', 'C_', etc.
+        features - a list of the features to compute, None for all features.
+        content - the bytes of the file if it has already been read, None to read the file.
+        cache - ParseCache of the parsed plays, None to parse the play.
     Returns:
         play_data - a dictionary with detailed play summary by scenes, metadata, and features
     """
-    play_index = file_name.replace(input_path, '').replace('.docx', '').replace(play_indices_start, '')
-    play_meta = metadata_df[metadata_df['index'] == play_indices_start + play_index][['title', 'last_name',
-                                                                                      'first_name', 'date']].values
-    comedy = docx2txt.process(file_name)
+    play_index = os.path.relpath(file_name, input_path).replace('.docx', '').replace(play_indices_start, '')
+    play_meta = mdf.play_metadata(metadata_df, play_indices_start + play_index, fwf.metadata_columns)
+    parsed, _ = pcf.read_play(cache, file_name, content, [__name__], dsf.read_docx, parse_play)
     play_data = fwf.add_play_info(play_meta)
-    play_data = process_play_summary(play_data, comedy)
-    play_data['metadata'] = fwf.metadata_processing(comedy, play_data)
+    play_data['characters'] = parsed['characters']
+    play_data['play_summary'] = parsed['play_summary']
+    play_data['metadata'] = fwf.metadata_processing(parsed['play_string'], play_data, features)
 
     return play_data
 
 
+def parse_play(play_text):
+    """
+    The function extracts the dramatic characters and the play summary of a play.
+    Params:
+        play_text - a string with the play summary.
+    Returns:
+        parsed - a dictionary with the play text, the dramatic characters and the play summary.
+    """
+    parsed = process_play_summary({}, play_text)
+    parsed['play_string'] = play_text
+
+    return parsed
+
+
 def parse_characters(play_text):
     """
     The function creates a dictionary where the keys are dramatic characters and values
@@ -77,15 +155,18 @@ def parse_characters(play_text):
     return characters_summary
 
 
-def character_parsing(names, characters):
+def character_parsing(names, cast):
     """
     The function processes a scene and counts the number of speaking and non-speaking characters.
     Params:
         names - lines of strings with dramatic character names accompanied by "NON_SPEAKING"
         in case they are not speaking.
-        characters - a dictionary with the info about evey dramaic character of the play.
+        cast - Cast of the play.
     Returns:
-        scene_characters - the dictionary with the number of speaking and non-speaking characters in the scene.
+        scene_characters - a dictionary where keys are dramatic characters who are present in the scene
+                           and values are 'speaking' or 'non_speaking'.
+        num_speakers - the number of speaking characters in the scene.
+        perc_non_speakers - the percentage of non-speaking characters in the scene.
     """
     scene_characters = {}
     for name in names:
@@ -100,26 +181,29 @@ def character_parsing(names, characters):
         name = name.strip()
         if name.isdigit() is False and name != '':
             scene_characters[name] = speaking_status
-    speech_dict = fwf.speach_analysis(scene_characters, characters)
-    scene_characters['num_speakers'] = speech_dict['number_speaking_characters']
-    scene_characters['perc_non_speakers'] = speech_dict['percentage_non_speaking']
+    speech_dict = fwf.speach_analysis(scene_characters, cast)
 
-    return scene_characters
+    return scene_characters, speech_dict['number_speaking_characters'], speech_dict['percentage_non_speaking']
 
 
-def parse_scenes(scenes,  characters):
+@prf.profiled
+def parse_scenes(scenes, cast, play_model, act):
     """
-    The function proceses the scenes and creates a scene summary, i.e., a dictionary where keys are scen numbers with
-    statuses, for example "1_regular" and keys are dramatic characters and their speaking statuses
+    The function proceses the scenes and adds them to the play model: the scenes are named by their numbers with
+    statuses, for example "1_regular", and have their dramatic characters and their speaking statuses
     (speaking or non_speaking).
     Scene statuses incluse: regular - if a scene is the same as is given in the publication.
                             extra - if a scene was added by us in the markup indicating an entrace or exit of a
                             dramatic character.
                             no_change - if a scene has the same dramatic characters as the scene before it.
+    Params:
+        scenes - a list of the scene strings.
+        cast - Cast of the play.
+        play_model - PlayModel of the play.
+        act - the name of the act of the scenes.
     Returns:
-        scene_summary - a dictionary where keys are scenes and dramatic characters are values.
+        play_model - PlayModel updated with the scenes.
     """
-    scene_summary = {}
     noise = ['', ' ', '\xa0', '-', '–', '/']
     extra_scene_number = 1
     regular_num = 1
@@ -136,19 +220,23 @@ def parse_scenes(scenes,  characters):
         else:
             scene_name = str(regular_num - 1) + '.' + str(extra_scene_number) + '_extra'
             extra_scene_number += 1
-        scene_summary[scene_name] = character_parsing(names,  characters)
+        scene_characters, num_speakers, perc_non_speakers = character_parsing(names, cast)
+        play_model.add_scene(act, scene_name, scene_characters, num_speakers=num_speakers,
+                             perc_non_speakers=perc_non_speakers)
 
-    return scene_summary
+    return play_model
 
 
+@prf.profiled
 def process_play_summary(play_data, play_text):
-    play_data['characters'] = parse_characters(play_text)
-    play_summary = {}
+    cast = caf.Cast(parse_characters(play_text))
+    play_data['characters'] = cast.characters
+    play_model = pmf.PlayModel(labeled=True)
     noise = ['', ' ', '\xa0', '-', '–', '/']
     acts = [act for act in play_text[play_text.find('ACT 1'):].split('ACT') if act not in noise]
     for act_num, act in enumerate(acts, 1):
         scenes = [scene.strip() for scene in act.split('SCENE')][1:]
-        play_summary['act_' + str(act_num)] = parse_scenes(scenes,  play_data['characters'])
-    play_data['play_summary'] = play_summary
+        parse_scenes(scenes, cast, play_model, play_model.add_act('act_' + str(act_num)))
+    play_data['play_summary'] = play_model
 
     return play_data
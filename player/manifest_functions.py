@@ -0,0 +1,170 @@
+import os
+import json
+import hashlib
+import player
+from player import metadata_functions as mdf
+
+manifest_name = '.player_manifest.json'
+chunk_size = 1 << 20
+
+
+def file_hash(file_name):
+    """
+    The function calculates the content hash of a file.
+    Params:
+        file_name - a string, name of the file.
+    Returns:
+        a string, the hexadecimal sha256 hash of the file content.
+    """
+    content_hash = hashlib.sha256()
+    with open(file_name, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            content_hash.update(chunk)
+
+    return content_hash.hexdigest()
+
+
+def metadata_row_hash(metadata, play_index):
+    """
+    The function calculates the hash of the metadata rows of a play, including the column names.
+    Params:
+        metadata - MetadataIndex or a dataframe containing the info about the plays.
+        play_index - a string, the index of the play in the metadata, None if the metadata is not used.
+    Returns:
+        a string, the hexadecimal sha256 hash of the rows.
+    """
+    if play_index is None:
+        rows = ''
+    else:
+        rows = mdf.play_rows(metadata, play_index).to_csv(sep='\t', index=False)
+
+    return hashlib.sha256(rows.encode('utf-8')).hexdigest()
+
+
+def options_hash(options):
+    """
+    The function calculates the hash of the processing options which change the json output, e.g., the regex pattern
+    or the requested features.
+    """
+    return hashlib.sha256(json.dumps(options, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+def play_entries(input_directory, files, metadata, play_indices, options):
+    """
+    The function creates the manifest entries of the plays, i.e., everything the json output of a play depends on.
+    Params:
+        input_directory - the path to the folder containing the play files.
+        files - a list of file names in input_directory.
+        metadata - MetadataIndex or a dataframe containing the info about the plays.
+        play_indices - a dictionary where keys are file names and values are the play indices in the metadata.
+        options - a list of the processing options which change the json output.
+    Returns:
+        entries - a dictionary where keys are file names and values are the manifest entries.
+    """
+    options_digest = options_hash(options)
+    entries = {}
+    for file in files:
+        entries[file] = {'source_hash': file_hash(os.path.join(input_directory, file)),
+                         'metadata_hash': metadata_row_hash(metadata, play_indices.get(file)),
+                         'options_hash': options_digest,
+                         'version': player.__version__}
+
+    return entries
+
+
+def load_manifest(output_path):
+    """
+    The function reads the build manifest from output_path. A missing or unreadable manifest is treated as empty,
+    i.e., all plays are processed.
+    """
+    try:
+        with open(os.path.join(output_path, manifest_name), 'r') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        manifest = {}
+
+    return manifest
+
+
+def save_manifest(output_path, manifest):
+    """
+    The function writes the build manifest to output_path, replacing the old manifest only once the new one is
+    completely written.
+    """
+    manifest_path = os.path.join(output_path, manifest_name)
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def is_clean(manifest_entry, entry, output_path):
+    """
+    The function checks if a play has not changed since its json was saved and the json still exists.
+    """
+    if manifest_entry is None or 'output' not in manifest_entry:
+        return False
+    if any(manifest_entry.get(key) != value for key, value in entry.items()):
+        return False
+
+    return os.path.exists(os.path.join(output_path, manifest_entry['output']))
+
+
+def dirty_plays(output_path, entries, force=False):
+    """
+    The function finds the plays which have to be processed, i.e., the new plays and the plays whose file, metadata,
+    processing options or package version changed since the last run.
+    Params:
+        output_path - directory in which the json summaries and the manifest are saved.
+        entries - a dictionary with the manifest entries of the plays, see play_entries.
+        force - bool, True to process all plays.
+    Returns:
+        files - a list of the file names to process.
+    """
+    if force:
+        return list(entries)
+    manifest = load_manifest(output_path)
+    files = [file for file in entries if not is_clean(manifest.get(file), entries[file], output_path)]
+    if len(files) < len(entries):
+        print('Skipping', len(entries) - len(files), 'unchanged plays.')
+
+    return files
+
+
+def record_plays(output_path, entries, processed_files):
+    """
+    The function passes through the output of cpf.process_corpus and records every successfully processed play
+    in the manifest. The manifest is saved when all plays are processed, or the processing is interrupted.
+    Params:
+        output_path - directory in which the json summaries and the manifest are saved.
+        entries - a dictionary with the manifest entries of the plays, see play_entries.
+        processed_files - an iterable of (file_name, json_name, error) tuples.
+    Returns:
+        a generator of the (file_name, json_name, error) tuples.
+    """
+    manifest = load_manifest(output_path)
+    try:
+        for file_name, json_name, error in processed_files:
+            if error is None:
+                manifest[file_name] = dict(entries[file_name], output=os.path.basename(json_name))
+            else:
+                manifest.pop(file_name, None)
+            yield file_name, json_name, error
+    finally:
+        save_manifest(output_path, manifest)
+
+
+def play_outputs(output_path, files):
+    """
+    The function finds the json files of the plays which are recorded in the manifest, i.e., the plays processed
+    in this run and the unchanged plays skipped by it.
+    Params:
+        output_path - directory in which the json summaries and the manifest are saved.
+        files - a list of the file names of the plays.
+    Returns:
+        json_names - a list of the paths of the json files.
+    """
+    manifest = load_manifest(output_path)
+    json_names = [os.path.join(output_path, manifest[file]['output']) for file in files
+                  if 'output' in manifest.get(file, {})]
+
+    return json_names
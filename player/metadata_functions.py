@@ -0,0 +1,105 @@
+import pandas as pd
+
+
+def is_integer(value):
+    try:
+        return not isinstance(value, bool) and float(value).is_integer()
+    except (TypeError, ValueError):
+        return False
+
+
+def is_flag(value):
+    return is_integer(value) and float(value) in [0, 1]
+
+
+# the columns whose values are checked before the plays are processed
+typed_columns = {'num_acts': (is_integer, 'an integer'),
+                 'free_iambs': (is_flag, '0 or 1'),
+                 'creation_date': (is_integer, 'an integer year')}
+
+
+class MetadataIndex:
+    """
+    The metadata of a corpus indexed by the play index, so that the rows of a play are found without scanning
+    the whole table.
+    """
+
+    def __init__(self, metadata_df):
+        self.metadata_df = metadata_df.reset_index(drop=True)
+        if 'index' in self.metadata_df.columns:
+            self.positions = {play_index: list(positions) for play_index, positions in
+                              self.metadata_df.groupby('index', sort=False).indices.items()}
+        else:
+            self.positions = {}
+
+    def __contains__(self, play_index):
+        return play_index in self.positions
+
+    def rows(self, play_index):
+        return self.metadata_df.iloc[self.positions.get(play_index, [])]
+
+
+def read_metadata(metadata_path, columns):
+    """
+    The function reads the tab-delimited metadata file once and indexes it by the play index.
+    Params:
+        metadata_path - path to the metadata file.
+        columns - a list of the columns the plays need.
+    Returns:
+        metadata_index - MetadataIndex of the metadata file.
+    """
+    metadata_df = pd.read_csv(metadata_path, sep='\t')
+    missing_columns = [column for column in ['index'] + columns if column not in metadata_df.columns]
+    if missing_columns:
+        raise ValueError('The metadata file {} has no columns {}.'.format(metadata_path, missing_columns))
+
+    return MetadataIndex(metadata_df)
+
+
+def play_rows(metadata, play_index):
+    """
+    The function finds the metadata rows of a play.
+    Params:
+        metadata - MetadataIndex or a dataframe containing the info about the plays.
+        play_index - a string, the index of the play.
+    Returns:
+        a dataframe with the rows of the play.
+    """
+    if isinstance(metadata, MetadataIndex):
+        return metadata.rows(play_index)
+
+    return metadata[metadata['index'] == play_index]
+
+
+def play_metadata(metadata, play_index, columns):
+    """
+    The function returns the values of the given columns for a play, e.g. play_meta[0][0] is the value of the first
+    column in the first row of the play.
+    """
+    return play_rows(metadata, play_index)[columns].values
+
+
+def validate_metadata(metadata, play_indices, columns):
+    """
+    The function checks that every play has a metadata row and that the typed columns have valid values, so that
+    the problems are reported before any play is parsed.
+    Params:
+        metadata - MetadataIndex of the corpus.
+        play_indices - a dictionary where keys are file names and values are the play indices in the metadata.
+        columns - a list of the columns the plays need.
+    Returns:
+        invalid_plays - a dictionary where keys are the files which cannot be processed and values are the errors.
+    """
+    invalid_plays = {}
+    for file_name, play_index in play_indices.items():
+        if play_index not in metadata:
+            invalid_plays[file_name] = 'MetadataError: no metadata row with index {}'.format(play_index)
+            continue
+        row = metadata.rows(play_index).iloc[0]
+        for column in columns:
+            if column in typed_columns and not typed_columns[column][0](row[column]):
+                invalid_plays[file_name] = 'MetadataError: {} of {} is {}, expected {}'.format(
+                                           column, play_index, row[column], typed_columns[column][1])
+                break
+
+    return invalid_plays
@@ -0,0 +1,100 @@
+from functools import lru_cache
+from collections import deque
+
+
+class NameMatcher:
+    """
+    An Aho-Corasick automaton of the lowercased names of a cast. It finds all occurrences of all names in a scene cast
+    string in a single scan, instead of searching the string once for every name.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.patterns = [name.lower() for name in self.names]
+        # transitions[state] maps a character to the next state, the missing characters lead back to the root
+        self.transitions = [{}]
+        # outputs[state] are the indices and the lengths of the patterns which end in the state
+        self.outputs = [[]]
+        for pattern_index, pattern in enumerate(self.patterns):
+            state = 0
+            for character in pattern:
+                if character not in self.transitions[state]:
+                    self.transitions.append({})
+                    self.outputs.append([])
+                    self.transitions[state][character] = len(self.transitions) - 1
+                state = self.transitions[state][character]
+            if pattern:
+                self.outputs[state].append((pattern_index, len(pattern)))
+        self.build_failure_transitions()
+
+    def build_failure_transitions(self):
+        """
+        The function turns the trie into a deterministic automaton, i.e., adds the transitions of the failure links
+        to every state and merges the outputs of the states the failure links point to.
+        """
+        failures = [0] * len(self.transitions)
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            failure_transitions = self.transitions[failures[state]]
+            for character, next_state in list(self.transitions[state].items()):
+                failures[next_state] = failure_transitions.get(character, 0)
+                queue.append(next_state)
+            self.outputs[state] = self.outputs[state] + self.outputs[failures[state]]
+            for character, next_state in failure_transitions.items():
+                self.transitions[state].setdefault(character, next_state)
+
+    def find_all(self, text):
+        """
+        The function finds the positions of all occurrences of the lowercased names in a text.
+        Params:
+            text - a string, e.g., the cast of a scene.
+        Returns:
+            positions - a list with the start positions of every name in the text, in the order of the names.
+        """
+        positions = [[] for _ in self.patterns]
+        transitions, outputs = self.transitions, self.outputs
+        state = 0
+        for end, character in enumerate(text, 1):
+            state = transitions[state].get(character, 0)
+            if outputs[state]:
+                for pattern_index, length in outputs[state]:
+                    positions[pattern_index].append(end - length)
+        for pattern_index, pattern in enumerate(self.patterns):
+            if not pattern:
+                positions[pattern_index] = list(range(len(text) + 1))
+
+        return positions
+
+    def find_names(self, text):
+        """
+        The function counts the occurrences of every name in a text the way str.count does, i.e., without overlaps.
+        Params:
+            text - a string, e.g., the cast of a scene.
+        Returns:
+            matches - a list of (name, count, first_position) tuples of the names found in the text, in the order
+                      of the names.
+        """
+        matches = []
+        for name, pattern, positions in zip(self.names, self.patterns, self.find_all(text)):
+            if positions:
+                count, next_position = 0, 0
+                for position in positions:
+                    if position >= next_position:
+                        count += 1
+                        next_position = position + max(len(pattern), 1)
+                matches.append((name, count, positions[0]))
+
+        return matches
+
+
+@lru_cache(maxsize=128)
+def name_matcher(names):
+    """
+    The function builds the matcher of a cast once, so that all scenes of a play share it.
+    Params:
+        names - a tuple of the names of the dramatic characters.
+    Returns:
+        NameMatcher of the names.
+    """
+    return NameMatcher(names)
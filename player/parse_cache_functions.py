@@ -0,0 +1,200 @@
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+import functools
+import player
+from player import corpus_processing_functions as cpf
+from player import feature_context_functions as fcf
+from player import profiling_functions as prf
+
+# the version of the cached representations; a change of the parsers or of the play facts which changes them must
+# increase it, so that the old entries are not used
+cache_format = 3
+# the default size limit of the cache in bytes
+default_cache_size = 1 << 30
+entry_extension = '.pickle'
+# the fraction of the size limit which is freed by an eviction; the cache is scanned for the entries to evict only
+# after a process has written as much since its last scan
+eviction_margin = 0.1
+# the bytes written to every cache directory by this process since its last scan, shared by the copies of a
+# ParseCache which a worker process receives with every play
+unscanned_sizes = {}
+
+
+class ParseCache:
+    """
+    An on-disk cache of the parsed plays, e.g., the cast, the play summary and the verse-line and stage-direction
+    facts of a play. An entry is addressed by the hash of the content of the play file and of the parsing options,
+    so the entries stay valid when the metadata, the features or the file names change. Every entry is a separate
+    file which is written under a temporary name and renamed, so the cache can be shared by several worker processes.
+    The least recently used entries are removed when the cache may exceed its size limit, i.e., after every process
+    has written a fraction of the limit, so a write does not scan the whole cache. With several worker processes
+    the cache can exceed its limit by the entries the other processes wrote since their last scan.
+    """
+
+    def __init__(self, directory, max_size=default_cache_size):
+        self.directory = directory
+        self.max_size = max_size
+
+    def key(self, content, options):
+        """
+        The function calculates the key of a play.
+        Params:
+            content - the bytes of the play file.
+            options - a list of the options which change the parsed representation, e.g., the module name.
+        Returns:
+            a string, the hexadecimal sha256 hash of the content, the options and the versions.
+        """
+        key_hash = hashlib.sha256(content)
+        key_hash.update(json.dumps([options, player.__version__, cache_format], default=str).encode('utf-8'))
+
+        return key_hash.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + entry_extension)
+
+    @prf.profiled
+    def get(self, key):
+        """
+        The function reads the entry of a key and marks it as recently used.
+        Returns:
+            the cached value, None if the key is not in the cache or its entry cannot be read.
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                value = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            self.remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return value
+
+    @prf.profiled
+    def put(self, key, value):
+        """
+        The function saves the entry of a key and evicts the least recently used entries if the cache may be too large.
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+                entry_size = file.tell()
+            os.replace(temporary_path, path)
+        except BaseException:
+            self.remove(temporary_path)
+            raise
+        written = unscanned_sizes.get(self.directory)
+        if written is None or written + entry_size > self.max_size * eviction_margin:
+            self.evict()
+        else:
+            unscanned_sizes[self.directory] = written + entry_size
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def entries(self):
+        """
+        The function lists the entries of the cache.
+        Returns:
+            entries - a list of (last use time, size, path) of the entries.
+        """
+        entries = []
+        with os.scandir(self.directory) as directories:
+            for directory in directories:
+                if not directory.is_dir():
+                    continue
+                with os.scandir(directory.path) as files:
+                    for file in files:
+                        if not file.name.endswith(entry_extension):
+                            continue
+                        try:
+                            stat = file.stat()
+                        except FileNotFoundError:
+                            # removed by another process
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, file.path))
+
+        return entries
+
+    def evict(self):
+        """
+        The function removes the least recently used entries until the cache fits in its size limit less
+        the eviction margin, so that the next entries fit until the cache is scanned again.
+        """
+        entries = self.entries()
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size * (1 - eviction_margin):
+                break
+            self.remove(path)
+            size -= entry_size
+        unscanned_sizes[self.directory] = 0
+
+
+def read_play(cache, file_name, content, options, load_play, parse_play, play_facts=()):
+    """
+    The function parses a play or, if the play is in the cache, takes its parsed representation from the cache
+    without parsing the play.
+    Params:
+        cache - ParseCache, None to always parse the play.
+        file_name - a string, name of the file with the play.
+        content - the bytes of the file if it has already been read, None to read the file.
+        options - a list of the options which change the parsed representation, see ParseCache.key.
+        load_play - a function which takes file_name and content and returns the play, e.g., its soup or text.
+        parse_play - a function which takes the play and returns a dictionary with its parsed representation,
+                     e.g., the cast and the play summary.
+        play_facts - a list of (function, *args) tuples, the intermediate results of the feature stages which only
+                     depend on the play, see fcf.FeatureContext.compute. They are cached with the representation.
+    Returns:
+        parsed - the dictionary returned by parse_play.
+        play_context - FeatureContext of the play. If the play was not parsed, the play is loaded only if a feature
+                       stage needs an intermediate result which is not cached.
+    """
+    if cache is None:
+        play = load_play(file_name, content)
+        return parse_play(play), fcf.FeatureContext(play)
+    if content is None:
+        content = cpf.read_file(file_name)
+    key = cache.key(content, options)
+    entry = cache.get(key)
+    if entry is not None:
+        parsed, results = entry
+        return parsed, fcf.FeatureContext(None, results, functools.partial(load_play, file_name, content))
+    play = load_play(file_name, content)
+    parsed = parse_play(play)
+    play_context = fcf.FeatureContext(play)
+    for fact in play_facts:
+        play_context.compute(*fact)
+    cache.put(key, (parsed, {fact: play_context.results[fact] for fact in play_facts}))
+
+    return parsed, play_context
+
+
+def open_cache(cache_path, cache_size=default_cache_size):
+    """
+    The function creates the cache of the parsed plays in cache_path.
+    Params:
+        cache_path - the path to the cache directory, None for no cache.
+        cache_size - the size limit of the cache in bytes.
+    Returns:
+        cache - ParseCache, None if cache_path is None.
+    """
+    if cache_path is None:
+        return None
+    os.makedirs(cache_path, exist_ok=True)
+
+    return ParseCache(cache_path, cache_size)
@@ -0,0 +1,178 @@
+import sys
+from array import array
+from player import profiling_functions as prf
+
+# the keys of a scene in the json play summary which are scene features, not dramatic characters
+scene_fields = ('num_utterances', 'num_speakers', 'perc_non_speakers')
+
+
+class SceneRecord:
+    """
+    A scene of a play: its act and name, the position of its dramatic characters in the character arrays of the play
+    and the scene features. The features a play type does not have are None.
+    """
+    __slots__ = ('act', 'name', 'start', 'end', 'num_utterances', 'num_speakers', 'perc_non_speakers')
+
+    def __init__(self, act, name, start, end, num_utterances=None, num_speakers=None, perc_non_speakers=None):
+        self.act = act
+        self.name = name
+        self.start = start
+        self.end = end
+        self.num_utterances = num_utterances
+        self.num_speakers = num_speakers
+        self.perc_non_speakers = perc_non_speakers
+
+
+class PlayModel:
+    """
+    The play summary: the acts and the scenes of a play with their dramatic characters and scene features.
+    The names of the dramatic characters are interned and stored once, the scenes refer to them by their ids, and
+    the characters of all scenes and their numbers of utterances are kept in two integer arrays of the play.
+    The parsers build the model scene by scene, and it is turned into the json play summary only on output,
+    see to_summary.
+    """
+    __slots__ = ('acts', 'characters', 'character_ids', 'labels', 'scenes', 'scene_characters', 'scene_values')
+
+    def __init__(self, labeled=False):
+        self.acts = []
+        self.characters = []
+        self.character_ids = {}
+        # the labels of the Word plays, e.g., 'speaking' and 'non_speaking', None for the plays with utterance counts
+        self.labels = [] if labeled else None
+        self.scenes = []
+        # the ids of the characters of every scene and their numbers of utterances (or the indices of their labels)
+        self.scene_characters = array('i')
+        self.scene_values = array('i')
+
+    def character_id(self, name):
+        if name not in self.character_ids:
+            self.character_ids[name] = len(self.characters)
+            self.characters.append(sys.intern(name))
+        return self.character_ids[name]
+
+    def label_id(self, label):
+        if label not in self.labels:
+            self.labels.append(sys.intern(label))
+        return self.labels.index(label)
+
+    def add_act(self, act):
+        """
+        The function adds an act to the play, the acts without scenes are kept as well.
+        Params:
+            act - a string, the name of the act, e.g., 'act_1'.
+        Returns:
+            act - the interned name of the act.
+        """
+        act = sys.intern(act)
+        self.acts.append(act)
+        return act
+
+    def add_scene(self, act, name, scene_characters, num_utterances=None, num_speakers=None, perc_non_speakers=None):
+        """
+        The function adds a scene to an act of the play.
+        Params:
+            act - the name of the act, see add_act.
+            name - a string, the name of the scene, e.g., '1_regular'.
+            scene_characters - a dictionary where keys are the dramatic characters of the scene and values are their
+                               numbers of utterances, or 'speaking' / 'non_speaking' for the Word plays.
+            num_utterances, num_speakers, perc_non_speakers - the scene features, None if the play type does not
+                                                              have them.
+        """
+        start = len(self.scene_characters)
+        for character, value in scene_characters.items():
+            self.scene_characters.append(self.character_id(character))
+            self.scene_values.append(value if self.labels is None else self.label_id(value))
+        self.scenes.append(SceneRecord(act, sys.intern(name), start, len(self.scene_characters), num_utterances,
+                                       num_speakers, perc_non_speakers))
+
+    @classmethod
+    @prf.profiled
+    def from_summary(cls, play_summary):
+        """
+        The function creates the model of a json play summary, e.g., the one loaded from the json file of a play.
+        Params:
+            play_summary - a dictionary where keys are acts and values are dictionaries of scenes, where keys are
+                           the dramatic characters and the scene features.
+        Returns:
+            play_model - PlayModel of the play.
+        """
+        labeled = any(isinstance(value, str) for scenes in play_summary.values()
+                      for scene_summary in scenes.values()
+                      for key, value in scene_summary.items() if key not in scene_fields)
+        play_model = cls(labeled)
+        for act, scenes in play_summary.items():
+            act = play_model.add_act(act)
+            for scene, scene_summary in scenes.items():
+                play_model.add_scene(act, scene, {key: value for key, value in scene_summary.items()
+                                                  if key not in scene_fields},
+                                     *[scene_summary.get(field) for field in scene_fields])
+
+        return play_model
+
+    def to_summary(self):
+        """
+        The function creates the json play summary of the model.
+        Returns:
+            play_summary - a dictionary where keys are acts and values are dictionaries of scenes, where keys are
+                           the dramatic characters and the scene features.
+        """
+        play_summary = {act: {} for act in self.acts}
+        for scene in self.scenes:
+            scene_summary = self.scene_cast_values(scene)
+            for field in scene_fields:
+                if getattr(scene, field) is not None:
+                    scene_summary[field] = getattr(scene, field)
+            play_summary[scene.act][scene.name] = scene_summary
+
+        return play_summary
+
+    def act_scenes(self):
+        """
+        The function returns a dictionary where keys are the acts and values are the lists of their scenes.
+        """
+        act_scenes = {act: [] for act in self.acts}
+        for scene in self.scenes:
+            act_scenes[scene.act].append(scene)
+        return act_scenes
+
+    def cast(self, scene):
+        """
+        The function returns the ids of the dramatic characters of a scene.
+        """
+        return self.scene_characters[scene.start:scene.end]
+
+    def scene_cast_values(self, scene):
+        """
+        The function returns a dictionary where keys are the names of the dramatic characters of a scene and values
+        are their numbers of utterances, or their labels for the Word plays.
+        """
+        values = self.scene_values[scene.start:scene.end]
+        if self.labels is not None:
+            values = [self.labels[value] for value in values]
+        return {self.characters[character]: value for character, value in zip(self.cast(scene), values)}
+
+    def present_characters(self):
+        """
+        The function returns the set of the names of the dramatic characters who appear in at least one scene.
+        """
+        return set(self.characters)
+
+
+def play_model(play_summary):
+    """
+    The function returns the model of a play summary, which is either a PlayModel, e.g., the play summary returned by
+    process_play, or a json play summary loaded from the json file of a play.
+    """
+    if isinstance(play_summary, PlayModel):
+        return play_summary
+
+    return PlayModel.from_summary(play_summary)
+
+
+def json_summary(value):
+    """
+    The function is the default of json.dumps for the play data: it turns the play model into the json play summary.
+    """
+    if isinstance(value, PlayModel):
+        return value.to_summary()
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
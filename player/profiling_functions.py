@@ -0,0 +1,301 @@
+import json
+import time
+import threading
+import functools
+import tracemalloc
+from contextlib import contextmanager
+
+# the name of the profiling report in the output directory
+report_name = 'player_profile.json'
+# the timings of the play which is being profiled in this process, None when profiling is off
+active_timings = None
+# the memory tracker of the play which is being profiled in this process, None when the memory is not profiled
+active_memory = None
+timings_lock = threading.Lock()
+# the number of allocation sites recorded for every stage in the memory profiling mode
+memory_sites = 10
+megabyte = 1 << 20
+# the allocations of the profiling itself are not reported as allocation sites
+ignored_site_files = {tracemalloc.__file__, __file__}
+
+
+class MemoryTracker:
+    """
+    The memory allocated by the stages of a play, traced with tracemalloc. The peak memory of a stage is the largest
+    amount of memory allocated during the stage above the memory allocated when it started, the retained memory is
+    the memory the stage allocated and did not free, e.g., its result. The stages may nest, but they must not run
+    concurrently, i.e., the feature stages must run in a single thread. For the stages directly within the play,
+    the allocation sites of the retained memory are recorded as well.
+    """
+
+    def __init__(self, sites=memory_sites):
+        self.sites = sites
+        # the memory allocated when every running stage started, the peak of the stages within it and its snapshot
+        self.stack = []
+
+    def enter(self):
+        current, peak = tracemalloc.get_traced_memory()
+        if self.stack:
+            self.stack[-1][1] = max(self.stack[-1][1], peak)
+        snapshot = tracemalloc.take_snapshot() if self.sites and len(self.stack) == 1 else None
+        tracemalloc.reset_peak()
+        self.stack.append([current, current, snapshot])
+
+    def exit(self):
+        """
+        The function ends the innermost running stage.
+        Returns:
+            memory - a dictionary with the peak and the retained memory of the stage in bytes and, for the stages
+                     directly within the play, the allocation sites of the retained memory.
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        start, child_peak, snapshot = self.stack.pop()
+        peak = max(peak, child_peak)
+        if self.stack:
+            self.stack[-1][1] = max(self.stack[-1][1], peak)
+        memory = {'peak_memory': peak - start, 'retained_memory': current - start}
+        if snapshot is not None:
+            memory['sites'] = top_sites(snapshot, self.sites)
+
+        return memory
+
+
+def top_sites(snapshot, number):
+    """
+    The function finds the lines of code which allocated the most memory since the snapshot and did not free it.
+    Params:
+        snapshot - tracemalloc.Snapshot.
+        number - int, the number of sites.
+    Returns:
+        sites - a dictionary where keys are the sites (file:line) and values are the allocated bytes and blocks.
+    """
+    sites = {}
+    # the statistics are sorted by the absolute difference, the freed memory is skipped
+    for statistic in tracemalloc.take_snapshot().compare_to(snapshot, 'lineno'):
+        if len(sites) == number:
+            break
+        frame = statistic.traceback[0]
+        if statistic.size_diff > 0 and frame.filename not in ignored_site_files:
+            sites['{}:{}'.format(frame.filename, frame.lineno)] = {'size': statistic.size_diff,
+                                                                   'count': statistic.count_diff}
+
+    return sites
+
+
+def stage_name(function):
+    """
+    The function names a stage after its function, e.g., russian_tei_functions.create_character_cast.
+    """
+    return '{}.{}'.format(function.__module__.rsplit('.', 1)[-1], function.__qualname__)
+
+
+def add_timing(timings, name, wall_time, cpu_time, memory=None):
+    with timings_lock:
+        timing = timings.setdefault(name, {'calls': 0, 'wall': 0.0, 'cpu': 0.0})
+        timing['calls'] += 1
+        timing['wall'] += wall_time
+        timing['cpu'] += cpu_time
+        if memory is not None:
+            timing['peak_memory'] = max(timing.get('peak_memory', 0), memory['peak_memory'])
+            timing['retained_memory'] = timing.get('retained_memory', 0) + memory['retained_memory']
+            for site, allocated in memory.get('sites', {}).items():
+                site_total = timing.setdefault('sites', {}).setdefault(site, {'size': 0, 'count': 0})
+                site_total['size'] += allocated['size']
+                site_total['count'] += allocated['count']
+
+
+def start_stage():
+    """
+    The function starts timing a stage and, in the memory profiling mode, tracing its memory.
+    Returns:
+        start - the wall and CPU time when the stage started.
+    """
+    if active_memory is not None:
+        active_memory.enter()
+
+    return time.perf_counter(), time.thread_time()
+
+
+def end_stage(timings, name, start):
+    wall_time, cpu_time = time.perf_counter() - start[0], time.thread_time() - start[1]
+    memory = active_memory.exit() if active_memory is not None else None
+    add_timing(timings, name, wall_time, cpu_time, memory)
+
+
+@contextmanager
+def stage(name):
+    """
+    The context manager records the wall and CPU time of a stage of the play which is being profiled. The time of
+    a stage includes the time of the stages within it. It does nothing if profiling is off.
+    Params:
+        name - a string, name of the stage.
+    """
+    timings = active_timings
+    if timings is None:
+        yield
+        return
+    start = start_stage()
+    try:
+        yield
+    finally:
+        end_stage(timings, name, start)
+
+
+def profiled(function):
+    """
+    The decorator marks a function as a pipeline stage, the calls of which are timed when profiling is on.
+    """
+    name = stage_name(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        timings = active_timings
+        if timings is None:
+            return function(*args, **kwargs)
+        start = start_stage()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            end_stage(timings, name, start)
+
+    return wrapper
+
+
+@contextmanager
+def profile_play(memory=False):
+    """
+    The context manager turns profiling on in the current process while a play is processed.
+    Params:
+        memory - bool, True to also trace the memory allocated by the play and its stages with tracemalloc.
+    Returns:
+        play_profile - a dictionary which is filled with the wall and CPU time of the play ('wall', 'cpu') and
+                       of its stages ('stages', where keys are the stage names and values are the number of calls,
+                       the wall and the CPU time). In the memory profiling mode, the play and every stage also have
+                       their peak memory and the memory they retained in bytes, see MemoryTracker.
+    """
+    global active_timings, active_memory
+    play_profile = {'wall': 0.0, 'cpu': 0.0, 'stages': {}}
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if memory:
+        active_memory = MemoryTracker()
+        active_memory.enter()
+    active_timings = play_profile['stages']
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        yield play_profile
+    finally:
+        play_profile['wall'] = time.perf_counter() - wall_start
+        play_profile['cpu'] = time.thread_time() - cpu_start
+        active_timings = None
+        if memory:
+            play_profile.update(active_memory.exit())
+            active_memory = None
+        if started_tracing:
+            tracemalloc.stop()
+
+
+class ProfileReport:
+    """
+    The profiles of the plays of a corpus, aggregated by stage.
+    """
+
+    def __init__(self, memory=False):
+        # True if the memory of the plays is profiled, see profile_play
+        self.memory = memory
+        self.plays = {}
+        self.start = time.perf_counter()
+
+    def add(self, file_name, play_profile):
+        if play_profile is not None:
+            self.plays[file_name] = play_profile
+
+    def stages(self):
+        """
+        The function aggregates the timings of the stages across the corpus.
+        Returns:
+            stages - a dictionary where keys are the stage names, in the order of their total wall time, and values
+                     are the number of plays and calls, the total, mean and maximum wall time per play, the play with
+                     the maximum wall time and the total CPU time. In the memory profiling mode, also the maximum peak
+                     memory per play, the play with the maximum peak memory, the total retained memory and the top
+                     allocation sites of the retained memory.
+        """
+        stages = {}
+        for file_name, play_profile in self.plays.items():
+            for name, timing in play_profile['stages'].items():
+                total = stages.setdefault(name, {'plays': 0, 'calls': 0, 'wall': 0.0, 'cpu': 0.0,
+                                                 'max_wall': 0.0, 'max_wall_play': None})
+                total['plays'] += 1
+                total['calls'] += timing['calls']
+                total['wall'] += timing['wall']
+                total['cpu'] += timing['cpu']
+                if timing['wall'] >= total['max_wall']:
+                    total['max_wall'], total['max_wall_play'] = timing['wall'], file_name
+                if 'peak_memory' in timing:
+                    if timing['peak_memory'] >= total.get('max_peak_memory', 0):
+                        total['max_peak_memory'], total['max_peak_memory_play'] = timing['peak_memory'], file_name
+                    total['retained_memory'] = total.get('retained_memory', 0) + timing['retained_memory']
+                for site, allocated in timing.get('sites', {}).items():
+                    site_total = total.setdefault('sites', {}).setdefault(site, {'size': 0, 'count': 0})
+                    site_total['size'] += allocated['size']
+                    site_total['count'] += allocated['count']
+        for total in stages.values():
+            total['mean_wall'] = total['wall'] / total['plays']
+            if 'sites' in total:
+                total['sites'] = dict(sorted(total['sites'].items(), key=lambda item: item[1]['size'],
+                                             reverse=True)[:memory_sites])
+
+        return dict(sorted(stages.items(), key=lambda item: item[1]['wall'], reverse=True))
+
+    def report(self):
+        """
+        The function creates the machine-readable report of the corpus.
+        Returns:
+            report - a dictionary with the total wall time of the corpus, the total wall and CPU time of the plays,
+                     the stages aggregated across the corpus (see stages) and the profile of every play. In the memory
+                     profiling mode, also the maximum peak memory of a play and the play with it, e.g., to size
+                     the worker pool.
+        """
+        report = {'corpus_wall': time.perf_counter() - self.start,
+                  'plays_wall': sum(play_profile['wall'] for play_profile in self.plays.values()),
+                  'plays_cpu': sum(play_profile['cpu'] for play_profile in self.plays.values()),
+                  'num_plays': len(self.plays),
+                  'stages': self.stages(),
+                  'plays': self.plays}
+        if self.memory and self.plays:
+            max_play = max(self.plays, key=lambda file_name: self.plays[file_name]['peak_memory'])
+            report['max_peak_memory'] = self.plays[max_play]['peak_memory']
+            report['max_peak_memory_play'] = max_play
+
+        return report
+
+    def save(self, report_path):
+        """
+        The function saves the report as json and prints the timings of the stages.
+        Params:
+            report_path - the path of the json file.
+        Returns:
+            report - see report.
+        """
+        report = self.report()
+        with open(report_path, 'w') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print('Profile of {} plays: {:.3f} s processing the plays, {:.3f} s in total.'.format(
+              report['num_plays'], report['plays_wall'], report['corpus_wall']))
+        if 'max_peak_memory' in report:
+            print('Maximum peak memory of a play: {:.1f} MB ({}).'.format(
+                  report['max_peak_memory'] / megabyte, report['max_peak_memory_play']))
+        header = '\t{:<66}{:>8}{:>12}{:>12}{:>12}'.format('stage', 'calls', 'wall, s', 'cpu, s', 'max wall, s')
+        if self.memory:
+            header += '{:>14}{:>14}'.format('max peak, MB', 'retained, MB')
+        print(header)
+        for name, total in report['stages'].items():
+            line = '\t{:<66}{:>8}{:>12.3f}{:>12.3f}{:>12.3f}'.format(name, total['calls'], total['wall'],
+                                                                     total['cpu'], total['max_wall'])
+            if 'max_peak_memory' in total:
+                line += '{:>14.2f}{:>14.2f}'.format(total['max_peak_memory'] / megabyte,
+                                                    total['retained_memory'] / megabyte)
+            print(line)
+
+        return report
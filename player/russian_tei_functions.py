@@ -1,14 +1,29 @@
+import os
 import pandas as pd
-from os import listdir
 import string
-from bs4 import BeautifulSoup as bs
-import json
-import re
-import copy
+from collections import Counter
 from player import text_processing_functions as tpf
-
-
-def process_all_plays(input_directory, output_path, custom_flag=False, metadata_path=None):
+from player import corpus_processing_functions as cpf
+from player import profiling_functions as prf
+from player import parse_cache_functions as pcf
+from player import manifest_functions as mf
+from player import columnar_output_functions as cof
+from player import metadata_functions as mdf
+from player import tei_streaming_functions as tsf
+from player import tei_access_functions as taf
+from player import tei_verse_functions as tvf
+from player import cast_functions as caf
+from player import feature_registry_functions as frf
+from player import play_model_functions as pmf
+
+# the metadata columns of a play, in the order add_play_info expects them
+metadata_columns = ['title', 'last_name', 'first_name', 'creation_date', 'free_iambs']
+
+
+def process_all_plays(input_directory, output_path, custom_flag=False, metadata_path=None, workers=1, ordered=True,
+                      streaming=True, features=None, force=False, columnar_format=None, async_io=False,
+                      cache_path=None, cache_size=pcf.default_cache_size, profile=False,
+                      profile_memory=False):
     """
     The function allows to process all files in a specified directory.
     Params:
@@ -16,68 +31,148 @@ def process_all_plays(input_directory, output_path, custom_flag=False, metadata_
         output_path - directory in which the json summaries will be saved.
         metadata_path - path to the metadata file, a tab-delimited txt file with informtion about all plays.
         custom_flag - bool, True if you have to supply your custom play metadata, False - to use DraCor's metadata.
+        workers - the number of worker processes, 1 processes the plays one by one.
+        ordered - bool, whether the plays are reported in the order of the files or as soon as they are processed.
+        streaming - bool, True to parse the files with the streaming parser, False to use BeautifulSoup.
+        features - a list of the features to compute, None for all features.
+        force - bool, True to process all plays, False to skip the plays which did not change since the last run.
+        columnar_format - 'parquet' or 'arrow' to also save the play, scene and character tables of the corpus,
+                          None for the json files only.
+        async_io - bool, True to read the files and write the json files asynchronously while the plays are
+                   processed, e.g., for corpora on network storage.
+        cache_path - the path to the directory of the cache of the parsed plays, None to parse every play.
+        cache_size - the size limit of the cache of the parsed plays in bytes.
+        profile - bool, True to time the stages of every play and save the report in output_path,
+                  see prf.ProfileReport.
+        profile_memory - bool, True to also trace the peak and the retained memory of every play and of its stages
+                         with tracemalloc, it implies profile. The stages are slower when their memory is traced.
     Returns:
-        no returns, the files will be saved in output_path directory.
-    """
-    all_files = [f for f in listdir(input_directory) if f.count('.xml') > 0]
+        failed_plays - a dictionary with the files that could not be processed and their errors,
+                       the json files will be saved in output_path directory.
+    """
+    report = prf.ProfileReport(profile_memory) if profile or profile_memory else None
+    # fail early on unknown features
+    feature_registry.select(features)
+    if columnar_format:
+        cof.check_table_format(columnar_format)
+    all_files = cpf.list_files(input_directory, '.xml')
     if custom_flag:
-        metadata_df = pd.read_csv(metadata_path, sep='\t')
+        metadata = mdf.read_metadata(metadata_path, metadata_columns)
     else:
-        metadata_df = pd.DataFrame()
-    for file in all_files:
-        play_data_dict = process_play(input_directory + file, metadata_df, custom_flag)
-        json_name = output_path + str(file.replace('.xml', '.json'))
-        with open(json_name, 'w') as fp:
-            json.dump(play_data_dict, fp, ensure_ascii=False, indent=2)
+        metadata = mdf.MetadataIndex(pd.DataFrame())
+    play_indices = {f: f.replace('.xml', '') for f in all_files} if custom_flag else {}
+    invalid_plays = mdf.validate_metadata(metadata, play_indices, metadata_columns)
+    # report the plays without valid metadata before any play is parsed
+    failed_plays = cpf.report_failures((f, None, invalid_plays[f]) for f in all_files if f in invalid_plays)
+    all_files = [f for f in all_files if f not in invalid_plays]
+    entries = mf.play_entries(input_directory, all_files, metadata, play_indices, [custom_flag, streaming, features])
+    cache = pcf.open_cache(cache_path, cache_size)
+    processed_files = cpf.process_corpus(process_file, mf.dirty_plays(output_path, entries, force),
+                                         (input_directory, output_path, metadata, custom_flag, streaming, features,
+                                          cache),
+                                         workers, ordered, async_io, input_directory, report)
+    failed_plays.update(cpf.report_failures(mf.record_plays(output_path, entries, processed_files)))
+    if columnar_format:
+        cof.write_corpus_tables(mf.play_outputs(output_path, all_files), output_path, columnar_format)
+    if report is not None:
+        report.save(os.path.join(output_path, prf.report_name))
+
+    return failed_plays
+
+
+def process_file(file, input_directory, output_path, metadata_df, custom_flag, streaming=True, features=None,
+                 cache=None, content=None, write=True):
+    """
+    The function processes a single file and saves its json summary.
+    Params:
+        file - the name of the xml file in input_directory.
+        input_directory, output_path, metadata_df, custom_flag, streaming, features - see process_all_plays.
+        cache - ParseCache of the parsed plays, None to parse the play.
+        content - the bytes of the file if it has already been read, None to read the file.
+        write - bool, False to return the json text instead of saving it, see cpf.save_json.
+    Returns:
+        json_name - the path of the saved json file.
+    """
+    file_name = os.path.join(input_directory, file)
+    play_data_dict = process_play(file_name, metadata_df, custom_flag, streaming, features, content, cache)
+    json_name = os.path.join(output_path, file.replace('.xml', '.json'))
 
+    return cpf.save_json(json_name, play_data_dict, write)
 
-def process_play(file_name, metadata_df, custom_flag):
+
+def process_play(file_name, metadata_df, custom_flag, streaming=True, features=None, content=None, cache=None):
     """
     The function parses a txt file and creates a summary with features and metadata for the play.
     Params:
         file_name - a string, name of the file with the play text.
-        metadata_df - a dataframe containing the info about the play.
+        metadata_df - MetadataIndex or a dataframe containing the info about the plays.
+        custom_flag - bool, True if you have to supply your custom play metadata.
+        streaming - bool, True to parse the file with the streaming parser, False to use BeautifulSoup.
+        features - a list of the features to compute, None for all features.
+        content - the bytes of the file if it has already been read, None to read the file.
+        cache - ParseCache of the parsed plays, None to parse the play.
     Returns:
         play_data - a dictionary with detailed play summary by scenes, metadata, and features
     """
     print(file_name)
-    with open(file_name, 'r') as file:
-        soup = bs(file, 'lxml')
     if custom_flag:
         # if a file is in a folder
         if file_name.count('/') > 0:
             play_index = file_name.split('/')[-1].replace('.xml', '')
         else:
             play_index = file_name.replace('.xml', '')
-        play_meta = metadata_df[metadata_df['index'] == play_index][['title', 'last_name',
-                                                                     'first_name', 'creation_date',
-                                                                     'free_iambs']].values
+        play_meta = mdf.play_metadata(metadata_df, play_index, metadata_columns)
     else:
         play_meta = []
-    play_data = add_play_info(play_meta, soup, custom_flag)
-    play_data['characters'] = create_character_cast(soup)
-    play_data['play_summary'] = process_summary(soup, play_data['characters'])
-    play_data['metadata'] = additional_metadata(soup, play_data)
+    parsed, play_context = pcf.read_play(cache, file_name, content, [__name__, streaming, custom_flag],
+                                         lambda name, data: tsf.read_tei(name, streaming, data),
+                                         lambda soup: parse_play(soup, custom_flag), play_facts)
+    if custom_flag:
+        play_data = add_play_info(play_meta, None, custom_flag)
+    else:
+        play_data = parsed['play_info']
+    play_data['characters'] = parsed['characters']
+    play_data['play_summary'] = parsed['play_summary']
+    play_data['metadata'] = additional_metadata(play_context, play_data, features)
 
     return play_data
 
 
-def process_summary(soup, character_cast_dictionary):
-    act_info = {}
+def parse_play(soup, custom_flag):
+    """
+    The function extracts the structure of a play which does not depend on the metadata file.
+    Params:
+        soup - the soup of the play.
+        custom_flag - bool, True if the play info is taken from the metadata file, not from the TEI.
+    Returns:
+        parsed - a dictionary with the play info from the TEI (None if custom_flag is True), the dramatic characters
+                 and the play summary.
+    """
+    parsed = {'play_info': None if custom_flag else add_play_info([], soup)}
+    cast = caf.Cast(create_character_cast(soup))
+    parsed['characters'] = cast.characters
+    parsed['play_summary'] = process_summary(soup, cast)
+
+    return parsed
+
+
+@prf.profiled
+def process_summary(soup, cast):
+    play_model = pmf.PlayModel()
+    speaker_resolver = taf.SpeakerResolver('russian')
     acts = soup.find_all('div', {'type': 'act'})
     for act_num, act in enumerate(acts, 1):
         scenes = act.find_all('div', {'type': ['scene', 'extra_scene', 'complex_scene']})
-        act_info['act'+'_'+str(act_num)] = parse_scenes(scenes,
-                                                        character_cast_dictionary)
-    return act_info
+        parse_scenes(scenes, cast, speaker_resolver, play_model, play_model.add_act('act'+'_'+str(act_num)))
+    return play_model
 
 
+@prf.profiled
 def create_character_cast(play_soup):
     dramatic_characters = play_soup.find_all('person')
     character_dict = {}
     for character_tag in dramatic_characters:
-        tag = str(character_tag)
-        xml_id = tag[tag.find('xml:id='):tag.find('>')].replace('\"', '').split('=')[-1]
+        xml_id = taf.attribute(character_tag, 'xml:id')
         # in case there is a collective number
         collective_number = character_tag.find_all('collective_number')
         if len(collective_number) != 0:
@@ -89,42 +184,39 @@ def create_character_cast(play_soup):
     return character_dict
 
 
-def parse_scenes(scenes, character_cast_dictionary):
+@prf.profiled
+def parse_scenes(scenes, cast, speaker_resolver, play_model, act):
     """
-    The function goes through a list of scenes and updates complete_scene_info dictionary with informtion
-    about each scene speaking characters, their utterance counts, and percentage of non-speaking characters.
+    The function goes through a list of scenes and adds each scene to the play model with its speaking characters,
+    their utterance counts, the number of speakers and the percentage of non-speaking characters.
     Params:
         scenes - a list scenes.
-        name_pattern - regex expression for identifying character names.
-        character_cast_dictionary, reverse_character_cast - dictionaries for lookup of alternative names
-                                                            for each dramatic character.
+        cast - Cast of the play for lookup of alternative names for each dramatic character.
+        speaker_resolver - SpeakerResolver of the play.
+        play_model - PlayModel of the play.
+        act - the name of the act of the scenes.
     Returns:
-        complete_scene_info - a dictionary where keys are scenes and values are dramatic characters and their
-                             utternace counts as well as the number of speakers and percentage of non-speakers.
+        play_model - PlayModel updated with the scenes.
     """
-    other_meta_fields = ['num_speakers', 'perc_non_speakers', 'num_utterances']
-    complete_scene_info = {}
-    scene_names = []
+    scene_casts = []
     sc_num = 0
     extra_scene_number = 1
     for scene in scenes:
         scene_status, sc_num, extra_scene_number = handle_scene_name_and_count(scene, sc_num, extra_scene_number)
         if sc_num != 1:
-            previous_cast = [name for name in complete_scene_info[scene_names[-1]].keys()
-                             if name not in other_meta_fields]
+            previous_cast = scene_casts[-1]
         else:
             previous_cast = []
-        scene_summary, scene_cast = count_utterances(scene, character_cast_dictionary, previous_cast, scene_status)
-        scene_summary['num_utterances'] = sum(list(scene_summary.values()))
-        scene_summary['num_speakers'], scene_summary['perc_non_speakers'] = count_characters(scene_summary)
+        scene_summary, scene_cast = count_utterances(scene, cast, speaker_resolver, previous_cast, scene_status)
+        num_utterances = sum(list(scene_summary.values()))
+        num_speakers, perc_non_speakers = count_characters(scene_summary)
         if float(sc_num) > 1:
-            current_scene = [key for key in scene_summary.keys() if key not in other_meta_fields]
-            scene_status = tpf.check_if_no_change(current_scene, previous_cast, scene_status)
-        complete_scene_info[str(sc_num) + '_' + str(scene_status)] = scene_summary
-        # check to make sure all character names are in scene cast as they appear in the play cast
-        scene_names.append(str(sc_num) + '_' + str(scene_status))
+            scene_status = tpf.check_if_no_change(list(scene_summary), previous_cast, scene_status)
+        play_model.add_scene(act, str(sc_num) + '_' + str(scene_status), scene_summary, num_utterances, num_speakers,
+                             perc_non_speakers)
+        scene_casts.append(list(scene_summary))
 
-    return complete_scene_info
+    return play_model
 
 
 def get_scene_status(scene):
@@ -136,9 +228,7 @@ def get_scene_status(scene):
     Returns:
         scene_status - a string that can be either "regular" or "extra"
     """
-    scene_str = str(scene)
-    scene_desc = scene_str[scene_str.find('type='):scene_str.find('>')].replace('\"', '').split('=')[-1]
-    if scene_desc.count('extra') > 0:
+    if taf.attribute(scene, 'type').count('extra') > 0:
         scene_status = 'extra'
     else:
         scene_status = 'regular'
@@ -146,13 +236,19 @@ def get_scene_status(scene):
     return scene_status
 
 
-def check_utterance(scene):
+def check_utterance(whos):
+    """
+    The function finds the group utterances of a scene, i.e., the utterances with several speakers.
+    Params:
+        whos - a list of the who attributes of the utterances of the scene, see SpeakerResolver.scene_speakers.
+    Returns:
+        utterance_dict - a dictionary where keys are the speakers of the group utterances, e.g., #ivan, and values are
+                         the who attribute of the last group utterance of the speaker.
+    """
     utterance_dict = {}
-    utterances = scene.find_all('sp')
-    for utterance in utterances:
-        speaker_count = str(utterance).count('#')
-        if speaker_count > 1:
-            speaker_string = str(utterance)[str(utterance).find('#'):str(utterance).find('\">')]
+    for who in whos:
+        if who.count('#') > 1:
+            speaker_string = who[who.find('#'):]
             speakers = speaker_string.split(' ')
             for speaker in speakers:
                 utterance_dict[speaker] = speaker_string
@@ -160,9 +256,9 @@ def check_utterance(scene):
     return utterance_dict
 
 
-def multi_word_name(character_cast_dict):
+def multi_word_name(cast):
     multi_word = []
-    for key in character_cast_dict.keys():
+    for key in cast.names:
         if key.count(' ') > 0:
             multi_word.append(key)
     if len(multi_word) > 0:
@@ -172,60 +268,42 @@ def multi_word_name(character_cast_dict):
         return False
 
 
-def tackle_name(character_cast_dict, scene_cast):
+def tackle_name(cast, scene_cast):
+    """
+    The function identifies which dramatic characters appear in the scene cast. A name which appears only once and
+    ends in -ин, -ов, -ев or -аф is skipped if it is followed by -а or -я, i.e., it is a part of another name.
+    Params:
+        cast - Cast of the play.
+        scene_cast - a string that contains information about the dramatic characters in the scene.
+    Returns:
+        updated_characters - a list of dramatic characters that appear in the scene in the order of the play cast.
+    """
     updated_characters = []
-    for name in character_cast_dict.keys():
-        if scene_cast.count(name.lower()) >= 2:
+    for name, count, index in cast.name_matcher().find_names(scene_cast):
+        if count >= 2:
             updated_characters.append(name)
-        elif scene_cast.count(name.lower()) == 1:
-            index = scene_cast.find(name.lower())
+        else:
+            name_length = len(name.lower())
             if name[-2:] != 'ин' and name[-2:] != 'ов' and name[-2:] != 'ев' and name[-2:] != 'аф':
                 updated_characters.append(name)
-            elif (scene_cast[index:index+len(name.lower())+1][-1] != 'а' and
-                  scene_cast[index:index + len(name.lower())+3][-1] != 'я'):
+            elif (scene_cast[index:index+name_length+1][-1] != 'а' and
+                  scene_cast[index:index+name_length+3][-1] != 'я'):
                 updated_characters.append(name)
 
     return updated_characters
 
 
-def find_speakers(scene):
-    """
-    The function creates a list of the speakers in a scene in the order of their utterances.
-    The number of times a speaker appears in the list corresponds to the number of utterances the speaker makes.
-    Params:
-        scene - a beautiful soup object of the scene xml.
-    Returns:
-        speakers_lst - a list of speakers in the scene.
-    """
-    speakers_lst = []
-    speakers = [utterance['who'] for utterance in scene.find_all('sp')]
-    for speaker in speakers:
-        speaker_count = str(speaker).count('#')
-        # if multiple speakers
-        if speaker_count > 0:
-            multiple_speakers = str(speaker).split(' #')
-            [speakers_lst.append(sp.strip()) for sp in multiple_speakers]
-        else:
-            speakers_lst.append(speaker)
-
-    return speakers_lst
-
-
-def extract_utterances(character_cast_dict, scene):
+def extract_utterances(cast, speakers):
     """
-    The function identifies all utterances in a scene and creates a list of dramatic characters who
-    make those utterances.
+    The function creates a list of dramatic characters who make the utterances of a scene.
     Params:
-        character_cast_dict - a dictionary where keys are dramatic characters and values are their alterantive names
-                              and collective numbers.
-        scene - a beautiful soup object of the scene xml.
+        cast - Cast of the play, the speakers are looked up by their alternative names.
+        speakers - a list of the speaker ids of the utterances, see SpeakerResolver.scene_speakers.
     Returns:
         utterance_lst - a list of speakers who make utterances in the given scene.
     """
-    # look up by alternative name
-    reverse_dict = dict(zip([val['alternative_names'] for val in character_cast_dict.values()],
-                            character_cast_dict.keys()))
-    utterance_lst = [reverse_dict[name.replace('#', '')] for name in find_speakers(scene)]
+    by_alternative_name = cast.by_alternative_name
+    utterance_lst = [by_alternative_name[speaker] for speaker in speakers]
 
     return utterance_lst
 
@@ -250,7 +328,7 @@ def check_cast_vs_speakers(scene_cast_lst, speakers, scene):
               'Listed speakers in cast:',
               scene_cast_set,
               'Beginning of the scene:',
-              str(scene)[:150])
+              taf.markup_prefix(scene, 150))
 
 
 def identify_scene_cast(scene, scene_status):
@@ -266,8 +344,8 @@ def identify_scene_cast(scene, scene_status):
         scene_cast - a string that contains the dramaric characters present in the scene.
         exluded_characters - a list of characters who should be removed from the scene cast.
     """
-    if scene_status.count('extra') != 0 or str(scene).count('complex_scene') != 0:
-        scene_cast = str(scene)[str(scene).find('cast=\"'):str(scene).find('type')].lower()
+    if scene_status.count('extra') != 0 or taf.attribute(scene, 'type') == 'complex_scene':
+        scene_cast = taf.attribute(scene, 'cast').lower()
     else:
         scene_cast = scene.find_all('stage')[0].get_text().lower()
 
@@ -296,13 +374,13 @@ def handle_preceding_scene_characters(scene_cast, previous_cast, characters_curr
     return updated_characters
 
 
-def count_utterances(scene, character_cast_dict, previous_cast, scene_status):
+def count_utterances(scene, cast, speaker_resolver, previous_cast, scene_status):
     """
     The function counts the number of utterances each dramatic character makes in a given scene.
     Params:
         scene - a beautiful soup object of the scene xml.
-        character_cast_dict - a dictionary where keys are dramatic characters and values are their alterantive names
-                              and collective numbers.
+        cast - Cast of the play.
+        speaker_resolver - SpeakerResolver of the play.
         previous_cast - a list of dramatic characters who were present in the preceding scene.
         scene_status - scene_status - whether a scene is regular or extra.
     Returns:
@@ -310,20 +388,23 @@ def count_utterances(scene, character_cast_dict, previous_cast, scene_status):
     """
     scene_info = {}
     scene_cast = identify_scene_cast(scene, scene_status)
-    current_characters = tackle_name(character_cast_dict, scene_cast)
+    current_characters = tackle_name(cast, scene_cast)
     # make sure to include previous cast in case some of the characters are the same
     updated_characters = handle_preceding_scene_characters(scene_cast, previous_cast, current_characters)
-    utterance_dictionary = check_utterance(scene)
-    utterance_lst = extract_utterances(character_cast_dict, scene)
+    whos, speakers = speaker_resolver.scene_speakers(scene)
+    utterance_dictionary = check_utterance(whos)
+    utterance_lst = extract_utterances(cast, speakers)
     check_cast_vs_speakers(updated_characters, utterance_lst, scene)
     if len(updated_characters) > 1:
+        # tally the utterances by their who attribute once, so that every look up below is O(1)
+        who_counts = Counter(whos)
         for character in updated_characters:
-            in_scene = '#' + character_cast_dict[character]['alternative_names']
+            in_scene = '#' + cast.characters[character]['alternative_names']
             if len(utterance_dictionary) != 0 and in_scene in utterance_dictionary:
-                additional_utterances = len(scene.find_all('sp', {'who': utterance_dictionary[in_scene]}))
+                additional_utterances = who_counts[utterance_dictionary[in_scene]]
             else:
                 additional_utterances = 0
-            num_utterances = additional_utterances + len(scene.find_all('sp', {'who': in_scene}))
+            num_utterances = additional_utterances + who_counts[in_scene]
             scene_info[character] = num_utterances
     else:
         scene_info[updated_characters[0]] = 1
@@ -341,7 +422,7 @@ def count_characters(scene_summary_dict):
         num_speakers - a number of speaking dramatic characters in the scene.
         perc_non_speakers - percentage of non-speaking dramatic characters in the scene.
     """
-    summary = [item for item in scene_summary_dict.items() if item[0] != 'num_utterances' and item[0] != 'num_speakers']
+    summary = list(scene_summary_dict.items())
     num_speakers = len([item[0] for item in summary if item[1] != 0])
     num_non_speakers = len([item[0] for item in summary if item[1] == 0])
     perc_non_speakers = round((num_non_speakers / len(summary)) * 100, 3)
@@ -349,44 +430,30 @@ def count_characters(scene_summary_dict):
     return num_speakers, perc_non_speakers
 
 
-def number_present_characters(play_dictionary):
+def number_present_characters(cast, play_model):
     """
     The function calculates the number of characters present in the play. If a character is listed in cast, but doesn't
-    appear on stage, he/she doesn't count.
+    appear on stage, he/she doesn't count. A character with a collective number counts as that many characters.
     Params:
-        play_dictionary - a dictioanry with data for the play, which includes the characters present in each scene.
+        cast - Cast of the play.
+        play_model - PlayModel of the play summary.
     Returns:
         total_number_present_characters - int.
     """
-    all_present_characters = set()
-    for key in play_dictionary['play_summary'].keys():
-        for scene in play_dictionary['play_summary'][key]:
-            for item in play_dictionary['play_summary'][key][scene].keys():
-                if item != 'num_utterances' and item != 'num_speakers' and item != 'perc_non_speakers':
-                    all_present_characters.add(item)
-    total_number_present_characters = 0
-    appearing_on_stage = set(play_dictionary['characters']).intersection(all_present_characters)
-    for character in appearing_on_stage:
-        coll_number = play_dictionary['characters'][character]['collective_number']
-        # if there is a collective number for this character
-        if coll_number:
-            total_number_present_characters += int(coll_number)
-        else:
-            total_number_present_characters += 1
+    appearing_on_stage = set(cast.characters).intersection(play_model.present_characters())
 
-    return total_number_present_characters
+    return cast.count_heads(appearing_on_stage)
 
 
-def process_speakers_features(soup, play_data, metadata_dict):
+def process_speakers_features(play_context, play_model, cast, metadata_dict):
     """
     Iarkho's features described in Iarkho's work on the evolution of 5-act tragedy in verse.
     """
-    metadata_dict['num_present_characters'] = number_present_characters(play_data)
-    scenes = tpf.estimate_number_scenes(play_data['play_summary'])
+    metadata_dict['num_present_characters'] = number_present_characters(cast, play_model)
+    scenes = tpf.estimate_number_scenes(play_model)
     metadata_dict['num_scenes_text'] = scenes[0]
     metadata_dict['num_scenes_iarkho'] = scenes[1]
-    play_summary_copy = copy.deepcopy(play_data['play_summary'])
-    distribution, speech_types, non_speakers = tpf.speech_distribution_iarkho(play_summary_copy)
+    distribution, speech_types, non_speakers = tpf.speech_distribution_iarkho(play_model)
     metadata_dict['speech_distribution'] = distribution
     metadata_dict['percentage_monologues'] = speech_types['perc_monologue']
     metadata_dict['percentage_duologues'] = speech_types['perc_duologue']
@@ -415,50 +482,74 @@ def total_utterances(play_soup):
     return total_utterances_in_play
 
 
-def count_all_verse_lines(soup):
-    all_lines = soup.find_all('l')
-    not_init = soup.find_all('l', {"part": "M"}) + soup.find_all('l', {"part": "F"})
-    num_verse_lines = len([line for line in all_lines if line not in not_init])
+def count_all_verse_lines(verse_index):
+    # the medial and final parts of a split verse line are not counted as separate verse lines
+    num_verse_lines = verse_index.num_verse_lines(['M', 'F'])
 
     return num_verse_lines
 
 
-def verse_split_between_scenes(soup):
+def verse_split_between_scenes(verse_index):
     """
     The function calculates percentagees of scenes with split vese, i.e, when one verse is split between two scenes,
     percentage of connected by rhymes(percentage_scene_rhymes), percentage of scenes connected by both rhymes and
     by split verses (percentage_scenes_rhymes_split_verse), and percentage of open scenes, i.e, percentage of scenes
-    connected by either rhymes or by
+    connected by either rhymes or by split verses. A verse is split if the split mark of the last verse line of
+    the scene contains I or M (see VerseIndex.split_mark), the rhymes connect the scenes if the markup of one of
+    the last ten verse lines of the scene contains an interscene rhyme mark.
+    Params:
+        verse_index - tvf.VerseIndex of the play.
     """
-    scenes = soup.find_all('div', {'type': ['scene', 'extra_scene', 'complex_scene']})
+    num_scenes = len(verse_index.scenes)
     counts = {'scenes_with_split_verse': 0, 'scenes_split_rhymes': 0, 'both': 0, 'open': 0}
-    for scene in scenes:
-        last_ten_lines = str(scene.find_all('l')[-10:])
-        last_line = str(scene.find_all('l')[-1])
-        verse = last_line[last_line.find("\""):last_line.find('>')].replace('\"', '').split(' ')[0]
-        if verse.count('M') > 0 or verse.count('I') > 0:
+    for scene in range(num_scenes):
+        lines = verse_index.scene_lines(scene)
+        verse = verse_index.split_mark(lines[-1])
+        split_verse = verse.count('M') > 0 or verse.count('I') > 0
+        split_rhymes = any(verse_index.has_interscene_mark(line) for line in lines[-10:])
+        if split_verse:
             counts['scenes_with_split_verse'] += 1
-        if last_ten_lines.count('interscene') > 0:
+        if split_rhymes:
             counts['scenes_split_rhymes'] += 1
-        if (verse.count('M') > 0 or verse.count('I') > 0) and last_ten_lines.count('interscene') > 0:
+        if split_verse and split_rhymes:
             counts['both'] += 1
-        if verse.count('M') > 0 or verse.count('I') > 0 or last_ten_lines.count('interscene') > 0:
+        if split_verse or split_rhymes:
             counts['open'] += 1
 
-    counts['percentage_scene_split_verse'] = round((counts['scenes_with_split_verse'] / len(scenes)) * 100, 3)
-    counts['percentage_scene_rhymes'] = round((counts['scenes_split_rhymes'] / len(scenes)) * 100, 3)
-    counts['percentage_scenes_rhymes_split_verse'] = round((counts['both'] / len(scenes)) * 100, 3)
-    counts['percentage_open_scenes'] = round((counts['open'] / len(scenes)) * 100, 3)
+    counts['percentage_scene_split_verse'] = round((counts['scenes_with_split_verse'] / num_scenes) * 100, 3)
+    counts['percentage_scene_rhymes'] = round((counts['scenes_split_rhymes'] / num_scenes) * 100, 3)
+    counts['percentage_scenes_rhymes_split_verse'] = round((counts['both'] / num_scenes) * 100, 3)
+    counts['percentage_open_scenes'] = round((counts['open'] / num_scenes) * 100, 3)
 
     return counts
 
 
-def process_features_verse(play_soup, play_data, metadata_dict):
+def verse_facts(play_soup):
+    """
+    The function indexes the verse lines of the play and counts everything the verse and the stage-directions
+    features need from them, so the play is walked once for both.
+    Params:
+        play_soup - the soup of the play.
+    Returns:
+        facts - a dictionary with the inter-scene verse splits (see verse_split_between_scenes), the number of
+                verse lines and the number of the verse-splitting stage directions.
+    """
+    verse_index = tvf.VerseIndex(play_soup)
+    facts = {'scenes_counts': verse_split_between_scenes(verse_index),
+             'num_verse_lines': count_all_verse_lines(verse_index),
+             'num_verse_splitting_stage_directions': verse_index.splitting_stage_directions}
+
+    return facts
+
+
+def process_features_verse(play_context, play_data, metadata_dict):
     """
     Iarkho's features described in the work on Corneille's comedies and tragedies.
     """
-    metadata_dict['total_utterances'] = total_utterances(play_soup)
-    metadata_dict['num_verse_lines'] = count_all_verse_lines(play_soup)
+    facts = play_context.compute(verse_facts)
+    scenes_counts = facts['scenes_counts']
+    metadata_dict['total_utterances'] = play_context.compute(total_utterances)
+    metadata_dict['num_verse_lines'] = facts['num_verse_lines']
     if "free_iambs" in play_data and play_data['free_iambs'] == 1:
         metadata_dict['rescaled_num_verse_lines'] = round(metadata_dict['num_verse_lines'] * .796, 3)
         metadata_dict['dialogue_vivacity'] = round(
@@ -468,43 +559,20 @@ def process_features_verse(play_soup, play_data, metadata_dict):
         metadata_dict['dialogue_vivacity'] = round(
                                              metadata_dict['total_utterances'] /
                                              metadata_dict['num_verse_lines'], 3)
-    metadata_dict['num_scenes_with_split_verse_lines'] = verse_split_between_scenes(
-                                                         play_soup)['scenes_with_split_verse']
-    metadata_dict['num_scenes_with_split_rhymes'] = verse_split_between_scenes(
-                                                    play_soup)['scenes_split_rhymes']
-    metadata_dict['percentage_scene_split_verse'] = verse_split_between_scenes(
-                                                    play_soup)['percentage_scene_split_verse']
-    metadata_dict['percentage_scene_split_rhymes'] = verse_split_between_scenes(
-                                                    play_soup)['percentage_scene_rhymes']
-    metadata_dict['num_scenes_with_split_rhymes_verses'] = verse_split_between_scenes(
-                                                           play_soup)['both']
-    metadata_dict['num_open_scenes'] = verse_split_between_scenes(
-                                       play_soup)['open']
-    metadata_dict['percentage_open_scenes'] = verse_split_between_scenes(
-                                              play_soup)['percentage_open_scenes']
-    metadata_dict['percentage_scenes_rhymes_split_verse'] = verse_split_between_scenes(
-                                                            play_soup)['percentage_scenes_rhymes_split_verse']
+    metadata_dict['num_scenes_with_split_verse_lines'] = scenes_counts['scenes_with_split_verse']
+    metadata_dict['num_scenes_with_split_rhymes'] = scenes_counts['scenes_split_rhymes']
+    metadata_dict['percentage_scene_split_verse'] = scenes_counts['percentage_scene_split_verse']
+    metadata_dict['percentage_scene_split_rhymes'] = scenes_counts['percentage_scene_rhymes']
+    metadata_dict['num_scenes_with_split_rhymes_verses'] = scenes_counts['both']
+    metadata_dict['num_open_scenes'] = scenes_counts['open']
+    metadata_dict['percentage_open_scenes'] = scenes_counts['percentage_open_scenes']
+    metadata_dict['percentage_scenes_rhymes_split_verse'] = scenes_counts['percentage_scenes_rhymes_split_verse']
 
     return metadata_dict
 
 
-def splitting_verse_line(scene):
-    splits = re.split('<l>|<l part="I">', scene)
-
-    return splits
-
-
-def estimate_verse_line_splitting_stage_directions(play_soup):
-    splits = splitting_verse_line(str(play_soup))
-    total_num = 0
-    for line in splits[1:]:
-        # find the index of the end of the verse line
-        end = [i for i in re.finditer(r'</l>', line)][-1].span()[0]
-        verse_line = line[:end]
-        if verse_line.count('</stage>') > 0:
-            total_num += verse_line.count('</stage>')
-
-    return total_num
+def count_stage_directions(play_soup):
+    return len(play_soup.find_all('stage'))
 
 
 def count_number_word_tokens(play_soup):
@@ -519,7 +587,7 @@ def count_number_word_tokens(play_soup):
     return total_number_tokens
 
 
-def process_stage_directions_features(play_soup, play_data, metadata_dict):
+def process_stage_directions_features(play_context, play_data, metadata_dict):
     """
     Sperantov's stage-directions features
     """
@@ -530,38 +598,20 @@ def process_stage_directions_features(play_soup, play_data, metadata_dict):
             number_verse_lines = metadata_dict['num_verse_lines']
     else:
         number_verse_lines = metadata_dict['num_verse_lines']
-    metadata_dict['num_stage_directions'] = len(play_soup.find_all('stage'))
+    metadata_dict['num_stage_directions'] = play_context.compute(count_stage_directions)
     metadata_dict['stage_directions_frequency'] = round((metadata_dict['num_stage_directions'] /
                                                          number_verse_lines) * 100, 3)
-    metadata_dict['num_word_tokens_in_stage_directions'] = count_number_word_tokens(play_soup)
+    metadata_dict['num_word_tokens_in_stage_directions'] = play_context.compute(count_number_word_tokens)
     metadata_dict['average_length_of_stage_direction'] = round(metadata_dict['num_word_tokens_in_stage_directions'] /
                                                                metadata_dict['num_stage_directions'], 3)
-    metadata_dict['num_verse_splitting_stage_directions'] = estimate_verse_line_splitting_stage_directions(play_soup)
+    metadata_dict['num_verse_splitting_stage_directions'] = play_context.compute(verse_facts)[
+                                                               'num_verse_splitting_stage_directions']
     metadata_dict['degree_of_verse_prose_interaction'] = round((metadata_dict['num_verse_splitting_stage_directions'] /
                                                                number_verse_lines) * 100, 3)
 
     return metadata_dict
 
 
-def percentage_of_scenes_discont_change(play_soup, play_data, metadata_dict):
-    number_scenes = metadata_dict['num_scenes_iarkho']
-    characters = []
-    num_scenes_with_disc_character_change = 0
-    for act in play_data['play_summary'].keys():
-        for entry in play_data['play_summary'][act].values():
-            new_cast = [item for item in entry.keys() if
-                        item not in ['num_speakers', 'perc_non_speakers', 'num_utterances']]
-            if len(characters) > 0:
-                if len(set(new_cast).intersection(set(characters[-1]))) == 0:
-                    num_scenes_with_disc_character_change += 1
-            characters.append(new_cast)
-    perc_disc = round((num_scenes_with_disc_character_change / number_scenes) * 100, 3)
-    metadata_dict['number_scenes_with_discontinuous_change_characters'] = num_scenes_with_disc_character_change
-    metadata_dict['percentage_scenes_with_discontinuous_change_characters'] = perc_disc
-
-    return metadata_dict
-
-
 def add_play_info(metadata, soup, custom_flag=False):
     """
     Update play metadata from the metadata_df. We can provide our own metadata or use the TEI metadataa
@@ -583,14 +633,33 @@ def add_play_info(metadata, soup, custom_flag=False):
     return play_data
 
 
-def additional_metadata(play_soup, play_data):
+# the intermediate results of the feature stages which are cached with the parsed play
+play_facts = [(total_utterances,), (verse_facts,), (count_stage_directions,), (count_number_word_tokens,)]
+
+feature_registry = frf.FeatureRegistry()
+feature_registry.register(process_speakers_features, outputs=tpf.speakers_features)
+feature_registry.register(process_features_verse, outputs=tpf.verse_features)
+feature_registry.register(process_stage_directions_features, inputs=['num_verse_lines', 'rescaled_num_verse_lines'],
+                          outputs=tpf.stage_directions_features)
+feature_registry.register(tpf.percentage_of_scenes_discont_change, inputs=['num_scenes_iarkho'],
+                          outputs=tpf.discont_change_features)
+
+
+def additional_metadata(play_context, play_data, features=None):
     """
-    Process all play features in stages
+    Process the play features with the stages of feature_registry. The stages share the intermediate results through
+    the play context.
+    Params:
+        play_context - FeatureContext of the soup of the play.
+        play_data - a dictionary with information about the play.
+        features - a list of the features to compute, None for all features.
+    Returns:
+        metadata_dict - a dictionary with the play features.
     """
-    metadata_dict = {}
-    for process in [process_speakers_features, process_features_verse,
-                    process_stage_directions_features, percentage_of_scenes_discont_change]:
-        metadata_dict = process(play_soup, play_data, metadata_dict)
+    arguments = {'play_context': play_context, 'play_data': play_data,
+                 'play_model': play_data['play_summary'],
+                 'cast': caf.Cast(play_data['characters'])}
+    metadata_dict = feature_registry.run(arguments, features)
 
     return metadata_dict
 
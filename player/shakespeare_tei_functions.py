@@ -1,33 +1,101 @@
+import os
 import pandas as pd
-from os import listdir
-from bs4 import BeautifulSoup as bs
-import json
-import copy
 from player import russian_tei_functions as rtf
 from player import text_processing_functions as tpf
 from player import french_tei_functions as ftf
-
-
-def process_all_plays(input_directory, output_path, custom_flag=False, metadata_path=None):
+from player import corpus_processing_functions as cpf
+from player import profiling_functions as prf
+from player import parse_cache_functions as pcf
+from player import manifest_functions as mf
+from player import columnar_output_functions as cof
+from player import metadata_functions as mdf
+from player import tei_streaming_functions as tsf
+from player import feature_registry_functions as frf
+from player import play_model_functions as pmf
+from player import cast_functions as caf
+from player import tei_access_functions as taf
+
+# the metadata columns of a play, in the order add_play_info expects them
+metadata_columns = ['title', 'last_name', 'first_name', 'date']
+
+
+def process_all_plays(input_directory, output_path, custom_flag=False, metadata_path=None, workers=1, ordered=True,
+                      streaming=True, features=None, force=False, columnar_format=None, async_io=False,
+                      cache_path=None, cache_size=pcf.default_cache_size, profile=False,
+                      profile_memory=False):
     """
     The function allows to process all files in a specified directory.
     Params:
         input_directory - the path to the folder containing the txt files
         output_path - directory in which the json summaries will be saved.
         metadata_path - path to the metadata file, a tab-delimited txt file with informtion about all plays.
+        workers - the number of worker processes, 1 processes the plays one by one.
+        ordered - bool, whether the plays are reported in the order of the files or as soon as they are processed.
+        streaming - bool, True to parse the files with the streaming parser, False to use BeautifulSoup.
+        features - a list of the features to compute, None for all features.
+        force - bool, True to process all plays, False to skip the plays which did not change since the last run.
+        columnar_format - 'parquet' or 'arrow' to also save the play, scene and character tables of the corpus,
+                          None for the json files only.
+        async_io - bool, True to read the files and write the json files asynchronously while the plays are
+                   processed, e.g., for corpora on network storage.
+        cache_path - the path to the directory of the cache of the parsed plays, None to parse every play.
+        cache_size - the size limit of the cache of the parsed plays in bytes.
+        profile - bool, True to time the stages of every play and save the report in output_path,
+                  see prf.ProfileReport.
+        profile_memory - bool, True to also trace the peak and the retained memory of every play and of its stages
+                         with tracemalloc, it implies profile. The stages are slower when their memory is traced.
     Returns:
-        no returns, the files will be saved in output_path directory.
+        failed_plays - a dictionary with the files that could not be processed and their errors,
+                       the json files will be saved in output_path directory.
     """
-    all_files = [f for f in listdir(input_directory) if f.count('.xml') > 0]
+    report = prf.ProfileReport(profile_memory) if profile or profile_memory else None
+    # fail early on unknown features
+    feature_registry.select(features)
+    if columnar_format:
+        cof.check_table_format(columnar_format)
+    all_files = cpf.list_files(input_directory, '.xml')
     if custom_flag:
-        metadata_df = pd.read_csv(metadata_path, sep='\t')
+        metadata = mdf.read_metadata(metadata_path, metadata_columns)
     else:
-        metadata_df = pd.DataFrame()
-    for file in all_files:
-        play_data_dict = process_play(input_directory + file, metadata_df, custom_flag)
-        json_name = output_path + str(file.replace('.xml', '.json'))
-        with open(json_name, 'w') as fp:
-            json.dump(play_data_dict, fp, ensure_ascii=False, indent=2)
+        metadata = mdf.MetadataIndex(pd.DataFrame())
+    play_indices = {f: f.replace('.xml', '') for f in all_files} if custom_flag else {}
+    invalid_plays = mdf.validate_metadata(metadata, play_indices, metadata_columns)
+    # report the plays without valid metadata before any play is parsed
+    failed_plays = cpf.report_failures((f, None, invalid_plays[f]) for f in all_files if f in invalid_plays)
+    all_files = [f for f in all_files if f not in invalid_plays]
+    entries = mf.play_entries(input_directory, all_files, metadata, play_indices, [custom_flag, streaming, features])
+    cache = pcf.open_cache(cache_path, cache_size)
+    processed_files = cpf.process_corpus(process_file, mf.dirty_plays(output_path, entries, force),
+                                         (input_directory, output_path, metadata, custom_flag, streaming, features,
+                                          cache),
+                                         workers, ordered, async_io, input_directory, report)
+    failed_plays.update(cpf.report_failures(mf.record_plays(output_path, entries, processed_files)))
+    if columnar_format:
+        cof.write_corpus_tables(mf.play_outputs(output_path, all_files), output_path, columnar_format)
+    if report is not None:
+        report.save(os.path.join(output_path, prf.report_name))
+
+    return failed_plays
+
+
+def process_file(file, input_directory, output_path, metadata_df, custom_flag, streaming=True, features=None,
+                 cache=None, content=None, write=True):
+    """
+    The function processes a single file and saves its json summary.
+    Params:
+        file - the name of the xml file in input_directory.
+        input_directory, output_path, metadata_df, custom_flag, streaming, features - see process_all_plays.
+        cache - ParseCache of the parsed plays, None to parse the play.
+        content - the bytes of the file if it has already been read, None to read the file.
+        write - bool, False to return the json text instead of saving it, see cpf.save_json.
+    Returns:
+        json_name - the path of the saved json file.
+    """
+    file_name = os.path.join(input_directory, file)
+    play_data_dict = process_play(file_name, metadata_df, custom_flag, streaming, features, content, cache)
+    json_name = os.path.join(output_path, file.replace('.xml', '.json'))
+
+    return cpf.save_json(json_name, play_data_dict, write)
 
 
 def add_play_info(soup, metadata, custom_flag=False):
@@ -51,35 +119,62 @@ def add_play_info(soup, metadata, custom_flag=False):
     return play_data
 
 
-def process_play(file_name, metadata_df, custom_flag):
+def process_play(file_name, metadata_df, custom_flag, streaming=True, features=None, content=None, cache=None):
     """
     The function parses a txt file and creates a summary with features and metadata for the play.
     Params:
         file_name - a string, name of the file with the play text.
-        metadata_df - a dataframe containing the info about the play.
+        metadata_df - MetadataIndex or a dataframe containing the info about the plays.
+        custom_flag - bool, True if you have to supply your custom play metadata.
+        streaming - bool, True to parse the file with the streaming parser, False to use BeautifulSoup.
+        features - a list of the features to compute, None for all features.
+        content - the bytes of the file if it has already been read, None to read the file.
+        cache - ParseCache of the parsed plays, None to parse the play.
     Returns:
         play_data - a dictionary with detailed play summary by scenes, metadata, and features
     """
     print(file_name)
-    with open(file_name, 'r') as file:
-        soup = bs(file, 'lxml')
     if custom_flag:
         if file_name.count('/') > 0:
             play_index = file_name.split('/')[-1].replace('.xml', '')
         else:
             play_index = file_name.replace('.xml', '')
-        play_meta = metadata_df[metadata_df['index'] == play_index][['title', 'last_name',
-                                                                     'first_name', 'date']].values
+        play_meta = mdf.play_metadata(metadata_df, play_index, metadata_columns)
     else:
         play_meta = []
-    play_data = add_play_info(soup, play_meta, custom_flag)
-    play_data['characters'] = create_character_cast(soup)
-    play_data['play_summary'] = process_summary(soup, play_data['characters'])
-    play_data['metadata'] = additional_metadata(soup, play_data)
+    parsed, play_context = pcf.read_play(cache, file_name, content, [__name__, streaming, custom_flag],
+                                         lambda name, data: tsf.read_tei(name, streaming, data),
+                                         lambda soup: parse_play(soup, custom_flag), play_facts)
+    if custom_flag:
+        play_data = add_play_info(None, play_meta, custom_flag)
+    else:
+        play_data = parsed['play_info']
+    play_data['characters'] = parsed['characters']
+    play_data['play_summary'] = parsed['play_summary']
+    play_data['metadata'] = additional_metadata(play_context, play_data, features)
 
     return play_data
 
 
+def parse_play(soup, custom_flag):
+    """
+    The function extracts the structure of a play which does not depend on the metadata file.
+    Params:
+        soup - the soup of the play.
+        custom_flag - bool, True if the play info is taken from the metadata file, not from the TEI.
+    Returns:
+        parsed - a dictionary with the play info from the TEI (None if custom_flag is True), the dramatic characters
+                 and the play summary.
+    """
+    parsed = {'play_info': None if custom_flag else add_play_info(soup, [])}
+    cast = caf.Cast(create_character_cast(soup))
+    parsed['characters'] = cast.characters
+    parsed['play_summary'] = process_summary(soup, cast)
+
+    return parsed
+
+
+@prf.profiled
 def create_character_cast(play_soup):
     """
     The function creates a dictionary where the keys are dramatic characters and values are their alternative names
@@ -98,48 +193,40 @@ def create_character_cast(play_soup):
     return character_dict
 
 
-def process_summary(soup, character_cast_dictionary):
-    act_info = {}
+@prf.profiled
+def process_summary(soup, cast):
+    play_model = pmf.PlayModel()
+    speaker_resolver = taf.SpeakerResolver('shakespeare')
     acts = soup.find_all('div', {'type': 'act'})
     for act_num, act in enumerate(acts, 1):
         scenes = act.find_all('div', {'type': ['scene', 'extra_scene']})
-        act_info['act'+'_'+str(act_num)] = parse_scenes(scenes,
-                                                        character_cast_dictionary)
-    return act_info
+        parse_scenes(scenes, cast, speaker_resolver, play_model, play_model.add_act('act'+'_'+str(act_num)))
+    return play_model
 
 
-def number_present_characters(play_dictionary):
+def number_present_characters(cast, play_model):
     """
     The function calculates the number of characters present in the play. If a character is listed in cast, but doesn't
     appear on stage, he/she doesn't count.
     Params:
-        play_dictionary - a dictioanry with data for the play, which includes the characters present in each scene.
+        cast - Cast of the play.
+        play_model - PlayModel of the play summary.
     Returns:
         total_number_present_characters - int.
     """
-    all_present_characters = set()
-    for key in play_dictionary['play_summary'].keys():
-        for scene in play_dictionary['play_summary'][key]:
-            for item in play_dictionary['play_summary'][key][scene].keys():
-                if item != 'num_utterances' and item != 'num_speakers' and item != 'perc_non_speakers':
-                    all_present_characters.add(item)
-    total_number_present_characters = 0
-    appearing_on_stage = set(play_dictionary['characters']).intersection(all_present_characters)
-    for character in appearing_on_stage:
-        total_number_present_characters += 1
+    total_number_present_characters = len(set(cast.characters).intersection(play_model.present_characters()))
 
     return total_number_present_characters
 
 
-def process_speakers_features(soup, play_data, metadata_dict):
+def process_speakers_features(play_context, play_model, cast, metadata_dict):
     """
     Iarkho's features described in Iarkho's work on the evolution of 5-act tragedy in verse.
     """
-    metadata_dict['num_present_characters'] = number_present_characters(play_data)
-    metadata_dict['num_scenes_text'] = tpf.estimate_number_scenes(play_data['play_summary'])[0]
-    metadata_dict['num_scenes_iarkho'] = tpf.estimate_number_scenes(play_data['play_summary'])[1]
-    play_summary_copy = copy.deepcopy(play_data['play_summary'])
-    distribution, speech_types, non_speakers = tpf.speech_distribution_iarkho(play_summary_copy)
+    metadata_dict['num_present_characters'] = number_present_characters(cast, play_model)
+    metadata_dict['num_scenes_text'] = tpf.estimate_number_scenes(play_model)[0]
+    metadata_dict['num_scenes_iarkho'] = tpf.estimate_number_scenes(play_model)[1]
+    distribution, speech_types, non_speakers = tpf.speech_distribution_iarkho(play_model)
     metadata_dict['speech_distribution'] = distribution
     metadata_dict['percentage_monologues'] = speech_types['perc_monologue']
     metadata_dict['percentage_duologues'] = speech_types['perc_duologue']
@@ -153,57 +240,45 @@ def process_speakers_features(soup, play_data, metadata_dict):
     return metadata_dict
 
 
-def additional_metadata(play_soup, play_data):
-    """
-    Process all play features.
-    """
-    metadata_dict = {}
-    for process in [process_speakers_features,
-                    rtf.percentage_of_scenes_discont_change]:
-        metadata_dict = process(play_soup, play_data, metadata_dict)
+# the feature stages use no intermediate results of the soup, so only the parsed play is cached
+play_facts = []
 
-    return metadata_dict
+feature_registry = frf.FeatureRegistry()
+feature_registry.register(process_speakers_features, outputs=tpf.speakers_features)
+feature_registry.register(tpf.percentage_of_scenes_discont_change, inputs=['num_scenes_iarkho'],
+                          outputs=tpf.discont_change_features)
 
 
-def find_speakers(scene):
+def additional_metadata(play_context, play_data, features=None):
     """
-    The function creates a list of the speakers in a scene in the order of their utterances.
-    The number of times a speaker appears in the list corresponds to the number of utterances the speaker makes.
+    Process the play features with the stages of feature_registry. The stages share the intermediate results through
+    the play context.
     Params:
-        scene - a beautiful soup object of the scene xml.
+        play_context - FeatureContext of the soup of the play.
+        play_data - a dictionary with information about the play.
+        features - a list of the features to compute, None for all features.
     Returns:
-        speakers_lst - a list of speakers in the scene.
+        metadata_dict - a dictionary with the play features.
     """
-    speakers_lst = []
-    speakers = [utterance['who'] for utterance in scene.find_all('sp')]
-    for speaker in speakers:
-        speaker_count = str(speaker).count(' ')
-        # if multiple speakers
-        if speaker_count > 0:
-            multiple_speakers = str(speaker).split(' ')
-            [speakers_lst.append(sp.strip()) for sp in multiple_speakers]
-        else:
-            speakers_lst.append(speaker)
+    arguments = {'play_context': play_context, 'play_data': play_data,
+                 'play_model': play_data['play_summary'],
+                 'cast': caf.Cast(play_data['characters'])}
+    metadata_dict = feature_registry.run(arguments, features)
 
-    return speakers_lst
+    return metadata_dict
 
 
-def extract_utterances(character_cast_dict, scene):
+def extract_utterances(cast, speakers):
     """
-    The function identifies all utterances in a scene and creates a list of dramatic characters who
-    make those utterances.
+    The function creates a list of dramatic characters who make the utterances of a scene.
     Params:
-        character_cast_dict - a dictionary where keys are dramatic characters and values are their alterantive names
-                              and collective numbers.
-        scene - a beautiful soup object of the scene xml.
+        cast - Cast of the play, the speakers are looked up by their alternative names.
+        speakers - a list of the speaker ids of the utterances, see SpeakerResolver.scene_speakers.
     Returns:
         utterance_lst - a list of speakers who make utterances in the given scene.
     """
-    # look up by alternative name
-    reverse_dict = dict(zip([val['alternative_names'] for val in character_cast_dict.values()],
-                            character_cast_dict.keys()))
-
-    utterance_lst = [reverse_dict[name.replace('#', '')] for name in find_speakers(scene)]
+    by_alternative_name = cast.by_alternative_name
+    utterance_lst = [by_alternative_name[speaker] for speaker in speakers]
 
     return utterance_lst
 
@@ -230,13 +305,13 @@ def identify_scene_cast(scene, scene_status):
     return scene_cast
 
 
-def count_utterances(scene, character_cast_dict, scene_status):
+def count_utterances(scene, cast, speaker_resolver, scene_status):
     """
     The function counts the number of utterances each dramatic character makes in a given scene.
     Params:
         scene - a beautiful soup object of the scene xml.
-        character_cast_dict - a dictionary where keys are dramatic characters and values are their alterantive names
-                              and collective numbers.
+        cast - Cast of the play.
+        speaker_resolver - SpeakerResolver of the play.
         characters_current_scene - a list of dramatic characters that are listed for the scene.
         excluded_characters - a list of characters who are listed as exluded.
         scene_status - scene_status - whether a scene is regular or extra.
@@ -246,7 +321,7 @@ def count_utterances(scene, character_cast_dict, scene_status):
     scene_info = {}
     scene_cast = identify_scene_cast(scene, scene_status)
     # account for dramatic characters from a previous scene re-appearing in the new scene.
-    utterance_lst = extract_utterances(character_cast_dict, scene)
+    utterance_lst = extract_utterances(cast, speaker_resolver.scene_speakers(scene)[1])
     # run a quality check
     ftf.check_cast_vs_speakers(scene_cast, utterance_lst, scene)
     # count how many utterances each speaker makes
@@ -255,39 +330,36 @@ def count_utterances(scene, character_cast_dict, scene_status):
     return scene_info
 
 
-def parse_scenes(scenes, character_cast_dictionary):
+@prf.profiled
+def parse_scenes(scenes, cast, speaker_resolver, play_model, act):
     """
-    The function goes through a list of scenes and updates complete_scene_info dictionary with informtion
-    about each scene speaking characters, their utterance counts, and percentage of non-speaking characters.
+    The function goes through a list of scenes and adds each scene to the play model with its speaking characters,
+    their utterance counts, the number of speakers and the percentage of non-speaking characters.
     Params:
         scenes - a list scenes.
-        name_pattern - regex expression for identifying character names.
-        character_cast_dictionary, reverse_character_cast - dictionaries for lookup of alternative names
-        for each dramatic character.
+        cast - Cast of the play for lookup of alternative names for each dramatic character.
+        speaker_resolver - SpeakerResolver of the play.
+        play_model - PlayModel of the play.
+        act - the name of the act of the scenes.
     Returns:
-        complete_scene_info - a dictionary where keys are scenes and values are dramatic characters and their
-                             utternace counts as well as the number of speakers and percentage of non-speakers.
+        play_model - PlayModel updated with the scenes.
     """
-    other_meta_fields = ['num_speakers', 'perc_non_speakers', 'num_utterances']
-    complete_scene_info = {}
-    scene_names = []
+    scene_casts = []
     sc_num = 0
     extra_scene_number = 1
     for scene in scenes:
         scene_status, sc_num, extra_scene_number = rtf.handle_scene_name_and_count(scene, sc_num, extra_scene_number)
         if sc_num != 1:
-            previous_cast = [name for name in complete_scene_info[scene_names[-1]].keys()
-                             if name not in other_meta_fields]
+            previous_cast = scene_casts[-1]
         else:
             previous_cast = []
-        scene_summary = count_utterances(scene, character_cast_dictionary, scene_status)
-        scene_summary['num_utterances'] = sum(list(scene_summary.values()))
-        scene_summary['num_speakers'], scene_summary['perc_non_speakers'] = ftf.count_characters(scene_summary)
+        scene_summary = count_utterances(scene, cast, speaker_resolver, scene_status)
+        num_utterances = sum(list(scene_summary.values()))
+        num_speakers, perc_non_speakers = ftf.count_characters(scene_summary)
         if float(sc_num) > 1:
-            current_scene = [key for key in scene_summary.keys() if key not in other_meta_fields]
-            scene_status = tpf.check_if_no_change(current_scene, previous_cast, scene_status)
-        complete_scene_info[str(sc_num) + '_' + str(scene_status)] = scene_summary
-        # check to make sure all character names are in scene cast as they appear in the play cast
-        scene_names.append(str(sc_num) + '_' + str(scene_status))
+            scene_status = tpf.check_if_no_change(list(scene_summary), previous_cast, scene_status)
+        play_model.add_scene(act, str(sc_num) + '_' + str(scene_status), scene_summary, num_utterances, num_speakers,
+                             perc_non_speakers)
+        scene_casts.append(list(scene_summary))
 
-    return complete_scene_info
+    return play_model
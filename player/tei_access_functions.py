@@ -0,0 +1,182 @@
+from bs4 import NavigableString
+from player import tei_streaming_functions as tsf
+
+# the classes of the text of an element; the other strings of BeautifulSoup, e.g., comments, are not text
+text_classes = (str, NavigableString)
+# how the dialects of TEI separate the speakers of a group utterance in the who attribute of <sp>: the separator,
+# the character which marks a group utterance and the prefix of the speaker ids, e.g., who="#ivan #petr"
+who_formats = {'russian': {'separator': ' #', 'marker': '#', 'prefix': '#'},
+               'french': {'separator': ',', 'marker': ',', 'prefix': ''},
+               'shakespeare': {'separator': ' ', 'marker': ' ', 'prefix': '#'}}
+
+
+def attribute(element, key, default=''):
+    """
+    The function reads an attribute of a TEI element of either BeautifulSoup or the streaming parser without
+    serializing the element.
+    Params:
+        element - Tag or TeiElement.
+        key - a string, name of the attribute, e.g., type or xml:id.
+        default - the value returned if the element has no such attribute.
+    Returns:
+        value - a string, the values of the multi-valued attributes of BeautifulSoup are joined with spaces.
+    """
+    value = element.get(key)
+    if value is None:
+        return default
+    if isinstance(value, list):
+        return ' '.join(value)
+
+    return value
+
+
+def text_before(element, name):
+    """
+    The function collects the text of an element up to its first descendant with the given name, e.g., the cast
+    of a scene which precedes its first utterance.
+    Params:
+        element - Tag or TeiElement.
+        name - a string, name of the descendant element, e.g., sp.
+    Returns:
+        a string, the whole text of the element if it has no such descendant.
+    """
+    texts = []
+    stack = list(reversed(element.contents))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, str):
+            if child.__class__ in text_classes:
+                texts.append(child)
+        elif child.name == name:
+            break
+        else:
+            stack.extend(reversed(child.contents))
+
+    return ''.join(texts)
+
+
+def iter_events(element):
+    """
+    The function walks the descendant elements of an element in the order of their markup.
+    Params:
+        element - Tag, TeiElement or the whole play.
+    Returns:
+        a generator of ('start', element) and ('end', element) tuples, like the start and end tags of the markup.
+    """
+    open_elements = []
+    stack = [iter(element.contents)]
+    while stack:
+        for child in stack[-1]:
+            if not isinstance(child, str):
+                yield 'start', child
+                open_elements.append(child)
+                stack.append(iter(child.contents))
+                break
+        else:
+            stack.pop()
+            if open_elements:
+                yield 'end', open_elements.pop()
+
+
+def start_tag(element):
+    """
+    The function creates the start tag of an element the way str() serializes it, with the attributes sorted by name.
+    """
+    attributes = element.attrs
+    if not isinstance(element, tsf.TeiElement):
+        attributes = {key: attribute(element, key) for key in attributes}
+
+    return tsf.start_tag(element.name, attributes)
+
+
+def iter_markup(element):
+    """
+    The function yields the markup of an element piece by piece. The pieces join into str(element).
+    """
+    yield start_tag(element)
+    for child in element.contents:
+        if isinstance(child, NavigableString):
+            yield child.output_ready()
+        elif isinstance(child, str):
+            yield tsf.escape_text(child)
+        elif isinstance(child, tsf.TeiElement):
+            yield from iter_markup(child)
+        else:
+            yield str(child)
+    yield '</' + element.name + '>'
+
+
+def markup_prefix(element, length):
+    """
+    The function returns the beginning of the markup of an element, e.g., for an error message, and serializes only
+    as much of the element as needed.
+    Params:
+        element - Tag or TeiElement.
+        length - int, the number of characters.
+    Returns:
+        a string, the same as str(element)[:length].
+    """
+    pieces = []
+    size = 0
+    for piece in iter_markup(element):
+        pieces.append(piece)
+        size += len(piece)
+        if size >= length:
+            break
+
+    return ''.join(pieces)[:length]
+
+
+class SpeakerResolver:
+    """
+    The speakers of the utterances of a TEI play. The who attribute of an utterance names its speaker or, for a group
+    utterance, several speakers, which the dialects of TEI separate differently, see who_formats. The plays repeat
+    the same few who values many times, so every distinct value is parsed once per play and its speaker ids are
+    memoized.
+    """
+
+    def __init__(self, dialect):
+        who_format = who_formats[dialect]
+        self.separator = who_format['separator']
+        self.marker = who_format['marker']
+        self.prefix = who_format['prefix']
+        # the speaker ids of every who value parsed so far
+        self.speakers = {}
+
+    def resolve(self, who):
+        """
+        The function finds the speakers of an utterance.
+        Params:
+            who - a string, the who attribute of the utterance.
+        Returns:
+            speakers - a tuple of the speaker ids without the prefix, e.g., ('ivan', 'petr').
+        """
+        speakers = self.speakers.get(who)
+        if speakers is None:
+            if self.marker in who:
+                speakers = [speaker.strip() for speaker in who.split(self.separator)]
+            else:
+                speakers = [who]
+            if self.prefix:
+                speakers = [speaker.replace(self.prefix, '') for speaker in speakers]
+            speakers = self.speakers[who] = tuple(speakers)
+
+        return speakers
+
+    def scene_speakers(self, scene):
+        """
+        The function finds the speakers of all utterances of a scene.
+        Params:
+            scene - Tag or TeiElement of the scene.
+        Returns:
+            whos - a list of the who attributes of the utterances in the order of the scene.
+            speakers - a list of the speaker ids in the order of the utterances. The number of times a speaker appears
+                       in the list corresponds to the number of utterances the speaker makes, a group utterance
+                       counts for each of its speakers.
+        """
+        whos = [utterance['who'] for utterance in scene.find_all('sp')]
+        speakers = []
+        for who in whos:
+            speakers.extend(self.resolve(who))
+
+        return whos, speakers
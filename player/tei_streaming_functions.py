@@ -0,0 +1,267 @@
+from collections import defaultdict
+from lxml import etree
+from bs4 import BeautifulSoup as bs
+from player import corpus_processing_functions as cpf
+from player import profiling_functions as prf
+
+# the only TEI elements the feature functions look up; the text of all other elements is kept,
+# but the elements themselves are not, except inside verse lines, which are kept as they are
+retained_elements = {'div', 'div1', 'div2', 'sp', 'l', 'stage', 'person', 'persongrp', 'persname',
+                     'collective_number', 'castitem', 'role', 'title', 'author', 'date', 'titlepart',
+                     'docauthor', 'docdate'}
+namespace_prefixes = {'http://www.w3.org/XML/1998/namespace': 'xml:'}
+chunk_size = 1 << 16
+
+
+class TeiElement:
+    """
+    A lightweight element of a TEI play which supports the part of the BeautifulSoup Tag interface used by the
+    TEI modules: find_all, find, get_text, attribute look up and serialization with str().
+    """
+    __slots__ = ('name', 'attrs', 'contents')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.contents = []
+
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def matches(self, name, attrs):
+        """
+        The function checks if the element has the given name and attribute values. An attribute value can be
+        a string or a list of acceptable strings.
+        """
+        if self.name != name:
+            return False
+        if attrs:
+            for key, value in attrs.items():
+                actual_value = self.attrs.get(key)
+                if actual_value is None:
+                    return False
+                if isinstance(value, list):
+                    if actual_value not in value:
+                        return False
+                elif actual_value != value:
+                    return False
+
+        return True
+
+    def descendants(self):
+        """
+        The function yields all descendant elements in document order.
+        """
+        stack = [child for child in reversed(self.contents) if child.__class__ is not str]
+        while stack:
+            element = stack.pop()
+            yield element
+            stack.extend([child for child in reversed(element.contents) if child.__class__ is not str])
+
+    def find_all(self, name, attrs=None):
+        return [element for element in self.descendants() if element.matches(name, attrs)]
+
+    def find(self, name, attrs=None):
+        for element in self.descendants():
+            if element.matches(name, attrs):
+                return element
+        return None
+
+    def get_text(self):
+        texts = []
+        stack = list(reversed(self.contents))
+        while stack:
+            child = stack.pop()
+            if child.__class__ is str:
+                texts.append(child)
+            else:
+                stack.extend(reversed(child.contents))
+
+        return ''.join(texts)
+
+    def serialize(self, parts):
+        """
+        The function appends the markup of the element to a list of strings the same way BeautifulSoup does.
+        """
+        parts.append(start_tag(self.name, self.attrs))
+        for child in self.contents:
+            if child.__class__ is str:
+                parts.append(escape_text(child))
+            else:
+                child.serialize(parts)
+        parts.append('</' + self.name + '>')
+
+    def __str__(self):
+        parts = []
+        self.serialize(parts)
+
+        return ''.join(parts)
+
+    __repr__ = __str__
+
+
+class TeiDocument(TeiElement):
+    """
+    The root of a streamed TEI play. It keeps an index of all retained elements by name, so that the searches
+    over the whole play do not have to walk the tree.
+    """
+    __slots__ = ('index',)
+
+    def __init__(self):
+        super().__init__('[document]', {})
+        self.index = defaultdict(list)
+
+    def find_all(self, name, attrs=None):
+        return [element for element in self.index.get(name, []) if element.matches(name, attrs)]
+
+    def find(self, name, attrs=None):
+        for element in self.index.get(name, []):
+            if element.matches(name, attrs):
+                return element
+        return None
+
+    def __str__(self):
+        parts = []
+        for child in self.contents:
+            if child.__class__ is str:
+                parts.append(escape_text(child))
+            else:
+                child.serialize(parts)
+
+        return ''.join(parts)
+
+    __repr__ = __str__
+
+
+class TeiTreeBuilder:
+    """
+    The parser target which receives the start, end and text events of the XML parser and builds a TeiDocument
+    in a single pass without keeping the elements the features do not need.
+    """
+
+    def __init__(self):
+        self.document = TeiDocument()
+        # the innermost retained element for every open element
+        self.stack = [self.document]
+        self.line_depth = 0
+
+    def start(self, tag, attrib):
+        name = local_name(tag)
+        if name in retained_elements or self.line_depth > 0:
+            element = TeiElement(name, {attribute_name(key): value for key, value in attrib.items()})
+            self.stack[-1].contents.append(element)
+            self.document.index[name].append(element)
+            self.stack.append(element)
+        else:
+            self.stack.append(self.stack[-1])
+        if name == 'l':
+            self.line_depth += 1
+
+    def end(self, tag):
+        self.stack.pop()
+        if local_name(tag) == 'l':
+            self.line_depth -= 1
+
+    def data(self, text):
+        parent = self.stack[-1]
+        # the text outside of the retained elements, e.g., in the teiHeader, is never used
+        if parent is self.document:
+            return
+        contents = parent.contents
+        if contents and contents[-1].__class__ is str:
+            contents[-1] += text
+        else:
+            contents.append(text)
+
+    def close(self):
+        return self.document
+
+
+def local_name(tag):
+    """
+    The function removes the namespace from a tag and lowercases it like the lxml HTML parser used by BeautifulSoup.
+    """
+    if tag[0] == '{':
+        tag = tag[tag.find('}')+1:]
+
+    return tag.lower()
+
+
+def attribute_name(key):
+    """
+    The function turns a namespaced attribute, e.g. {http://www.w3.org/XML/1998/namespace}id, into the name
+    BeautifulSoup uses for it, e.g. xml:id.
+    """
+    if key[0] == '{':
+        namespace, name = key[1:].split('}')
+        return (namespace_prefixes.get(namespace, '') + name).lower()
+
+    return key.lower()
+
+
+def escape_text(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def start_tag(name, attrs):
+    """
+    The function creates the start tag of an element with its attributes sorted by name, the same way BeautifulSoup
+    serializes them, so that the code which reads the serialized markup gets the same string from both parsers.
+    """
+    tag = '<' + name
+    for key, value in sorted(attrs.items()):
+        value = escape_text(value)
+        if '"' in value:
+            if "'" in value:
+                value = '"' + value.replace('"', '&quot;') + '"'
+            else:
+                value = "'" + value + "'"
+        else:
+            value = '"' + value + '"'
+        tag += ' ' + key + '=' + value
+
+    return tag + '>'
+
+
+@prf.profiled
+def parse_tei(file_name, content=None):
+    """
+    The function reads a TEI file in chunks and parses it in a single pass with an event-driven XML parser.
+    Params:
+        file_name - a string, name of the xml file.
+        content - the bytes of the file if it has already been read, None to read the file.
+    Returns:
+        document - TeiDocument with the acts, scenes, utterances, verse lines, stage directions and the cast.
+    """
+    parser = etree.XMLParser(target=TeiTreeBuilder(), resolve_entities=False, huge_tree=True)
+    with cpf.open_file(file_name, content, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            parser.feed(chunk)
+
+    return parser.close()
+
+
+@prf.profiled
+def read_tei(file_name, streaming=True, content=None):
+    """
+    The function parses a TEI file with the streaming parser. If the file is not well-formed XML, or streaming
+    is False, the file is parsed with the more lenient BeautifulSoup instead.
+    Params:
+        file_name - a string, name of the xml file.
+        streaming - bool, False to always use BeautifulSoup.
+        content - the bytes of the file if it has already been read, None to read the file.
+    Returns:
+        soup - TeiDocument or BeautifulSoup object of the play.
+    """
+    if streaming:
+        try:
+            return parse_tei(file_name, content)
+        except etree.XMLSyntaxError as error:
+            print('\tWARNING.', 'The file is not well-formed XML, using BeautifulSoup instead:', error)
+    with cpf.open_file(file_name, content) as file:
+        soup = bs(file, 'lxml')
+
+    return soup
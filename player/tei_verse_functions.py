@@ -0,0 +1,95 @@
+from collections import Counter
+from player import tei_access_functions as taf
+
+# the types of the divisions of a play which are scenes
+scene_types = {'scene', 'extra_scene', 'complex_scene'}
+# the mark of a verse line rhyming with a verse line of another scene, anywhere in the markup of the verse line
+interscene_mark = 'interscene'
+
+
+class VerseIndex:
+    """
+    The verse lines of a TEI play, indexed in a single walk over the play. Every <l> is classified by its part
+    attribute (I, M, F or None for a whole verse line). The verse lines of a scene are the consecutive verse lines
+    from its first to its last one in the order of the play, so a scene only keeps the range of its verse lines.
+    The stage directions which split verse lines are counted during the same walk.
+    """
+
+    def __init__(self, play_soup):
+        # the elements and the part attributes of the verse lines in the order of the play
+        self.lines = []
+        self.parts = []
+        # the (first, end) range of the verse lines of every scene <div> in the order of the play
+        self.scenes = []
+        # the stage directions which end after the start of a verse line (<l> or <l part="I">) and before the end of
+        # the last verse line preceding the start of the next one
+        self.splitting_stage_directions = 0
+        open_scenes = []
+        # the stage directions since the start of the current verse line, which are counted when a verse line ends
+        pending_stages = None
+        for event, element in taf.iter_events(play_soup):
+            name = element.name
+            if event == 'start':
+                if name == 'l':
+                    self.lines.append(element)
+                    self.parts.append(element.get('part'))
+                    if not element.attrs or element.attrs == {'part': 'I'}:
+                        pending_stages = 0
+                elif name == 'div' and taf.attribute(element, 'type') in scene_types:
+                    open_scenes.append((len(self.scenes), element))
+                    self.scenes.append((len(self.parts), len(self.parts)))
+            else:
+                if name == 'l':
+                    if pending_stages is not None:
+                        self.splitting_stage_directions += pending_stages
+                        pending_stages = 0
+                elif name == 'stage' and pending_stages is not None:
+                    pending_stages += 1
+                elif open_scenes and element is open_scenes[-1][1]:
+                    scene, _ = open_scenes.pop()
+                    self.scenes[scene] = (self.scenes[scene][0], len(self.parts))
+        self.part_counts = Counter(self.parts)
+
+    def num_verse_lines(self, excluded_parts=()):
+        """
+        The function counts the verse lines.
+        Params:
+            excluded_parts - a list of the parts which are not counted as verse lines, e.g., the medial and final parts
+                             of a split verse line.
+        Returns:
+            int
+        """
+        return len(self.parts) - sum(self.part_counts[part] for part in excluded_parts)
+
+    def scene_lines(self, scene):
+        """
+        The function returns the range of the indices of the verse lines of a scene.
+        Params:
+            scene - int, the index of the scene in the order of the play.
+        """
+        first, end = self.scenes[scene]
+
+        return range(first, end)
+
+    def split_mark(self, line):
+        """
+        The function reads the mark of a split verse line from the start tag of the verse line: the first word of
+        the value of its first attribute in the order of the names, the way the TEI modules have always read it from
+        the serialized markup, e.g., I for <l part="I">, but 5 for <l n="5" part="I">.
+        Params:
+            line - int, the index of the verse line in the order of the play.
+        Returns:
+            a string, empty if the verse line has no attributes.
+        """
+        tag = taf.start_tag(self.lines[line])
+
+        return tag[tag.find('"'):tag.find('>')].replace('"', '').split(' ')[0]
+
+    def has_interscene_mark(self, line):
+        """
+        The function checks if the markup of a verse line, i.e., its attributes, the elements within it or its text,
+        contains the interscene rhyme mark.
+        Params:
+            line - int, the index of the verse line in the order of the play.
+        """
+        return interscene_mark in str(self.lines[line])
@@ -1,15 +1,44 @@
-import pandas as pd
-from os import listdir
+import os
 import re
 import numpy as np
 import string
 from collections import Counter
-import json
-import copy
+from functools import lru_cache
+from player import corpus_processing_functions as cpf
+from player import profiling_functions as prf
+from player import parse_cache_functions as pcf
+from player import manifest_functions as mf
+from player import columnar_output_functions as cof
+from player import metadata_functions as mdf
+from player import feature_registry_functions as frf
+from player import play_model_functions as pmf
+from player import txt_markup_functions as tmf
+from player import cast_functions as caf
 regex_pattern = r'[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+\w[А-Я+Ѣ+І]|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+ [А-Я+Ѣ+І] |[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+ [А-Я+Ѣ+І]'
-
-
-def process_all_plays(input_directory, output_path, metadata_path, regex_pattern):
+# the metadata columns of a play, in the order add_play_info expects them
+metadata_columns = ['title', 'last_name', 'first_name', 'creation_date', 'free_iambs']
+# the regular expressions which do not depend on the orthography or the name pattern are compiled once
+cast_name_regex = re.compile(r'[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+|'
+                             r'[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+ [А-Я+Ѣ+І] |[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+|'
+                             r'[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+')
+entity_regex = re.compile(r'ЯВЛЕНІЕ +\w+|ЯВЛЕНИЕ +\w+|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+')
+number_regex = re.compile(r'\d+')
+# the mark of the stage directions replaced in a verse line, see replace_tags
+stage_mark_regex = re.compile('STAGE')
+collective_number_regex = re.compile(r'<collective_number \d>')
+punctuation = [symb for symb in string.punctuation + '—' + '\n' + '\t']
+stage_direction_tags = ['extra_SCENE', 'cast', 'no_change_SCENE', 'intermedia', 'stage separator',
+                        'speaker_clarification', 'speaking_character_no_utterance']
+# translation tables replacing every punctuation symbol with a space or removing it in a single pass
+punctuation_to_space = str.maketrans({symb: ' ' for symb in punctuation})
+punctuation_to_none = str.maketrans({symb: None for symb in punctuation})
+scene_end_noise = [symb for symb in punctuation if symb not in ['_', '<', '>']] + ['STAGE']
+
+
+def process_all_plays(input_directory, output_path, metadata_path, regex_pattern, workers=1, ordered=True,
+                      features=None, force=False, columnar_format=None, async_io=False,
+                      cache_path=None, cache_size=pcf.default_cache_size, profile=False,
+                      profile_memory=False):
     """
     The function allows to process all files in a specified directory.
     Params:
@@ -17,18 +46,72 @@ def process_all_plays(input_directory, output_path, metadata_path, regex_pattern
         output_path - directory in which the json summaries will be saved.
         metadata_path - path to the metadata file, a tab-delimited txt file with informtion about all plays.
         regex_pattern - a regex pattern which identifies dramatic character names.
+        workers - the number of worker processes, 1 processes the plays one by one.
+        ordered - bool, whether the plays are reported in the order of the files or as soon as they are processed.
+        features - a list of the features to compute, None for all features.
+        force - bool, True to process all plays, False to skip the plays which did not change since the last run.
+        columnar_format - 'parquet' or 'arrow' to also save the play, scene and character tables of the corpus,
+                          None for the json files only.
+        async_io - bool, True to read the files and write the json files asynchronously while the plays are
+                   processed, e.g., for corpora on network storage.
+        cache_path - the path to the directory of the cache of the parsed plays, None to parse every play.
+        cache_size - the size limit of the cache of the parsed plays in bytes.
+        profile - bool, True to time the stages of every play and save the report in output_path,
+                  see prf.ProfileReport.
+        profile_memory - bool, True to also trace the peak and the retained memory of every play and of its stages
+                         with tracemalloc, it implies profile. The stages are slower when their memory is traced.
+    Returns:
+        failed_plays - a dictionary with the files that could not be processed and their errors,
+                       the json files will be saved in output_path directory.
+    """
+    report = prf.ProfileReport(profile_memory) if profile or profile_memory else None
+    # fail early on unknown features
+    feature_registry.select(features)
+    if columnar_format:
+        cof.check_table_format(columnar_format)
+    all_files = cpf.list_files(input_directory, '.txt')
+    metadata = mdf.read_metadata(metadata_path, metadata_columns + ['num_acts'])
+    play_indices = {f: f.replace('.txt', '') for f in all_files}
+    invalid_plays = mdf.validate_metadata(metadata, play_indices, metadata_columns + ['num_acts'])
+    # report the plays without valid metadata before any play is parsed
+    failed_plays = cpf.report_failures((f, None, invalid_plays[f]) for f in all_files if f in invalid_plays)
+    all_files = [f for f in all_files if f not in invalid_plays]
+    entries = mf.play_entries(input_directory, all_files, metadata, play_indices, [regex_pattern, features])
+    cache = pcf.open_cache(cache_path, cache_size)
+    processed_files = cpf.process_corpus(process_file, mf.dirty_plays(output_path, entries, force),
+                                         (input_directory, output_path, metadata, regex_pattern, features,
+                                          cache),
+                                         workers, ordered, async_io, input_directory, report)
+    failed_plays.update(cpf.report_failures(mf.record_plays(output_path, entries, processed_files)))
+    if columnar_format:
+        cof.write_corpus_tables(mf.play_outputs(output_path, all_files), output_path, columnar_format)
+    if report is not None:
+        report.save(os.path.join(output_path, prf.report_name))
+
+    return failed_plays
+
+
+def process_file(file, input_directory, output_path, metadata_df, regex_pattern, features=None, cache=None,
+                 content=None, write=True):
+    """
+    The function processes a single file and saves its json summary.
+    Params:
+        file - the name of the txt file in input_directory.
+        input_directory, output_path, metadata_df, regex_pattern, features - see process_all_plays.
+        cache - ParseCache of the parsed plays, None to parse the play.
+        content - the bytes of the file if it has already been read, None to read the file.
+        write - bool, False to return the json text instead of saving it, see cpf.save_json.
     Returns:
-        no returns, the files will be saved in output_path directory.
+        json_name - the path of the saved json file.
     """
-    all_files = [f for f in listdir(input_directory) if f.count('.txt') > 0]
-    metadata_df = pd.read_csv(metadata_path, sep='\t')
-    for file in all_files:
-        play_data_dict = process_play(input_directory+file, metadata_df, input_directory, regex_pattern)
-        json_name = output_path + str(file.replace('.txt', '.json'))
-        with open(json_name, 'w') as fp:
-            json.dump(play_data_dict, fp, ensure_ascii=False, indent=2)
+    file_name = os.path.join(input_directory, file)
+    play_data_dict = process_play(file_name, metadata_df, input_directory, regex_pattern, features, content, cache)
+    json_name = os.path.join(output_path, file.replace('.txt', '.json'))
 
+    return cpf.save_json(json_name, play_data_dict, write)
 
+
+@prf.profiled
 def split_text(play_file, old_ortho_flag=True):
     """
     The function splits the text into two parts: the first with the dramatic character cast
@@ -69,9 +152,7 @@ def identify_character_names(line):
     Returns:
         characters - a list of character names or 0 if not present in that line
     """
-
-    pattern = r'[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+ [А-Я+Ѣ+І] |[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+'
-    characters = [name.group() for name in re.finditer(pattern, line)]
+    characters = [name.group() for name in cast_name_regex.finditer(line)]
     if len(characters) > 0:
         return characters
     else:
@@ -94,25 +175,6 @@ def handle_alternative_names(line):
     return character_name, alternative_names
 
 
-def make_reverse_dictionary(cast_dictionary):
-    """
-    The function allows us to reverse a cast dictionary, so that we could look up the character names in reverse, e.g.
-    from 'COUNT' to 'COUNT VIAZEMSKII'.
-    Params:
-        cast_dictionry -  dictionary where keys are character names as they appear in the cast list and
-                          values are character names as they appear in the play text.
-    Returns:
-        reverse_cast_dictionary - the dictionary with keys and values reversed.
-    """
-    reverse_cast_dictionary = {}
-    for item in cast_dictionary.items():
-        if item[1]['alternative_names']:
-            for name in item[1]['alternative_names']:
-                reverse_cast_dictionary[name] = item[0]
-
-    return reverse_cast_dictionary
-
-
 def get_collective_number(line):
     """
     The function extracts collective number, i.e., whether a character like guards should be counted as 1 or 2
@@ -124,12 +186,13 @@ def get_collective_number(line):
         collective_number - the number corresponding to the dramatic character, e.g. 2.
     """
     name = identify_character_names(line)[0]
-    match = re.findall(r'<collective_number \d>', line)
+    match = collective_number_regex.findall(line)
     collective_number = match[-1].split(' ')[-1]
 
     return name, collective_number.replace('>', '')
 
 
+@prf.profiled
 def identify_character_cast(cast_string):
     """
     The function parses the string with the dramatic character cast and creates a dictionary with information
@@ -178,25 +241,20 @@ def split_a_scene(scene_string):
     return scene_cast, scene_itself
 
 
-def quality_check_cast(cast_list, character_cast_dictionary, reverse_character_cast):
+def quality_check_cast(cast_list, cast):
     """
     The function checks if all dramatic characters which are listed for a particular scene can be found
-    either in the character_cast_dictionary or reverse_character_cast. This allows us to check for potential errors
-    in the text.
+    in the play cast either by their names or by their alternative names. This allows us to check for potential
+    errors in the text.
     Params:
         cast_list - a list with dramatic characters which are expected in the scene.
-        character_cast_dictionary - a dictionary where keys are dramatic character names as they appear in the list,
-                                    values are other names used for the same characters in the text.
-       reverse_cast_dictionary - a dictionary where keys and values of the character_cast_dictionary are switched.
+        cast - Cast of the play.
     Returns:
         No return, raises an error.
     """
     for name in cast_list:
-        if name not in character_cast_dictionary:
-            if name in reverse_character_cast:
-                pass
-            else:
-                raise Exception("Error. Name not found', name")
+        if name not in cast:
+            raise Exception("Error. Name not found', name")
 
 
 def get_scene_status(scene):
@@ -220,49 +278,41 @@ def get_scene_status(scene):
     return scene_status
 
 
-def check_alternative_names(name, character_cast_dictionary, reverse_character_cast):
+def check_alternative_names(name, cast):
     """
     The function checks if a dramatic character name has any alternative variants.
     Params:
-        name - string, dramatic character name.
-        character_cast_dictionary, reverse_character_cast - dictionaries for looking up alternative character names.
+        name - string, dramatic character name as it appears in the cast list or one of its alternative names.
+        cast - Cast of the play.
     """
-    try:
-        alt_names = character_cast_dictionary[name]['alternative_names']
-    except KeyError:
-        alt_names = character_cast_dictionary[reverse_character_cast[name]]['alternative_names']
+    alt_names = cast.alternative_names(name)
 
     return alt_names
 
 
-def check_utternaces_by_alternative_names(alt_names, reverse_character_cast, utterances):
+def check_utternaces_by_alternative_names(alt_names, utterance_counts):
     """
     Count utternaces that appear in the text under alternative dramatic character names.
     Params:
         alt_names - a list of alternative names for a dramatic character.
-        reverse_character_cast - a dictionary where keys are names as they appear in the text, values- names as they
-                                appear in the list at the beginning of the play.
-        utterances - a list of dramatic character names extracted from the text of the scene.
+        utterance_counts - a Counter of the dramatic character names extracted from the text of the scene.
     Returns:
         speaker_total - int, the number of utternaces by a speaker in the scene.
     """
     speaker_total = 0
     for alt in alt_names:
-        try:
-            speaker_total += utterances.count(alt)
-        except KeyError:
-            speaker_total += utterances.count(reverse_character_cast[alt])
+        speaker_total += utterance_counts[alt]
 
     return speaker_total
 
 
-def count_utterances(scene_cast, utterances, character_cast_dictionary, reverse_character_cast):
+def count_utterances(scene_cast, utterances, cast):
     """
     The function counts the number of utternaces for each dramatic character listed for the scene.
     Params:
         scene_cast - a list of dramatic characters which are present in the scene.
         utterances - a list of dramatic character names extracted from the text of the scene.
-        character_cast_dictionary, reverse_character_cast - dictionaries for looking up alternative character names.
+        cast - Cast of the play for looking up alternative character names.
     Returns:
         scene_info - a dictionary where keys are dramatic character names and values are numbers of utterances.
     """
@@ -271,20 +321,22 @@ def count_utterances(scene_cast, utterances, character_cast_dictionary, reverse_
     if len(scene_cast) == 1:
         scene_info[scene_cast[0]] = 1
     else:
+        # tally the speakers once, so that every look up below is O(1)
+        utterance_counts = Counter(utterances)
         for name in scene_cast:
-            utterance_count = utterances.count(name)
+            utterance_count = utterance_counts[name]
             if utterance_count != 0:
                 scene_info[name] = utterance_count
             # in case the character appears in the text under a different name
             else:
-                alt_names = check_alternative_names(name, character_cast_dictionary, reverse_character_cast)
+                alt_names = check_alternative_names(name, cast)
                 # in case there are alternative names
                 if alt_names:
                     # there may be a few alternative names associated with a character
-                    speaker_total = check_utternaces_by_alternative_names(alt_names, reverse_character_cast, utterances)
+                    speaker_total = check_utternaces_by_alternative_names(alt_names, utterance_counts)
                     scene_info[name] = speaker_total
                 else:
-                    scene_info[name] = utterances.count(name)
+                    scene_info[name] = utterance_count
 
     return scene_info
 
@@ -364,20 +416,21 @@ def check_if_no_change(current_scene_cast, previous_cast, scene_status):
     return scene_status
 
 
-def parse_scenes(scenes, name_pattern, character_cast_dictionary, reverse_character_cast):
+@prf.profiled
+def parse_scenes(scenes, name_pattern, cast, play_model, act):
     """
-    The function goes through a list of scenes and updates complete_scene_info dictionary with informtion
-    about each scene speaking characters, their utterance counts, and percentage of non-speaking characters.
+    The function goes through a list of scenes and adds each scene to the play model with its speaking characters,
+    their utterance counts, the number of speakers and the percentage of non-speaking characters.
     Params:
         scenes - a list scenes.
-        name_pattern - regex experssion for identifying character names.
-        character_cast_dictionary, reverse_character_cast - dictionaries for lookup of alternative names
-                                                            for each dramatic character.
+        name_pattern - regex experssion (a string or a compiled pattern) for identifying character names.
+        cast - Cast of the play for lookup of alternative names for each dramatic character.
+        play_model - PlayModel of the play.
+        act - the name of the act of the scenes.
     Returns:
-        complete_scene_info - a dictionary where keys are scenes and values are dramatic characters and their
-                             utternace counts as well as the number of speakers and percentage of non-speakers.
+        play_model - PlayModel updated with the scenes.
     """
-    complete_scene_info = {}
+    name_regex = re.compile(name_pattern)
     scene_casts = []
     sc_num = 0
     extra_scene_number = 1
@@ -389,16 +442,16 @@ def parse_scenes(scenes, name_pattern, character_cast_dictionary, reverse_charac
             scene_status = check_if_no_change(scene_cast, scene_casts[-1], scene_status)
         scene_casts.append(scene_cast)
         # check to make sure all character names are in scene cast as they appear in the play cast
-        quality_check_cast(scene_cast, character_cast_dictionary, reverse_character_cast)
-        utterances = [name.group().strip() for name in re.finditer(name_pattern, scene_itself)]
-        scene_summary = count_utterances(scene_cast, utterances, character_cast_dictionary, reverse_character_cast)
-        scene_summary['num_utterances'] = sum(list(scene_summary.values()))
-        scene_summary['num_speakers'] = count_speaking_characters(scene_summary, scene_cast)
-        scene_summary['perc_non_speakers'] = round(((len(scene_cast) - scene_summary['num_speakers']) /
-                                                    len(scene_cast)) * 100, 3)
-        complete_scene_info[str(sc_num) + '_' + str(scene_status)] = scene_summary
+        quality_check_cast(scene_cast, cast)
+        utterances = [name.group().strip() for name in name_regex.finditer(scene_itself)]
+        scene_summary = count_utterances(scene_cast, utterances, cast)
+        num_utterances = sum(list(scene_summary.values()))
+        num_speakers = count_speaking_characters(scene_summary, scene_cast)
+        perc_non_speakers = round(((len(scene_cast) - num_speakers) / len(scene_cast)) * 100, 3)
+        play_model.add_scene(act, str(sc_num) + '_' + str(scene_status), scene_summary, num_utterances, num_speakers,
+                             perc_non_speakers)
 
-    return complete_scene_info
+    return play_model
 
 
 def split_acts(play_text, number_acts, old_ortho_flag):
@@ -426,42 +479,46 @@ def split_acts(play_text, number_acts, old_ortho_flag):
     return acts, rus_scene
 
 
-def parse_play(play_text, name_pattern, number_acts, old_ortho_flag,
-               character_cast_dictionary, reverse_character_cast):
+@lru_cache(maxsize=None)
+def compile_patterns(old_ortho_flag, name_pattern=regex_pattern):
     """
-    The function splits the play into acts and scenes and parses each scene.
+    The function compiles the regular expressions which depend on the orthography and on the name pattern.
+    The result is cached, so the patterns are compiled once and reused for every play of a batch.
     Params:
-        play_text - string with the text of the play.
-        number_acts - the number of acts we expect.
         old_ortho_flag - bool, True if a play is published in the old orthography.
-        character_cast_dictionary, reverse_character_cast - dictionaries for lookup of alternative names
-                                                            for each dramatic character.
+        name_pattern - regex experssion for identifying character names.
     Returns:
-        act_info - a dictionary where keys are acts and values are scenes with their info.
+        patterns - a dictionary with the compiled patterns for the character names and the scene splits.
     """
-    acts, rus_scene = split_acts(play_text, number_acts, old_ortho_flag)
-    act_info = {}
-    for act_num, act in enumerate(acts, 1):
-        scenes = re.split('{}|<extra'.format(rus_scene), act)[1:]
-        act_info['act' + '_' + str(act_num)] = parse_scenes(scenes,
-                                                            name_pattern,
-                                                            character_cast_dictionary,
-                                                            reverse_character_cast)
+    if old_ortho_flag:
+        rus_scene = 'ЯВЛЕНІЕ'
+    else:
+        rus_scene = 'ЯВЛЕНИЕ'
+    patterns = {'names': re.compile(name_pattern), 'scenes': re.compile('{}|<extra'.format(rus_scene))}
 
-    return act_info
+    return patterns
 
 
-def splitting_verse_line(scene):
+@prf.profiled
+def parse_play(play_text, name_pattern, number_acts, old_ortho_flag, cast):
     """
-    The function splits a scene at the end of verse lines.
+    The function splits the play into acts and scenes and parses each scene.
     Params:
-        scene - a string, text of a scene.
+        play_text - string with the text of the play.
+        number_acts - the number of acts we expect.
+        old_ortho_flag - bool, True if a play is published in the old orthography.
+        cast - Cast of the play for lookup of alternative names for each dramatic character.
     Returns:
-        splits - a list of strings split at the end of verse lines.
+        play_model - PlayModel of the play, i.e., its acts and scenes with their info.
     """
-    splits = re.split('<end_verse_line>|<end_verse_line_interscene_rhyme>', scene)
+    acts, _ = split_acts(play_text, number_acts, old_ortho_flag)
+    patterns = compile_patterns(old_ortho_flag, name_pattern)
+    play_model = pmf.PlayModel()
+    for act_num, act in enumerate(acts, 1):
+        scenes = patterns['scenes'].split(act)[1:]
+        parse_scenes(scenes, patterns['names'], cast, play_model, play_model.add_act('act' + '_' + str(act_num)))
 
-    return splits
+    return play_model
 
 
 def remove_numbers(input_string):
@@ -469,26 +526,29 @@ def remove_numbers(input_string):
     The helper function removes number from a string.
     """
     if input_string.isalpha() is False:
-        numbers = re.findall(r'\d+', input_string)
+        numbers = number_regex.findall(input_string)
         for num in numbers:
             input_string = input_string.replace(num, '')
 
     return input_string
 
 
-def replace_tags(line):
+def replace_stage_directions(markup_index, start, end):
     """
-    The helper function that replaces the text of a stage direction with ' STAGE'
+    The helper function that replaces the stage directions in a part of the play text with ' STAGE '.
     Params:
-        line - a line of text with a stage direction in it.
+        markup_index - tmf.MarkupIndex of the play.
+        start, end - the positions of the part of the play text.
     Returns:
-        line - a line of text with stage directions replaced by ' STAGE'
+        line - the part of the text with stage directions replaced by ' STAGE '
     """
-    for _ in range(line.count('<stage>')):
-        stage_direction_text = line[line.find('<stage>')+len('<stage>'):line.find('</stage>')]
-        line = line.replace('<stage>'+stage_direction_text+'</stage>', ' STAGE ')
+    pieces = []
+    for span_start, span_end in markup_index.spans_in_range(start, end):
+        pieces.append(markup_index.text[start:span_start])
+        start = span_end
+    pieces.append(markup_index.text[start:end])
 
-    return line
+    return ' STAGE '.join(pieces)
 
 
 def clean_stage_direction(line):
@@ -499,13 +559,27 @@ def clean_stage_direction(line):
     Returns:
         line - without tags.
     """
-    entities = re.findall(r'ЯВЛЕНІЕ +\w+|ЯВЛЕНИЕ +\w+|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+',
-                          line)
-    punctuation = [symb for symb in string.punctuation + '—' + '\n' + '\t']
-    tags = ['extra_SCENE', 'cast', 'no_change_SCENE', 'intermedia', 'stage separator',
-            'speaker_clarification', 'speaking_character_no_utterance']
-    for item in tags + punctuation + entities:
-        line = line.replace(item, ' ')
+    entities = entity_regex.findall(line)
+    for tag in stage_direction_tags:
+        line = line.replace(tag, ' ')
+    line = line.translate(punctuation_to_space)
+    for entity in entities:
+        line = line.replace(entity, ' ')
+
+    return line
+
+
+def replace_tags(line):
+    """
+    The helper function that replaces the text of a stage direction with ' STAGE'
+    Params:
+        line - a line of text with a stage direction in it.
+    Returns:
+        line - a line of text with stage directions replaced by ' STAGE'
+    """
+    for _ in range(line.count('<stage>')):
+        stage_direction_text = line[line.find('<stage>')+len('<stage>'):line.find('</stage>')]
+        line = line.replace('<stage>'+stage_direction_text+'</stage>', ' STAGE ')
 
     return line
 
@@ -529,47 +603,41 @@ def remove_start_end_stage_directions(verse_line):
     return verse_line
 
 
-def estimate_verse_line_splitting_stage_directions(text_string):
+def estimate_verse_line_splitting_stage_directions(markup_index):
     """
     The function counts the number of stage directions that split verse lines, i.e., appear within it but not
-    at the beginning or end of a verse line.
+    at the beginning or end of a verse line. Only the verse lines with a stage direction (or the STAGE mark, which
+    is counted as one) are cleaned, every one of them as a whole.
     Params:
-        text_string - text of the play.
+        markup_index - tmf.MarkupIndex of the play.
     Returns:
         number_splitting_stage_directions - int
     """
-    # split verse lines
-    splits = splitting_verse_line(text_string)
+    positions = [token.start for token in markup_index.stage_starts]
+    positions.extend(match.start() for match in stage_mark_regex.finditer(markup_index.text))
     number_splitting_stage_directions = 0
-    for split in splits:
+    for start, end in markup_index.verse_line_spans(positions):
         # remove any numbers that could appear in the string
         line = remove_start_end_stage_directions(
-                                                clean_stage_direction(replace_tags(remove_numbers(split))))
+                                                clean_stage_direction(replace_tags(remove_numbers(
+                                                    markup_index.text[start:end]))))
         number_splitting_stage_directions += line.count('STAGE')
 
     return number_splitting_stage_directions
 
 
-def count_number_word_tokens(play_text):
+def count_number_word_tokens(markup_index):
     """
     The function counts the total number of word tokens in stage directions in the entire play.
     The word tokens are split at white spaces.
     Params:
-        play_text - str, text of a play.
+        markup_index - tmf.MarkupIndex of the play.
     Returns:
         total_number_word_tokens - int
     """
     total_number_word_tokens = 0
-    indices = []
-    for index_pair in zip([i.span()[1] for i in re.finditer(r'<stage>', play_text)],
-                          [i.span()[0] for i in re.finditer(r'</stage>', play_text)]):
-        indices.append(index_pair)
-    for index_pair in indices:
-        stage_direction = play_text[index_pair[0]:index_pair[1]]
-        punctuation = [symb for symb in string.punctuation + '—' + '\n' + '\t']
-        for punct in punctuation:
-            stage_direction = stage_direction.replace(punct, '')
-        num_tokens = len(stage_direction.strip().split(' '))
+    for stage_direction in markup_index.stage_direction_texts():
+        num_tokens = len(stage_direction.translate(punctuation_to_none).strip().split(' '))
         total_number_word_tokens += num_tokens
 
     return total_number_word_tokens
@@ -593,6 +661,35 @@ def check_end_of_scene(scene_string):
         return False
 
 
+def check_end_of_scene_tokens(play_text, scene_tokens):
+    """
+    Check if a scene ends with the end of a verse line followed only by white space and stage directions, which
+    the cleaning of the scene removes.
+    Params:
+        play_text - string with the text of the play.
+        scene_tokens - the tokens of the scene, see tmf.tokenize_play.
+    Returns:
+        False - if the scene ends with an end of a verse line
+        True - otherwise, or if the stage directions of the scene are not well-formed, i.e., the scene has to be
+               cleaned to tell
+    """
+    in_stage_direction = False
+    ends_with_verse_line = False
+    for token in scene_tokens:
+        if token.kind == 'stage_start' or token.kind == 'stage_end':
+            if in_stage_direction is (token.kind == 'stage_start'):
+                return True
+            in_stage_direction = not in_stage_direction
+        elif in_stage_direction:
+            continue
+        elif token.kind == 'verse_line_end':
+            ends_with_verse_line = True
+        elif ends_with_verse_line and (token.kind != 'text' or not play_text[token.start:token.end].isspace()):
+            ends_with_verse_line = False
+
+    return in_stage_direction or not ends_with_verse_line
+
+
 def tackle_alternative_scene(play_text):
     """
     A helper function that replaces alternative tags for scenes (in case they are within <>, meaning not present
@@ -603,42 +700,56 @@ def tackle_alternative_scene(play_text):
     return play_text
 
 
-def split_scenes(play_text, old_ortho_flag=True):
+def split_scenes(play_text, tokens, old_ortho_flag=True):
     """
-    The helper function which splits play text into scenes.
-    """
-    if old_ortho_flag:
-        rus_scene = 'ЯВЛЕНІЕ'
-    else:
-        rus_scene = 'ЯВЛЕНИЕ'
-    # make sure the scenes with alternative mark up (where scenes are not using the word ЯВЛЕНІЕ in the text)
-    play_text = tackle_alternative_scene(play_text)
-    scenes = re.split('{}|<extra'.format(rus_scene), play_text)
+    The helper function which splits play text into scenes. The scenes with alternative mark up (where scenes are
+    not using the word ЯВЛЕНІЕ in the text, but <ЯВЛЕНІЕ>) are split as well.
+    Params:
+        play_text - string with the text of the play.
+        tokens - the tokens of the text, see tmf.tokenize_play.
+        old_ortho_flag - whether the play is in the old Russian orthography.
+    Returns:
+        scenes - a list of (start, end, scene_tokens) of the scenes, the first one is the text before the first scene.
+    """
+    scene_word = 'ЯВЛЕНІЕ' if old_ortho_flag else 'ЯВЛЕНИЕ'
+    scenes = []
+    start, scene_tokens = 0, []
+    for token in tokens:
+        if token.kind == 'extra_scene' or (token.kind == 'scene' and
+                                           scene_word in play_text[token.start:token.end]):
+            scenes.append((start, token.start, scene_tokens))
+            start, scene_tokens = token.end, []
+        else:
+            scene_tokens.append(token)
+    scenes.append((start, len(play_text), scene_tokens))
 
     return scenes
 
 
-def verse_split_between_scenes(play_text, old_ortho_flag=True):
+def verse_split_between_scenes(markup_index, old_ortho_flag=True):
     """
     The function calculates the number of scenes that are connected with other scenes via a verse line, rhyme or both.
+    A scene which ends with the end of a verse line is not split, the other scenes are cleaned of stage directions,
+    numbers and names before checking their end.
     Params:
-        play_text - string with the text of the play.
+        markup_index - tmf.MarkupIndex of the play.
         old_ortho_flag - whether the play is in the old Russian orthography.
     Returns:
         scenes_counts - a dictionary with count of scenes with each type of inter-scene connection.
     """
     scenes_counts = {'scenes_split_verses': 0, 'scenes_rhymes': 0, 'both': 0}
-    scenes = split_scenes(play_text, old_ortho_flag=True)
-    for scene in scenes[1:]:
-        if scene.count('<end_verse_line_interscene_rhyme>') > 0:
+    play_text = markup_index.text
+    for start, end, scene_tokens in split_scenes(play_text, markup_index.tokens, old_ortho_flag=True)[1:]:
+        if any(token.rhyme for token in scene_tokens):
             scenes_counts['scenes_rhymes'] += 1
-        scene_cleaned = replace_tags(remove_numbers(scene)).strip()
+        if check_end_of_scene_tokens(play_text, scene_tokens) is False:
+            continue
+        scene = tackle_alternative_scene(play_text[start:end])
+        scene_cleaned = remove_numbers(tackle_alternative_scene(replace_stage_directions(markup_index, start,
+                                                                                         end))).strip()
         if check_end_of_scene(scene_cleaned):
-            pattern = r'ЯВЛЕНІЕ +\w+|ЯВЛЕНИЕ +\w+|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+|[А-Я+Ѣ+І]+.\w[А-Я+Ѣ+І]+'
-            entities = re.findall(pattern, scene)
-            symbols = [symb for symb in string.punctuation + '—' + '\n' + '\t'
-                       if symb not in ['_', '<', '>']] + ['STAGE'] + entities
-            for symbol in symbols:
+            entities = entity_regex.findall(scene)
+            for symbol in scene_end_noise + entities:
                 scene_cleaned = scene_cleaned.replace(symbol, '').strip()
             if check_end_of_scene(scene_cleaned):
                 scenes_counts['scenes_split_verses'] += 1
@@ -648,25 +759,20 @@ def verse_split_between_scenes(play_text, old_ortho_flag=True):
     return scenes_counts
 
 
-def estimate_number_scenes(scene_summary):
+def estimate_number_scenes(play_model):
     """
     The function calcualtes the number of scenes per text and per Iarkho (i.e., as marked by actual dramatic character
     entrances and exits).
     Params:
-        scene_summary - a dictionary output of the parse_play function.
+        play_model - PlayModel of the play, the output of the parse_play function.
     Returns:
         total_number_scenes_per_text - number of scenes as they are printed
         total_number_scenes_iarkho - number of scnes per Iarkho, which he calls mobility coefficient (MC)
     """
-    total_number_scenes_per_text = 0
-    total_number_scenes_iarkho = 0
-    for key in scene_summary.keys():
-        # get the number of scenes as it is printed in the text
-        total_number_scenes_per_text += len([scene for scene in scene_summary[key].keys()
-                                            if scene.count('extra') == 0])
-        # count scenes as marked by actual entrances and exits
-        total_number_scenes_iarkho += len([scene for scene in scene_summary[key].keys()
-                                          if scene.count('no_change') == 0])
+    # get the number of scenes as it is printed in the text
+    total_number_scenes_per_text = len([scene for scene in play_model.scenes if scene.name.count('extra') == 0])
+    # count scenes as marked by actual entrances and exits
+    total_number_scenes_iarkho = len([scene for scene in play_model.scenes if scene.name.count('no_change') == 0])
 
     return total_number_scenes_per_text, total_number_scenes_iarkho
 
@@ -674,10 +780,7 @@ def estimate_number_scenes(scene_summary):
 def number_speaking_no_change_case(previous_scene, no_change_scene):
     speaking_set = set()
     non_speaking_set = set()
-    characters = [key for key in previous_scene.keys() if key not in ["num_utterances",
-                                                                      "num_speakers",
-                                                                      "perc_non_speakers"]]
-    for key in characters:
+    for key in previous_scene.keys():
         if previous_scene[key] > 0 or no_change_scene[key] > 0:
             speaking_set.add(key)
         if previous_scene[key] == 0 or no_change_scene[key] == 0:
@@ -689,53 +792,43 @@ def number_speaking_no_change_case(previous_scene, no_change_scene):
     return num_speaking, perc_non_speaking
 
 
-def combine_no_change_scenes(play_summary):
-    which_to_exclude = []
-    speakers = []
-    perc_non_speakers = []
-    for act in play_summary.keys():
-        analysed_scenes = []
-        for scene in list(play_summary[act].keys()):
-            if scene.count('no_change') > 0:
-
-                num_speaking, perc_non_speaking = number_speaking_no_change_case(
-                                                  play_summary[act][analysed_scenes[-1]],
-                                                  play_summary[act][scene])
-                speakers.append(num_speaking)
-                perc_non_speakers.append(perc_non_speaking)
-                which_to_exclude.append((act, scene, analysed_scenes[-1]))
-            analysed_scenes.append(scene)
-
-    return which_to_exclude, speakers, perc_non_speakers
-
-
-def remove_combined_scenes(play_dict, values_to_exclude):
+def iarkho_scene_statistics(play_model, speaking_no_change_case=number_speaking_no_change_case):
     """
-    The function removes info about scenes that we have previously combined and calculated combined data
-    for in cases when there was no change in character cast.
+    The function combines every scene without a change of the character cast with the preceding scene, as Iarkho
+    counts them as one scene, and collects the number of speakers and the percentage of non-speakers of every scene
+    in a single pass. The play model is not modified.
     Params:
-        play_dict - a dictionary with speakers for each scene.
-        values_to_exlude - a list of typles where the first value is the act and the other values are scenes.
+        play_model - PlayModel of the play, the output of the parse_play function.
+        speaking_no_change_case - a function which calculates the number of speakers and the percentage of
+                                  non-speakers of a scene combined with its preceding scene from the dictionaries of
+                                  the dramatic characters of the two scenes, see PlayModel.scene_cast_values.
     Returns:
-        play_dict - without exluded scenes.
-    """
-    for value in values_to_exclude:
-        result = {key: val for key, val in play_dict[value[0]].items()
-                  if key not in value[1:]}
-        play_dict[value[0]] = result
-
-    return play_dict
-
-
-def preprocess_play_summary(play_summary_copy):
-    values_to_exclude, speakers, perc_non_speakers = combine_no_change_scenes(play_summary_copy)
-    play_summary_updated = remove_combined_scenes(play_summary_copy, values_to_exclude)
-    for key in play_summary_updated.keys():
-        for scene in play_summary_updated[key]:
-            speakers.append((play_summary_updated[key][scene]['num_speakers']))
-            perc_non_speakers.append(round(play_summary_updated[key][scene]['perc_non_speakers'], 3))
+        speakers - a list with the number of speakers of the combined scenes, followed by the other scenes.
+        perc_non_speakers - a list with the percentage of non-speakers in the same order.
+    """
+    speakers, perc_non_speakers = [], []
+    other_speakers, other_perc_non_speakers = [], []
+    for act, scenes in play_model.act_scenes().items():
+        # the preceding scene is counted on its own only if the next scene changes the character cast
+        previous_scene, previous_combined = None, False
+        for scene in scenes:
+            combined = scene.name.count('no_change') > 0
+            if combined:
+                if previous_scene is None:
+                    raise IndexError('The first scene of {} has no preceding scene to be combined with.'.format(act))
+                num_speaking, perc_non_speaking = speaking_no_change_case(play_model.scene_cast_values(previous_scene),
+                                                                          play_model.scene_cast_values(scene))
+                speakers.append(num_speaking)
+                perc_non_speakers.append(perc_non_speaking)
+            elif previous_scene is not None and not previous_combined:
+                other_speakers.append(previous_scene.num_speakers)
+                other_perc_non_speakers.append(round(previous_scene.perc_non_speakers, 3))
+            previous_scene, previous_combined = scene, combined
+        if previous_scene is not None and not previous_combined:
+            other_speakers.append(previous_scene.num_speakers)
+            other_perc_non_speakers.append(round(previous_scene.perc_non_speakers, 3))
 
-    return speakers, perc_non_speakers
+    return speakers + other_speakers, perc_non_speakers + other_perc_non_speakers
 
 
 def sigma_iarkho(variants, weights):
@@ -755,55 +848,37 @@ def sigma_iarkho(variants, weights):
     return sigma
 
 
-def parse_play_summary(play_summary):
+def parse_play_summary(play_model):
     """
-    The function parses the dictionary with play_summary produced by parse_play function
-    and outputs total number of utterances
+    The function parses the play model produced by parse_play function and outputs total number of utterances
     Params:
-        play_summary - a dictionary output by parse_play function.
+        play_model - PlayModel of the play, the output of the parse_play function.
     Returns:
         total_utterances_in_play - total number of utterances in a play.
     """
     total_utterances_in_play = 0
-    for key in play_summary.keys():
-        for scene in play_summary[key].keys():
-            total_utterances_in_play += play_summary[key][scene]['num_utterances']
+    for scene in play_model.scenes:
+        total_utterances_in_play += scene.num_utterances
 
     return total_utterances_in_play
 
 
-def number_present_characters(play_dictionary):
+def number_present_characters(cast, play_model):
     """
     The function calculates the number of characters present in the play. If a character is listed in cast, but doesn't
-    appear on stage, he/she doesn't count.
+    appear on stage under any of its names, he/she doesn't count. A character with a collective number counts as that
+    many characters.
     Params:
-        play_dictionary - a dictioanry with data for the play, which includes the characters present in each scene.
+        cast - Cast of the play.
+        play_model - PlayModel of the play summary.
     Returns:
         total_number_present_characters - int.
     """
-    all_present_characters = set()
-    for key in play_dictionary['play_summary'].keys():
-        for scene in play_dictionary['play_summary'][key]:
-            for item in play_dictionary['play_summary'][key][scene].keys():
-                if item != 'num_utterances' and item != 'num_speakers' and item != 'perc_non_speakers':
-                    all_present_characters.add(item)
-    total_number_present_characters = 0
-    for character in play_dictionary['characters'].keys():
-        alt_names = play_dictionary['characters'][character]['alternative_names']
-        # in case there are alternative names
-        if alt_names:
-            possible_names = [character] + alt_names
-        else:
-            possible_names = [character]
-        if len(set(possible_names).intersection(set(all_present_characters))) > 0:
-            coll_number = play_dictionary['characters'][character]['collective_number']
-            # if there is a collective number for this character
-            if coll_number:
-                total_number_present_characters += int(coll_number)
-            else:
-                total_number_present_characters += 1
+    all_present_characters = set(play_model.present_characters())
+    appearing_on_stage = [character for character, possible_names in cast.possible_names.items()
+                          if not all_present_characters.isdisjoint(possible_names)]
 
-    return total_number_present_characters
+    return cast.count_heads(appearing_on_stage)
 
 
 def percentage_of_each_speech_type(speech_distribution):
@@ -829,16 +904,17 @@ def percentage_of_each_speech_type(speech_distribution):
     return speech_types
 
 
-def speech_distribution_iarkho(play_summary_copy):
+def speech_distribution_iarkho(play_model, speaking_no_change_case=number_speaking_no_change_case):
     """
     The function creates speech distrubution per Iarkho, i.e., the number of speaking characters by number of scenes.
     Params:
-        play_summary - a dictionary output by parse_play function.
+        play_model - PlayModel of the play, the output of the parse_play function.
+        speaking_no_change_case - see iarkho_scene_statistics.
     Returns:
         speech_distribution - a list of tuples were the 0 element is the number of speaking characters
                               and the 1 element is the number of scenes with such number of speaking characters.
     """
-    speakers, perc_non_speakers = preprocess_play_summary(play_summary_copy)
+    speakers, perc_non_speakers = iarkho_scene_statistics(play_model, speaking_no_change_case)
     counter = Counter
     counted = counter(speakers)
     speech_distribution = sorted(counted.items(), key=lambda pair: pair[0], reverse=False)
@@ -848,15 +924,15 @@ def speech_distribution_iarkho(play_summary_copy):
     return speech_distribution, speech_types, av_perc_non_speakers
 
 
-def process_speakers_features(play_string, play_data, metadata_dict, old_ortho_flag):
+def process_speakers_features(play_context, play_model, cast, metadata_dict, old_ortho_flag):
     """
     Iarkho's features described in Iarkho's work on the evolution of 5-act tragedy in verse.
     """
-    metadata_dict['num_present_characters'] = number_present_characters(play_data)
-    metadata_dict['num_scenes_text'] = estimate_number_scenes(play_data['play_summary'])[0]
-    metadata_dict['num_scenes_iarkho'] = estimate_number_scenes(play_data['play_summary'])[1]
-    play_summary_copy = copy.deepcopy(play_data['play_summary'])
-    distribution, speech_types, non_speakers = speech_distribution_iarkho(play_summary_copy)
+    metadata_dict['num_present_characters'] = number_present_characters(cast, play_model)
+    scenes = estimate_number_scenes(play_model)
+    metadata_dict['num_scenes_text'] = scenes[0]
+    metadata_dict['num_scenes_iarkho'] = scenes[1]
+    distribution, speech_types, non_speakers = speech_distribution_iarkho(play_model)
     metadata_dict['speech_distribution'] = distribution
     metadata_dict['percentage_monologues'] = speech_types['perc_monologue']
     metadata_dict['percentage_duologues'] = speech_types['perc_duologue']
@@ -870,13 +946,14 @@ def process_speakers_features(play_string, play_data, metadata_dict, old_ortho_f
     return metadata_dict
 
 
-def process_features_verse(play_string, play_data, metadata_dict, old_ortho_flag):
+def process_features_verse(play_context, play_data, play_model, metadata_dict, cast_string, old_ortho_flag):
     """
     Iarkho's features described in the work on Corneille's comedies and tragedies.
     """
-    metadata_dict['total_utterances'] = parse_play_summary(play_data['play_summary'])
-    metadata_dict['num_verse_lines'] = play_string.count('<end_verse_line>') + play_string.count(
-                                       '<end_verse_line_interscene_rhyme>')
+    facts = play_context.compute(markup_facts, cast_string, old_ortho_flag)
+    scenes_counts = facts['scenes_counts']
+    metadata_dict['total_utterances'] = parse_play_summary(play_model)
+    metadata_dict['num_verse_lines'] = facts['num_verse_lines']
     if play_data['free_iambs'] == 1:
         metadata_dict['rescaled_num_verse_lines'] = int(metadata_dict['num_verse_lines'] * .796)
         metadata_dict['dialogue_vivacity'] = round(metadata_dict['total_utterances'] /
@@ -884,16 +961,13 @@ def process_features_verse(play_string, play_data, metadata_dict, old_ortho_flag
     else:
         metadata_dict['dialogue_vivacity'] = round(metadata_dict['total_utterances'] /
                                                    metadata_dict['num_verse_lines'], 3)
-    metadata_dict['num_scenes_with_split_verse_lines'] = verse_split_between_scenes(
-                                                         play_string, old_ortho_flag)['scenes_split_verses']
-    metadata_dict['num_scenes_with_split_rhymes'] = verse_split_between_scenes(
-                                                    play_string, old_ortho_flag)['scenes_rhymes']
+    metadata_dict['num_scenes_with_split_verse_lines'] = scenes_counts['scenes_split_verses']
+    metadata_dict['num_scenes_with_split_rhymes'] = scenes_counts['scenes_rhymes']
     metadata_dict['percentage_scene_split_verse'] = round((metadata_dict['num_scenes_with_split_verse_lines'] /
                                                           metadata_dict['num_scenes_iarkho'])*100, 3)
     metadata_dict['percentage_scene_split_rhymes'] = round((metadata_dict['num_scenes_with_split_rhymes'] /
                                                            metadata_dict['num_scenes_iarkho'])*100, 3)
-    metadata_dict['num_scenes_with_split_rhymes_verses'] = verse_split_between_scenes(
-                                                            play_string, old_ortho_flag)['both']
+    metadata_dict['num_scenes_with_split_rhymes_verses'] = scenes_counts['both']
     metadata_dict['num_open_scenes'] = (metadata_dict['num_scenes_with_split_verse_lines'] +
                                         metadata_dict['num_scenes_with_split_rhymes'] -
                                         metadata_dict['num_scenes_with_split_rhymes_verses'])
@@ -906,7 +980,31 @@ def process_features_verse(play_string, play_data, metadata_dict, old_ortho_flag
     return metadata_dict
 
 
-def process_stage_directions_features(play_string, play_data, metadata_dict, cast_string, old_ortho_flag):
+def markup_facts(play_string, cast_string, old_ortho_flag):
+    """
+    The function indexes the markup of the play and of its cast and counts everything the verse and the
+    stage-directions features need from the text, so the text is scanned once for both.
+    Params:
+        play_string - string, play text.
+        cast_string - string, text of the cast.
+        old_ortho_flag - bool, True if the text is in the old Russian orthogoraphy.
+    Returns:
+        facts - a dictionary with the inter-scene verse splits (see verse_split_between_scenes), the number of
+                verse lines and the counts of the stage directions.
+    """
+    markup_index = tmf.MarkupIndex(play_string)
+    cast_index = tmf.MarkupIndex(cast_string)
+    facts = {'scenes_counts': verse_split_between_scenes(markup_index, old_ortho_flag),
+             'num_verse_lines': len(markup_index.verse_line_ends),
+             'num_stage_directions': markup_index.num_stage_directions() + cast_index.num_stage_directions(),
+             'num_word_tokens_in_stage_directions': (count_number_word_tokens(markup_index) +
+                                                     count_number_word_tokens(cast_index)),
+             'num_verse_splitting_stage_directions': estimate_verse_line_splitting_stage_directions(markup_index)}
+
+    return facts
+
+
+def process_stage_directions_features(play_context, play_data, metadata_dict, cast_string, old_ortho_flag):
     """
     Sperantov's stage-directions features
     """
@@ -914,44 +1012,39 @@ def process_stage_directions_features(play_string, play_data, metadata_dict, cas
         number_verse_lines = metadata_dict['rescaled_num_verse_lines']
     else:
         number_verse_lines = metadata_dict['num_verse_lines']
-    entire_text = play_string + cast_string
-    metadata_dict['num_stage_directions'] = entire_text.count('<stage>')
+    facts = play_context.compute(markup_facts, cast_string, old_ortho_flag)
+    metadata_dict['num_stage_directions'] = facts['num_stage_directions']
     metadata_dict['stage_directions_frequency'] = round((metadata_dict['num_stage_directions'] /
                                                         number_verse_lines) * 100, 3)
-    metadata_dict['num_word_tokens_in_stage_directions'] = count_number_word_tokens(entire_text)
+    metadata_dict['num_word_tokens_in_stage_directions'] = facts['num_word_tokens_in_stage_directions']
     metadata_dict['average_length_of_stage_direction'] = round(metadata_dict['num_word_tokens_in_stage_directions'] /
                                                                metadata_dict['num_stage_directions'], 3)
-    metadata_dict['num_verse_splitting_stage_directions'] = estimate_verse_line_splitting_stage_directions(play_string)
+    metadata_dict['num_verse_splitting_stage_directions'] = facts['num_verse_splitting_stage_directions']
     metadata_dict['degree_of_verse_prose_interaction'] = round((metadata_dict['num_verse_splitting_stage_directions'] /
                                                                number_verse_lines) * 100, 3)
 
     return metadata_dict
 
 
-def percentage_of_scenes_discont_change(play_string, play_data, metadata_dict, old_ortho_flag):
+def percentage_of_scenes_discont_change(play_model, metadata_dict):
     """
     The function calculates percentage of scenes with a discontinuous change of dramatic characters, i.e., when no
     a single dramatic character from the scene 1 re-appears in the next scene, e.g., scene 1. FILIPIN, ANGELIQUE.
     scene 2. ORONTE.
     Params:
-        play_string - string, play text.
-        play_data - a dictionary with information about the play.
+        play_model - PlayModel of the play summary.
         metadata_dict - a dictionary where we are storing play features; eventually will be combined with play_data.
-        old_ortho_flag - bool, True if the text is in the old Russian orthogoraphy.
     Returns:
         metadata_dict - updated with the new feature, i.e., percentage_scenes_with_discontinuous_change_characters.
     """
     number_scenes = metadata_dict['num_scenes_iarkho']
-    characters = []
+    previous_cast = None
     num_scenes_with_disc_character_change = 0
-    for act in play_data['play_summary'].keys():
-        for entry in play_data['play_summary'][act].values():
-            new_cast = [item for item in entry.keys() if
-                        item not in ['num_speakers', 'perc_non_speakers', 'num_utterances']]
-            if len(characters) > 0:
-                if len(set(new_cast).intersection(set(characters[-1]))) == 0:
-                    num_scenes_with_disc_character_change += 1
-            characters.append(new_cast)
+    for scene in play_model.scenes:
+        new_cast = set(play_model.cast(scene))
+        if previous_cast is not None and new_cast.isdisjoint(previous_cast):
+            num_scenes_with_disc_character_change += 1
+        previous_cast = new_cast
     perc_disc = round((num_scenes_with_disc_character_change / number_scenes) * 100, 3)
     metadata_dict['number_scenes_with_discontinuous_change_characters'] = num_scenes_with_disc_character_change
     metadata_dict['percentage_scenes_with_discontinuous_change_characters'] = perc_disc
@@ -959,17 +1052,46 @@ def percentage_of_scenes_discont_change(play_string, play_data, metadata_dict, o
     return metadata_dict
 
 
-def additional_metadata(play_string, play_data, cast_string, old_ortho_flag):
-    """
-    Process all play features in stages
+# the features produced by the feature stages shared by the modules
+speakers_features = ['num_present_characters', 'num_scenes_text', 'num_scenes_iarkho', 'speech_distribution',
+                     'percentage_monologues', 'percentage_duologues', 'percentage_non_duologues',
+                     'percentage_above_two_speakers', 'av_percentage_non_speakers', 'sigma_iarkho']
+verse_features = ['total_utterances', 'num_verse_lines', 'rescaled_num_verse_lines', 'dialogue_vivacity',
+                  'num_scenes_with_split_verse_lines', 'num_scenes_with_split_rhymes', 'percentage_scene_split_verse',
+                  'percentage_scene_split_rhymes', 'num_scenes_with_split_rhymes_verses', 'num_open_scenes',
+                  'percentage_open_scenes', 'percentage_scenes_rhymes_split_verse']
+stage_directions_features = ['num_stage_directions', 'stage_directions_frequency',
+                             'num_word_tokens_in_stage_directions', 'average_length_of_stage_direction',
+                             'num_verse_splitting_stage_directions', 'degree_of_verse_prose_interaction']
+discont_change_features = ['number_scenes_with_discontinuous_change_characters',
+                           'percentage_scenes_with_discontinuous_change_characters']
+
+feature_registry = frf.FeatureRegistry()
+feature_registry.register(process_speakers_features, outputs=speakers_features)
+feature_registry.register(process_features_verse, inputs=['num_scenes_iarkho'], outputs=verse_features)
+feature_registry.register(process_stage_directions_features, inputs=['num_verse_lines', 'rescaled_num_verse_lines'],
+                          outputs=stage_directions_features)
+feature_registry.register(percentage_of_scenes_discont_change, inputs=['num_scenes_iarkho'],
+                          outputs=discont_change_features)
+
+
+def additional_metadata(play_context, play_data, cast_string, old_ortho_flag, features=None):
+    """
+    Process the play features with the stages of feature_registry. The stages share the intermediate results through
+    the play context.
+    Params:
+        play_context - FeatureContext of the play text.
+        play_data - a dictionary with information about the play.
+        cast_string - string, text of the cast.
+        old_ortho_flag - bool, True if the text is in the old Russian orthogoraphy.
+        features - a list of the features to compute, None for all features.
+    Returns:
+        metadata_dict - a dictionary with the play features.
     """
-    metadata_dict = {}
-    for process in [process_speakers_features, process_features_verse,
-                    process_stage_directions_features, percentage_of_scenes_discont_change]:
-        if process == process_stage_directions_features:
-            metadata_dict = process(play_string, play_data, metadata_dict, cast_string, old_ortho_flag)
-        else:
-            metadata_dict = process(play_string, play_data, metadata_dict, old_ortho_flag)
+    arguments = {'play_context': play_context, 'play_data': play_data,
+                 'play_model': play_data['play_summary'], 'cast_string': cast_string,
+                 'old_ortho_flag': old_ortho_flag, 'cast': caf.Cast(play_data['characters'])}
+    metadata_dict = feature_registry.run(arguments, features)
 
     return metadata_dict
 
@@ -987,24 +1109,30 @@ def add_play_info(metadata):
     return play_data
 
 
-def process_play(file_name, metadata_df, input_path, regex_pattern):
+def process_play(file_name, metadata_df, input_path, regex_pattern, features=None, content=None, cache=None):
     """
     The function parses a txt file and creates a summary with features and metadata for the play.
     Params:
         file_name - a string, name of the file with the play text.
-        metadata_df - a dataframe containing the info about the play.
+        metadata_df - MetadataIndex or a dataframe containing the info about the plays.
         input_path - path where the txts are stored.
         regex_pattern - pattern which helps find dramatic characters.
+        features - a list of the features to compute, None for all features.
+        content - the bytes of the file if it has already been read, None to read the file.
+        cache - ParseCache of the parsed plays, None to parse the play.
     Returns:
         play_data - a dictionary with detailed play summary by scenes, metadata, and features
     """
     print(file_name)
-    play_index = file_name.replace(input_path, '').replace('.txt', '')
-    play_meta = metadata_df[metadata_df['index'] == play_index][['title', 'last_name',
-                                                                'first_name', 'creation_date',
-                                                                 'free_iambs']].values
-    comedy = open(file_name, 'r') .read()
-    number_acts = int(metadata_df[metadata_df['index'] == play_index]['num_acts'].values[0])
+    play_index = os.path.relpath(file_name, input_path).replace('.txt', '')
+    play_rows = mdf.play_rows(metadata_df, play_index)
+    play_meta = play_rows[metadata_columns].values
+    if cache is not None and content is None:
+        # the cache key is the hash of the content
+        content = cpf.read_file(file_name)
+    with cpf.open_file(file_name, content) as file:
+        comedy = file.read()
+    number_acts = int(play_rows['num_acts'].values[0])
 
     # add logic for detecting if the text is in old orthography
     if comedy.count('Ѣ') > 0:
@@ -1014,14 +1142,31 @@ def process_play(file_name, metadata_df, input_path, regex_pattern):
     # split the text into the part with the cast names and the play itself
     cast_text, play_text = split_text(comedy, old_ortho_flag)
 
-    character_cast_dictionary = identify_character_cast(cast_text)
-    reverse_character_cast = make_reverse_dictionary(character_cast_dictionary)
+    parsed, play_context = pcf.read_play(cache, file_name, content, [__name__, regex_pattern, number_acts],
+                                         lambda name, data: play_text,
+                                         lambda text: parse_text(text, cast_text, regex_pattern, number_acts,
+                                                                 old_ortho_flag),
+                                         [(markup_facts, cast_text, old_ortho_flag)])
     play_data = add_play_info(play_meta)
-    play_data['characters'] = character_cast_dictionary.copy()
-    play_data['play_summary'] = parse_play(play_text, regex_pattern,
-                                           number_acts, old_ortho_flag,
-                                           character_cast_dictionary,
-                                           reverse_character_cast)
-    play_data['metadata'] = additional_metadata(play_text, play_data, cast_text, old_ortho_flag)
+    play_data['characters'] = parsed['characters']
+    play_data['play_summary'] = parsed['play_summary']
+    play_data['metadata'] = additional_metadata(play_context, play_data, cast_text, old_ortho_flag, features)
 
     return play_data
+
+
+def parse_text(play_text, cast_text, regex_pattern, number_acts, old_ortho_flag):
+    """
+    The function extracts the dramatic characters and the play summary of a play.
+    Params:
+        play_text - string, play text after the list of dramatic characters.
+        cast_text - string, text of the cast.
+        regex_pattern, number_acts, old_ortho_flag - see parse_play.
+    Returns:
+        parsed - a dictionary with the dramatic characters and the play summary.
+    """
+    cast = caf.Cast(identify_character_cast(cast_text))
+    parsed = {'characters': cast.characters.copy()}
+    parsed['play_summary'] = parse_play(play_text, regex_pattern, number_acts, old_ortho_flag, cast)
+
+    return parsed
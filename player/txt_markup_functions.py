@@ -0,0 +1,100 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+# a token of the txt markup: its kind, its position in the text and, for the ends of verse lines, whether the verse
+# line rhymes with a verse line of another scene
+Token = namedtuple('Token', ['kind', 'start', 'end', 'rhyme'])
+
+# the patterns of the markup tokens; the tags are grouped under their common "<", so that the scan checks the tags
+# only where a tag starts. The alternative scene tags (within <>) are scenes as well.
+markup_regex = re.compile('<(?:(?P<alternative_scene>ЯВЛЕНІЕ>|ЯВЛЕНИЕ>)|(?P<extra_scene>extra)|(?P<cast>cast)|'
+                          '(?P<stage_start>stage>)|(?P<stage_end>/stage>)|(?P<verse_line_end>end_verse_line>)|'
+                          '(?P<rhyme_verse_line_end>end_verse_line_interscene_rhyme>))|'
+                          '(?P<scene>ЯВЛЕНІЕ|ЯВЛЕНИЕ)|(?P<act>ДѢЙСТВІЕ|ДЕЙСТВИЕ)')
+# the kinds of the tokens of the groups which differ from the group names
+token_kinds = {'alternative_scene': 'scene', 'rhyme_verse_line_end': 'verse_line_end'}
+
+
+def tokenize_play(play_text):
+    """
+    The function splits the text of a play (or of its cast) into a stream of tokens in a single scan. The markup
+    tokens are the acts and scenes, the cast of a scene (<cast), the starts and ends of stage directions and
+    the ends of verse lines; the text between them is a text token.
+    Params:
+        play_text - string with the text of the play.
+    Returns:
+        tokens - a list of Token in the order of the text; the start and end of a token are its positions in the text.
+    """
+    tokens = []
+    position = 0
+    for match in markup_regex.finditer(play_text):
+        start, end = match.span()
+        if start > position:
+            tokens.append(Token('text', position, start, False))
+        group = match.lastgroup
+        tokens.append(Token(token_kinds.get(group, group), start, end, group == 'rhyme_verse_line_end'))
+        position = end
+    if position < len(play_text):
+        tokens.append(Token('text', position, len(play_text), False))
+
+    return tokens
+
+
+class MarkupIndex:
+    """
+    The tokens of a play with an index of its stage directions, built once per play. The i-th <stage> is paired with
+    the i-th </stage>, and the ends of verse lines split the text into verse lines. The index answers which
+    stage directions fall in a part of the text, what a stage direction holds and which verse lines hold them
+    without rewriting the text.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize_play(text)
+        self.stage_starts = [token for token in self.tokens if token.kind == 'stage_start']
+        self.stage_ends = [token for token in self.tokens if token.kind == 'stage_end']
+        self.verse_line_ends = [token for token in self.tokens if token.kind == 'verse_line_end']
+        # the spans of the stage directions, from the start of <stage> to the end of </stage>
+        self.span_starts = [token.start for token in self.stage_starts]
+        self.span_ends = [token.end for token in self.stage_ends]
+
+    def num_stage_directions(self):
+        """
+        The function returns the number of stage directions, i.e., of the <stage> tags.
+        """
+        return len(self.stage_starts)
+
+    def stage_direction_texts(self):
+        """
+        The function returns the texts of all stage directions, without the tags.
+        """
+        return [self.text[start.end:end.start] for start, end in zip(self.stage_starts, self.stage_ends)]
+
+    def spans_in_range(self, start, end):
+        """
+        The function finds the stage directions which lie within text[start:end] with both of their tags.
+        Params:
+            start, end - the positions of the part of the text.
+        Returns:
+            spans - a list of (start, end) of the stage directions in the part of the text, tags included.
+        """
+        first = bisect_left(self.span_starts, start)
+        last = min(bisect_right(self.span_ends, end), len(self.span_starts))
+        spans = zip(self.span_starts[first:last], self.span_ends[first:last])
+        return [(span_start, span_end) for span_start, span_end in spans if span_start < span_end]
+
+    def verse_line_spans(self, positions):
+        """
+        The function finds the verse lines, i.e., the parts of the text between the ends of verse lines, which
+        contain any of the positions.
+        Params:
+            positions - an iterable of positions in the text.
+        Returns:
+            spans - a list of (start, end) of the verse lines in the order of the text, without the ends of verse lines.
+        """
+        line_starts = [0] + [token.end for token in self.verse_line_ends]
+        line_ends = [token.start for token in self.verse_line_ends] + [len(self.text)]
+        lines = sorted({bisect_right(line_ends, position) for position in positions})
+
+        return [(line_starts[line], line_ends[line]) for line in lines]
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import sys
 import argparse
+from player import corpus_processing_functions as cpf
 from player import russian_tei_functions as rtf
 
 
@@ -13,8 +14,32 @@ def main(raw_args):
                         help='Indicate whether you want to provide a custom metadata file.')
     parser.add_argument('-m', '--metadata_path', type=str, required=False,
                         help='Path to the tab-delimited tsv file with metadata')
+    parser.add_argument('-w', '--workers', type=cpf.workers_argument, required=False, default=1,
+                        help='The number of worker processes used to process the plays in parallel.')
+    parser.add_argument('-f', '--features', type=str, nargs='+', required=False,
+                        help='The features to compute, by default all features are computed.')
+    parser.add_argument('--force', action='store_true',
+                        help='Process all plays, including the ones which did not change since the last run.')
+    parser.add_argument('-s', '--soup', action='store_true',
+                        help='Parse the TEI files with BeautifulSoup instead of the streaming parser.')
+    parser.add_argument('--columnar', type=str, required=False, choices=['parquet', 'arrow'],
+                        help='Also save the play, scene and character tables of the corpus in this format.')
+    parser.add_argument('--async_io', action='store_true',
+                        help='Read the files and write the json files asynchronously while the plays are processed.')
+    parser.add_argument('--cache', type=str, required=False,
+                        help='The directory of the cache of the parsed plays; the cached plays are not parsed again.')
+    parser.add_argument('--cache_size', type=int, required=False, default=1024,
+                        help='The size limit of the cache of the parsed plays in megabytes.')
+    parser.add_argument('--profile', action='store_true',
+                        help='Time the stages of every play and save the report to the output path.')
+    parser.add_argument('--profile_memory', action='store_true',
+                        help='Also trace the peak and the retained memory of every play and of its stages.')
     args = vars(parser.parse_args(raw_args))
-    rtf.process_all_plays(args['input_path'], args['ouput_path'], args['custom_flag'], args['metadata_path'])
+    rtf.process_all_plays(args['input_path'], args['ouput_path'], args['custom_flag'], args['metadata_path'],
+                          workers=args['workers'], features=args['features'], async_io=args['async_io'],
+                          force=args['force'], columnar_format=args['columnar'],
+                          cache_path=args['cache'], cache_size=args['cache_size'] << 20,
+                          profile=args['profile'], profile_memory=args['profile_memory'], streaming=not args['soup'])
 
 
 if __name__ == '__main__':
@@ -9,6 +9,7 @@ setup(
     description='Extracts features from txt, xml (TEI), and Word files for dramatic plays.',
     packages=find_packages(exclude=["tests*"]),
     install_requires=requirements,
+    extras_require={'columnar': ['pyarrow']},
     # Install all the scripts by default
     scripts=[os.path.join(os.path.dirname(__file__), 'scripts',
              os.path.basename(script_file)) for script_file in os.listdir('scripts')